@@ -2,8 +2,7 @@ import tkinter as tk
 from tkinter import filedialog
 import subprocess
 import os
-import time
-import json
+from session_store import SessionStore, session_exists
 
 try:
     import keyboard
@@ -23,6 +22,27 @@ def choose_save_directory():
     root.destroy()
     return directory
 
+def format_mb_left(mb_left):
+    """
+    Formats an amount of free space with color-coded formatting:
+    - If the available space is greater than 1024 MB, it returns the amount in GB with green color.
+    - If the available space is greater than 512 MB, it returns the amount in MB with orange color.
+    - If the available space is less than or equal to 512 MB, it returns the amount in MB with red color.
+
+    Args:
+        mb_left (float): The free space in MiB.
+
+    Returns:
+        str: The formatted free space.
+    """
+    if mb_left > 1024:
+        gb_left = mb_left / 1024
+        return f"\033[38;5;46m{gb_left:.2f} GiB left\033[0m"  # Green color
+    elif mb_left > 512:
+        return f"\033[38;5;202m{mb_left:.2f} MiB left\033[0m"  # Orange color
+    else:
+        return f"\033[38;5;196m{mb_left:.2f} MiB left\033[0m"  # Red color
+
 def calculate_mb_left(directory):
     """
     Calculate the available space in megabytes (MB) of the disk where the specified directory is located.
@@ -32,31 +52,57 @@ def calculate_mb_left(directory):
 
     Returns:
         str: A string indicating the amount of available space in either gigabytes (GB) or megabytes (MB),
-             with color-coded formatting:
-             - If the available space is greater than 1024 MB, it returns the amount in GB with green color.
-             - If the available space is less than or equal to 1024 MB, it returns the amount in GB with green color.
-             - If the available space is greater than 512 MB, it returns the amount in MB with orange color.
-             - If the available space is less than or equal to 512 MB, it returns the amount in MB with red color.
+             with color-coded formatting, see `format_mb_left`.
     """
-    total_size = 0
     statvfs = os.statvfs(directory)
     total_size = statvfs.f_frsize * statvfs.f_bavail  # Available space in bytes
-    mb_left = total_size / (1024 * 1024)
-    if mb_left > 1024:
-        gb_left = mb_left / 1024
-        return f"\033[38;5;46m{gb_left:.2f} GiB left\033[0m"  # Green color
-    else:
-        if mb_left <= 1024:
-            gb_left = mb_left / 1024
-            return f"\033[38;5;46m{gb_left:.2f} GiB left\033[0m"  # Green color
-        elif mb_left > 512:
-            return f"\033[38;5;202m{mb_left:.2f} MiB left\033[0m"  # Orange color
+    return format_mb_left(total_size / (1024 * 1024))
+
+def choose_destination_directories(save_directory, destination_directory):
+    """
+    Asks the user for more destination directories after the first one is chosen.
+
+    Every picture is read once and written to all destination directories at the same time,
+    so delivering to several drives does not read the session twice.
+
+    Args:
+        save_directory (str): The save directory, which can not be used as a destination.
+        destination_directory (str): The first destination directory.
+
+    Returns:
+        list: The chosen destination directories.
+    """
+    destination_directories = [destination_directory]
+    while True:
+        choice = input("Do you want to add another destination directory? (y/n): ")
+        if choice.lower() == "y":
+            new_destination_directory = choose_save_directory()
+            if not new_destination_directory:
+                print("No destination directory chosen.")
+            elif new_destination_directory == save_directory:
+                print("Save and destination directories are the same.")
+            elif new_destination_directory in destination_directories:
+                print("This destination directory is already chosen.")
+            else:
+                destination_directories.append(new_destination_directory)
+                print("Destination directories:", ", ".join(destination_directories))
+        elif choice.lower() == "n":
+            return destination_directories
         else:
-            return f"\033[38;5;196m{mb_left:.2f} MiB left\033[0m"  # Red color
+            print("Invalid choice. Please try again.")
 
 def wait_for_keypress(): # Wait for a key press to continue  
     input("\033[38;5;226mPress Enter to continue...\033[0m") # Yellow color
 
+pending_notices = [] # Messages that are shown at the top of the next screen
+
+def show_notice(message):
+    """
+    Shows a message at the top of the next screen, after the terminal is cleared.
+    The menus use this instead of pausing before they are drawn again, so the message stays readable.
+    """
+    pending_notices.append(message)
+
 def clear_terminal(): # Clear the text from the terminal
     if os.name == 'nt': 
         # For Windows
@@ -64,28 +110,29 @@ def clear_terminal(): # Clear the text from the terminal
     else: 
         # For Linux and Mac
         _ = os.system('clear')
+    while pending_notices:
+        print(pending_notices.pop(0))
         
-def change_save_directory(save_directory, selected_pictures):
+def change_save_directory(save_directory, session_store):
     """
     Change the save directory for capture.
 
     This function allows the user to change the save directory for captured pictures. It prompts the user to choose a new save directory and updates the `save_directory` variable accordingly. 
-    If there is an active session in the new save folder, it prompts the user to confirm whether they want to continue with the session or not. If the user chooses not to continue, the `selected_pictures.json` file in the save directory will be deleted. 
-    If the user chooses to continue, the `selected_pictures.json` file will be loaded.
+    If there is an active session in the new save folder, it prompts the user to confirm whether they want to continue with the session or not. If the user chooses not to continue, the session store of the new save directory will be deleted. 
+    If the user chooses to continue, the session store of the new save directory will be loaded.
 
     Args:
         save_directory (str): The current save directory.
-        selected_pictures (list): The list of selected pictures.
+        session_store (SessionStore): The session store of the current save directory.
 
     Returns:
-        tuple: A tuple containing the updated `save_directory` and `selected_pictures`.
+        tuple: A tuple containing the updated `save_directory` and `session_store`.
 
     """
     clear_terminal()
     choice_folder = input("Do you want to change the save folder? (y/n): ")
     if choice_folder.lower() == "y":
         print("Please choose a save directory.")
-        time.sleep(2)  # Simulating delay before choosing the save directory
         new_save_directory = choose_save_directory()
         print("New save directory:", new_save_directory)
         print("Old save directory:", save_directory)
@@ -94,36 +141,29 @@ def change_save_directory(save_directory, selected_pictures):
             if new_save_directory or not new_save_directory == save_directory: # Check if a new save directory is chosen
                 save_directory = new_save_directory
                 print("Save directory changed to:", save_directory)
-                if os.path.exists(save_directory + '/selected_pictures.json'): # Check if there is an active session in the folder
+                session_store.compact() # Save the selection of the old save folder
+                if session_exists(save_directory): # Check if there is an active session in the folder
                     print("\033[93mWarning: There is an active session in this new save folder.\033[0m")
                     response = input("Do you want to continue with the session? (y/n): ")
                     while response.lower() != 'y' and response.lower() != 'n':
                         print("Invalid input. Please enter 'y' or 'n'.")
                         response = input("Do you want to continue with the session? (y/n): ")
                     """
-                    if the response is 'n', the selected_pictures.json file will be deleted. If the file does not exist, it will print that the file does not exist. 
-                    If the response is 'y', the selected_pictures.json file will be loaded.
+                    if the response is 'n', the session store of the new save folder will be deleted.
+                    If the response is 'y', the session store of the new save folder will be loaded.
                     """            
+                    session_store = SessionStore(save_directory)
                     if response.lower() == 'n':
-                        # Delete the selected_pictures.json file
-                        if os.path.exists(save_directory + '/selected_pictures.json'):
-                            os.remove(save_directory + '/selected_pictures.json')
-                            print("selected_pictures.json file deleted.")
-                            selected_pictures = []
-                        else:
-                            print("selected_pictures.json file does not exist.")
-                            selected_pictures = []
+                        # Delete the session store
+                        session_store.delete()
+                        print("Session deleted.")
                     else:
-                        selected_pictures = []
-                        with open(save_directory + '/selected_pictures.json', 'r') as f:
-                            selected_pictures = json.load(f)
-                            print(selected_pictures)
+                        print(session_store.pictures)
                     wait_for_keypress()
                 else:
                     print("Save directory changed to:", save_directory)
-                    selected_pictures = []
+                    session_store = SessionStore(save_directory)
                 
-                time.sleep(2)  # Simulating delay before showing the menu again
                 clear_terminal()
                 print("Save directory: \033[94m{}\033[0m".format(save_directory))
                 print("Remaining storage:", calculate_mb_left(save_directory))
@@ -133,12 +173,11 @@ def change_save_directory(save_directory, selected_pictures):
                 print("Remaining storage:", calculate_mb_left(save_directory))
             wait_for_keypress()
         except:
-            print("Invalid save directory. Please choose a valid save directory.")
-            time.sleep(1)
+            show_notice("Invalid save directory. Please choose a valid save directory.")
     else:
         clear_terminal()
         print("Save directory remains: \033[94m{}\033[0m".format(save_directory))
         print("Remaining storage:", calculate_mb_left(save_directory))
         wait_for_keypress()
     
-    return save_directory, selected_pictures
\ No newline at end of file
+    return save_directory, session_store
\ No newline at end of file
@@ -0,0 +1,40 @@
+# Description: This script mirrors every new picture in the save directory to the backup directories.
+import sys
+import json
+import signal
+import time
+from transfer_utils import BackupMirror, set_io_priority, format_mirror_status
+
+"""
+this script is started by the main program alongside the tether process.
+It copies every new capture to the backup directories as soon as it is complete.
+On SIGTERM it stops watching, copies the files that are still queued and exits.
+"""
+save_directory = sys.argv[1] # Get the save directory from the command line arguments
+backup_directories = json.loads(sys.argv[2])
+
+set_io_priority() # Never slow down the tether download
+
+mirror = BackupMirror(save_directory, backup_directories)
+stop_requested = False
+
+def request_stop(signum, frame):
+    global stop_requested
+    stop_requested = True
+
+signal.signal(signal.SIGTERM, request_stop)
+signal.signal(signal.SIGINT, request_stop)
+
+mirror.start()
+last_report = None
+while not stop_requested:
+    time.sleep(1)
+    status = mirror.status()
+    report = (status['pending'], status['mirrored'], status['errors'])
+    if report != last_report: # Only report when something changed
+        print(format_mirror_status(status))
+        last_report = report
+
+print("Mirror: finishing the queued pictures...")
+mirror.stop(drain=True)
+print(format_mirror_status(mirror.status()))
@@ -0,0 +1,250 @@
+# Description: This script benchmarks the viewer, the transfers and the selection on synthetic sessions and compares the results with a baseline.
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+from synthetic_session import generate_session
+from session_catalog import SessionCatalog, CATALOG_FILE
+from session_store import SessionStore
+from camera_utils import arrange_shots, plan_copy_jobs
+from image_analysis import apply_orientation, fit_display
+from transfer_utils import FanOutCopier
+from lazy_imports import lazy_module
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+
+"""
+this script generates synthetic sessions (see synthetic_session) and measures the steps that get slow on large shoots:
+- catalog_scan_cold: Opening a session for the first time, the catalog reads the header of every file.
+- catalog_refresh_warm: Opening a session again, nothing changed since the last time.
+- catalog_refresh_one_new: Finding one new picture, what the viewer does after every capture without the tether hook.
+- viewer_sort: Loading the shots, scores and hashes and arranging them into stacks, what the viewer does on every change.
+- viewer_decode: Decoding one picture to the display size (JPEG files and the embedded previews of RAW files), needs OpenCV.
+- copy_1_destination, copy_2_destinations: The throughput of the transfer engine of copy_captured_pictures.
+- selection_add: Selecting one picture, every pick is written durably to the journal.
+- selection_load, selection_compact: Opening and saving a selection of a tenth of the session.
+
+Every metric is the median of --repeat runs. The results are compared with the baseline in benchmark_baseline.json:
+a time regresses when it is more than --threshold times the baseline plus --slack-ms, a throughput regresses when it is
+less than the baseline divided by --threshold. The script exits with status 1 on a regression.
+The baseline is only meaningful on the machine and the disk it was stored on, compare the configuration it reports.
+
+    python3 benchmark_suite.py                              # 2,000 files, compare with the baseline
+    python3 benchmark_suite.py --files 50000 --repeat 1     # A large session
+    python3 benchmark_suite.py --update-baseline            # Store the results as the new baseline
+    python3 benchmark_suite.py --only catalog viewer        # Only some of the metrics
+"""
+
+def median_time(function, repeat, setup=None):
+    """
+    Returns the median time of a function in milliseconds, `setup` runs before every run and is not measured.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+def remove_catalog(directory):
+    for suffix in ('', '-wal', '-shm'):
+        path = os.path.join(directory, CATALOG_FILE + suffix)
+        if os.path.exists(path):
+            os.remove(path)
+
+def open_and_refresh(directory):
+    catalog = SessionCatalog(directory)
+    catalog.refresh()
+    catalog.close()
+
+def prepare_session(directory, count, seed, sparse=True, size_scale=1.0):
+    """
+    Generates a session, or reuses the one a previous run with --keep left behind.
+    """
+    marker = os.path.join(directory, '.synthetic.json')
+    wanted = {'files': count, 'seed': seed, 'sparse': sparse, 'size_scale': size_scale}
+    try:
+        with open(marker) as f:
+            stored = json.load(f)
+        if stored['config'] == wanted:
+            return stored['session']
+    except (OSError, ValueError, KeyError):
+        pass
+    shutil.rmtree(directory, ignore_errors=True)
+    print(f"Generating {count} files in {directory}...")
+    session = generate_session(directory, count, seed=seed, sparse=sparse, size_scale=size_scale)
+    with open(marker, 'w') as f:
+        json.dump({'config': wanted, 'session': session}, f)
+    return session
+
+def decode_for_display(path, entry):
+    """
+    Decodes a picture to the display size the way the viewer does, RAW files from their embedded preview.
+    """
+    if entry.get('preview_offset') is not None and entry.get('preview_length'):
+        with open(path, 'rb') as f:
+            f.seek(entry['preview_offset'])
+            data = np.frombuffer(f.read(entry['preview_length']), dtype=np.uint8)
+        frame = apply_orientation(cv2.imdecode(data, cv2.IMREAD_COLOR), entry.get('orientation'))
+    else:
+        frame = cv2.imread(path)
+    return fit_display(frame)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the viewer, the transfers and the selection on synthetic sessions.")
+    parser.add_argument('--files', type=int, default=2000, help="The number of files of the scanned session (up to 50,000).")
+    parser.add_argument('--copy-files', type=int, default=100, help="The number of files of the transferred session.")
+    parser.add_argument('--copy-scale', type=float, default=0.05, help="The file sizes of the transferred session as a factor of real sizes.")
+    parser.add_argument('--repeat', type=int, default=3, help="The number of runs of every metric, the median is reported.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json'))
+    parser.add_argument('--update-baseline', action='store_true', help="Store the results as the new baseline.")
+    parser.add_argument('--threshold', type=float, default=1.25, help="The allowed regression as a factor of the baseline.")
+    parser.add_argument('--slack-ms', type=float, default=2.0, help="The absolute allowance for noise on small times.")
+    parser.add_argument('--workdir', help="The folder of the synthetic sessions, a temporary folder by default.")
+    parser.add_argument('--keep', action='store_true', help="Keep the synthetic sessions, so the next run does not generate them again.")
+    parser.add_argument('--only', nargs='+', choices=['catalog', 'viewer', 'copy', 'selection'], help="Only these groups of metrics.")
+    arguments = parser.parse_args()
+
+    groups = set(arguments.only or ['catalog', 'viewer', 'copy', 'selection'])
+    workdir = arguments.workdir or tempfile.mkdtemp(prefix='tether-benchmark-')
+    os.makedirs(workdir, exist_ok=True)
+    session_directory = os.path.join(workdir, 'session')
+    results = {} # metric -> {'value', 'unit', 'better'}
+    notes = []
+
+    def report(name, value, unit, better='lower'):
+        results[name] = {'value': round(value, 3), 'unit': unit, 'better': better}
+        print(f"{name:<28}{value:>12.2f} {unit}")
+
+    try:
+        if groups & {'catalog', 'viewer', 'selection'}:
+            session = prepare_session(session_directory, arguments.files, arguments.seed)
+            print(f"Session: {session['files']} files, {session['shots']} shots, {session['bytes'] / (1024 ** 3):.1f} GiB apparent size\n")
+
+        if 'catalog' in groups:
+            report('catalog_scan_cold', median_time(lambda: open_and_refresh(session_directory), arguments.repeat, lambda: remove_catalog(session_directory)), 'ms')
+            open_and_refresh(session_directory)
+            report('catalog_refresh_warm', median_time(lambda: open_and_refresh(session_directory), arguments.repeat), 'ms')
+            new_files = []
+
+            def add_new_file():
+                path = os.path.join(session_directory, f"NEW_{len(new_files):05d}.JPG")
+                shutil.copyfile(os.path.join(session_directory, sorted(name for name in os.listdir(session_directory) if name.endswith('.JPG'))[0]), path)
+                new_files.append(path)
+            report('catalog_refresh_one_new', median_time(lambda: open_and_refresh(session_directory), arguments.repeat, add_new_file), 'ms')
+            for path in new_files:
+                os.remove(path)
+
+        if 'viewer' in groups:
+            catalog = SessionCatalog(session_directory)
+            catalog.refresh()
+            if not catalog.scores(): # Synthetic scores and hashes, bursts share nearly the same hash like real bursts
+                rng = random.Random(arguments.seed)
+                results_to_store = []
+                dhash = 0
+                for files in catalog.shots(descending=False):
+                    dhash = dhash ^ (1 << rng.randrange(64)) if rng.random() < 0.8 else rng.getrandbits(64)
+                    for name in files:
+                        results_to_store.append((name, {'sharpness': rng.uniform(10, 400), 'highlight_clip': rng.uniform(0, 0.02),
+                                                        'shadow_clip': rng.uniform(0, 0.02), 'luminance': rng.uniform(60, 180), 'dhash': dhash}))
+                catalog.set_scores(results_to_store)
+
+            def sort_view():
+                shots = catalog.shots()
+                scores = catalog.scores()
+                hashes = catalog.hashes()
+                for sort_by_score, hide_rejects in ((False, False), (True, True)):
+                    arrange_shots(shots, scores, sort_by_score, hide_rejects, hashes)
+            report('viewer_sort', median_time(sort_view, arguments.repeat), 'ms')
+
+            if session['real_jpeg']:
+                sample = [dict(catalog.get(name)) for files in catalog.shots()[:20] for name in files]
+                decode_times = []
+                for entry in sample:
+                    path = os.path.join(session_directory, entry['name'])
+                    decode_times.append(median_time(lambda: decode_for_display(path, entry), arguments.repeat))
+                report('viewer_decode', statistics.median(decode_times), 'ms')
+            else:
+                notes.append("viewer_decode skipped: OpenCV is not installed, the synthetic pictures can not be encoded or decoded.")
+            catalog.close()
+
+        if 'copy' in groups:
+            copy_directory = os.path.join(workdir, 'copy_session')
+            copy_session = prepare_session(copy_directory, arguments.copy_files, arguments.seed, sparse=False, size_scale=arguments.copy_scale)
+            open_and_refresh(copy_directory)
+            names = [name for files in SessionCatalog(copy_directory).shots(descending=False) for name in files]
+            for destination_count in (1, 2):
+                throughputs = []
+                for _ in range(arguments.repeat):
+                    destinations = [os.path.join(workdir, f'destination_{n}') for n in range(destination_count)]
+                    for directory in destinations:
+                        shutil.rmtree(directory, ignore_errors=True)
+                        os.makedirs(directory)
+                    jobs = plan_copy_jobs(copy_directory, names, destinations, on_conflict='rewrite')
+                    started = time.perf_counter()
+                    status = FanOutCopier(destinations).copy(jobs)
+                    elapsed = time.perf_counter() - started
+                    throughputs.append(sum(progress['bytes'] for progress in status.values()) / (1024 * 1024) / elapsed)
+                report(f"copy_{destination_count}_destination{'s' if destination_count > 1 else ''}", statistics.median(throughputs), 'MiB/s', 'higher')
+            for n in range(2):
+                shutil.rmtree(os.path.join(workdir, f'destination_{n}'), ignore_errors=True)
+
+        if 'selection' in groups:
+            catalog = SessionCatalog(session_directory)
+            catalog.refresh()
+            picks = [os.path.join(session_directory, name) for files in catalog.shots()[::10] for name in files]
+            catalog.close()
+            store = SessionStore(session_directory)
+            store.delete()
+            add_times = []
+            for picture in picks:
+                started = time.perf_counter()
+                store.add(picture)
+                add_times.append((time.perf_counter() - started) * 1000)
+            report('selection_add', statistics.median(add_times), 'ms')
+            report('selection_load', median_time(store.load, arguments.repeat), 'ms')
+            report('selection_compact', median_time(store.compact, arguments.repeat), 'ms')
+            store.delete()
+    finally:
+        if not arguments.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    for note in notes:
+        print(note)
+
+    config = {'files': arguments.files, 'copy_files': arguments.copy_files, 'copy_scale': arguments.copy_scale, 'seed': arguments.seed, 'repeat': arguments.repeat}
+    if arguments.update_baseline or not os.path.exists(arguments.baseline):
+        with open(arguments.baseline, 'w') as f:
+            json.dump({'config': config, 'python': sys.version.split()[0], 'metrics': results}, f, indent=2)
+        print(f"\nBaseline stored in {arguments.baseline}")
+        sys.exit(0)
+
+    with open(arguments.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('config') != config:
+        print(f"\nWarning: the baseline was measured with {baseline.get('config')}, the results are not comparable.")
+    failed = False
+    print()
+    for name, result in results.items():
+        reference = baseline['metrics'].get(name)
+        if reference is None:
+            print(f"{name}: not in the baseline")
+            continue
+        if result['better'] == 'higher':
+            limit = reference['value'] / arguments.threshold
+            regressed = result['value'] < limit
+        else:
+            limit = reference['value'] * arguments.threshold + arguments.slack_ms
+            regressed = result['value'] > limit
+        change = (result['value'] / reference['value'] - 1) * 100 if reference['value'] else 0
+        print(f"{'FAIL' if regressed else 'OK':<6}{name:<28}{result['value']:>10.2f} {result['unit']:<6} baseline {reference['value']:.2f} ({change:+.0f}%), limit {limit:.2f}")
+        failed = failed or regressed
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,170 @@
+"""
+This module provides the camera settings profiles: named sets of camera settings that are applied in one go.
+
+A profile is saved from the current settings of the camera (`capture_profile`) and kept in PROFILES_FILE next
+to the program. Applying a profile (`apply_profile`) reads the config tree of the camera once, compares it with
+the profile and writes only the settings that differ back in a single `set_config` call, over the open
+connection of a `CameraSession`. Switching between two profiles therefore costs two USB round trips instead of
+one gphoto2 process per setting.
+
+The names of the settings differ between the camera makers (for example 'aperture' on Canon and 'f-number' on
+Nikon and Sony), PROFILE_SETTINGS lists the names of every maker and a profile keeps the ones the camera has.
+
+Libraries used:
+- os: Provides the path of the profiles file.
+- json: Provides the profiles file.
+- lazy_imports: Imports gphoto2 on first use, so the menu starts without it.
+"""
+import os
+import json
+from lazy_imports import lazy_module
+gp = lazy_module('gphoto2')
+
+PROFILES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'camera_profiles.json')
+PROFILE_SETTINGS = ('iso', 'shutterspeed', 'aperture', 'f-number', 'whitebalance', 'colortemperature',
+                    'imagequality', 'imageformat', 'capturetarget', 'exposurecompensation', 'focusmode')
+
+def read_settings(config, names=None):
+    """
+    Collects the writable settings of a config tree.
+
+    Args:
+        config (gp.CameraWidget): The root of the config tree of the camera.
+        names (iterable or None): The names of the settings to collect, or None for all of them.
+
+    Returns:
+        dict: name -> widget for every writable setting that was found.
+    """
+    names = set(names) if names is not None else None
+    settings = {}
+    pending = [config]
+    while pending:
+        widget = pending.pop()
+        widget_type = widget.get_type()
+        if widget_type in (gp.GP_WIDGET_WINDOW, gp.GP_WIDGET_SECTION):
+            pending.extend(widget.get_child(index) for index in range(widget.count_children()))
+        elif widget_type != gp.GP_WIDGET_BUTTON and not widget.get_readonly():
+            if names is None or widget.get_name() in names:
+                settings[widget.get_name()] = widget
+    return settings
+
+def widget_choices(widget):
+    """
+    Returns the values a radio or menu setting accepts, or None for the other settings.
+    """
+    if widget.get_type() not in (gp.GP_WIDGET_RADIO, gp.GP_WIDGET_MENU):
+        return None
+    return [widget.get_choice(index) for index in range(widget.count_choices())]
+
+def convert_value(widget, value):
+    """
+    Converts a value from a profile to the type of a setting.
+    """
+    widget_type = widget.get_type()
+    if widget_type == gp.GP_WIDGET_RANGE:
+        return float(value)
+    if widget_type == gp.GP_WIDGET_TOGGLE:
+        return int(value)
+    return str(value)
+
+def diff_profile(profile, settings):
+    """
+    Compares a profile with the current settings of the camera.
+
+    Args:
+        profile (dict): The settings of the profile, name -> value.
+        settings (dict): The current settings, see `read_settings`.
+
+    Returns:
+        tuple: (changes, problems)
+            changes (dict): name -> value for every setting that differs from the profile.
+            problems (dict): name -> reason for every setting of the profile that can not be applied.
+    """
+    changes = {}
+    problems = {}
+    for name, value in profile.items():
+        widget = settings.get(name)
+        if widget is None:
+            problems[name] = "not available on this camera"
+            continue
+        choices = widget_choices(widget)
+        if choices is not None and str(value) not in choices:
+            problems[name] = f"{value} is not one of {', '.join(choices)}"
+            continue
+        try:
+            value = convert_value(widget, value)
+        except ValueError:
+            problems[name] = f"{value} is not a valid value"
+            continue
+        if value != widget.get_value():
+            changes[name] = value
+    return changes, problems
+
+def capture_profile(session, names=PROFILE_SETTINGS):
+    """
+    Reads the current settings of the camera as a profile.
+
+    Args:
+        session (CameraSession): An open camera session.
+        names (iterable): The names of the settings to keep.
+
+    Returns:
+        dict: name -> value of the settings the camera has.
+    """
+    with session.lock:
+        config = session.camera.get_config(session.context)
+    return {name: widget.get_value() for name, widget in sorted(read_settings(config, names).items())}
+
+def apply_profile(session, profile):
+    """
+    Applies a profile to the camera, writing all changed settings in one `set_config` call.
+
+    Args:
+        session (CameraSession): An open camera session.
+        profile (dict): The settings of the profile, name -> value.
+
+    Returns:
+        tuple: (changes, problems), see `diff_profile`. The changes are applied, the problems are skipped.
+    """
+    with session.lock:
+        config = session.camera.get_config(session.context)
+        settings = read_settings(config, profile)
+        changes, problems = diff_profile(profile, settings)
+        if changes:
+            for name, value in changes.items():
+                settings[name].set_value(value)
+            session.camera.set_config(config, session.context)
+    return changes, problems
+
+def load_profiles(path=PROFILES_FILE):
+    """
+    Reads the saved profiles.
+
+    Returns:
+        dict: profile name -> settings, empty if no profile was saved yet.
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_profiles(profiles, path=PROFILES_FILE):
+    """
+    Writes the profiles, replacing the file at once so a crash never leaves half a file behind.
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(profiles, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+def format_changes(changes, problems):
+    """
+    Formats the result of `apply_profile` for the terminal.
+
+    Returns:
+        list: The lines to print.
+    """
+    lines = [f"{name}: {value}" for name, value in changes.items()] or ["The camera already has these settings."]
+    lines += [f"\033[91m{name}: {reason}\033[0m" for name, reason in problems.items()]
+    return lines
@@ -0,0 +1,208 @@
+"""
+This module records the camera telemetry (battery level, free space on the card and shot counter) as a time series.
+
+The samples are kept in a `TelemetryRing`, a ring buffer of fixed size backed by arrays of floats, so a day of
+samples takes a few dozen kilobytes and adding one never allocates. The ring gives the trend of every value
+(the change per hour) for the status line and exports the samples as CSV.
+
+The samples come from two sources:
+- The status monitor adds the battery level and the card space it reads for the menu anyway (see menu_status).
+- While the program holds a `CameraSession` (the card download, the settings profiles, the headless mode), a
+  `TelemetrySampler` reads all three values over that connection, one config read and one storage read per
+  sample. A sample is skipped when the connection is busy, so it never waits for or delays a download.
+
+No telemetry is recorded while the gphoto2 tether runs. The tether is a separate gphoto2 process that claims the
+USB interface of the camera until it exits, so a second connection can not be opened next to it, not even in a
+pause between downloads (libgphoto2 can not claim the device). Stopping the tether for a sample would risk
+missing a shot for a value that changes by a few percent per hour. The samples therefore cover the time outside
+the tether (before and after it, the card download and the headless mode between tethers), and a trend spans a
+tether when there are samples on both sides of it within TREND_WINDOW.
+
+Libraries used:
+- re: Provides the parsing of the battery level.
+- csv: Provides the export.
+- math: Provides the missing values (NaN).
+- time: Provides the times of the samples.
+- array: Provides the compact storage of the ring.
+- threading: Provides the sampler thread and the lock of the ring.
+- lazy_imports: Imports gphoto2 on first use, so the menu starts without it.
+"""
+import re
+import csv
+import math
+import time
+import threading
+from array import array
+from lazy_imports import lazy_module
+gp = lazy_module('gphoto2')
+
+TELEMETRY_INTERVAL = 30 # Seconds between two samples
+RING_CAPACITY = 2880 # Samples kept, a day at the default interval
+TREND_WINDOW = 3600 # Seconds of samples the trend is computed from
+FIELDS = ('battery', 'card_free', 'shot_counter')
+BATTERY_SETTING = 'batterylevel'
+SHOT_COUNTER_SETTINGS = ('shuttercounter', 'shutter-count', 'imagecount') # The name differs between the camera makers
+
+def parse_battery(value):
+    """
+    Returns the battery level in percent from the text of the camera ('78%', '78'), or None.
+    """
+    match = re.search(r'(\d+(?:\.\d+)?)', value or '')
+    return float(match.group(1)) if match else None
+
+class TelemetryRing:
+    """
+    Keeps the last `capacity` telemetry samples in arrays of floats, the missing values are NaN.
+    """
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self.columns = {field: array('d', [math.nan]) * capacity for field in ('time',) + FIELDS}
+        self.next = 0 # The slot of the next sample
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def add(self, battery=None, card_free=None, shot_counter=None, when=None):
+        """
+        Adds a sample, overwriting the oldest one when the ring is full.
+        """
+        values = {'time': time.time() if when is None else when, 'battery': battery, 'card_free': card_free, 'shot_counter': shot_counter}
+        with self.lock:
+            for field, column in self.columns.items():
+                column[self.next] = math.nan if values[field] is None else float(values[field])
+            self.next = (self.next + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def samples(self):
+        """
+        Returns the samples from the oldest to the newest.
+
+        Returns:
+            list: One dict per sample with 'time' and the FIELDS, None for a missing value.
+        """
+        with self.lock:
+            start = (self.next - self.size) % self.capacity
+            slots = [(start + offset) % self.capacity for offset in range(self.size)]
+            return [{field: None if math.isnan(column[slot]) else column[slot] for field, column in self.columns.items()} for slot in slots]
+
+    def latest(self, field):
+        """
+        Returns the newest known value of a field, or None.
+        """
+        for sample in reversed(self.samples()):
+            if sample[field] is not None:
+                return sample[field]
+        return None
+
+    def trend(self, field, window=TREND_WINDOW):
+        """
+        Returns the change of a field per hour within the last `window` seconds, or None with fewer than two values.
+        """
+        samples = self.samples()
+        if not samples:
+            return None
+        points = [(sample['time'], sample[field]) for sample in samples if sample[field] is not None and sample['time'] >= samples[-1]['time'] - window]
+        if len(points) < 2 or points[-1][0] <= points[0][0]:
+            return None
+        return (points[-1][1] - points[0][1]) / (points[-1][0] - points[0][0]) * 3600
+
+    def export_csv(self, path):
+        """
+        Writes the samples to a CSV file with one row per sample, the time as ISO 8601.
+
+        Returns:
+            int: The number of rows written.
+        """
+        samples = self.samples()
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('time',) + FIELDS)
+            for sample in samples:
+                writer.writerow([time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(sample['time']))]
+                                + ['' if sample[field] is None else f"{sample[field]:.15g}" for field in FIELDS])
+        return len(samples)
+
+def format_trends(ring):
+    """
+    Formats the newest values and their trends for the status line, or returns None before the first sample.
+    """
+    parts = []
+    battery = ring.latest('battery')
+    if battery is not None:
+        trend = ring.trend('battery')
+        parts.append(f"battery {battery:.0f}%" + (f" ({trend:+.0f}%/h)" if trend is not None else ""))
+    card_free = ring.latest('card_free')
+    if card_free is not None:
+        trend = ring.trend('card_free')
+        parts.append(f"card {card_free / 1024 ** 3:.1f} GiB" + (f" ({trend / 1024 ** 3:+.1f} GiB/h)" if trend is not None else ""))
+    shot_counter = ring.latest('shot_counter')
+    if shot_counter is not None:
+        trend = ring.trend('shot_counter')
+        parts.append(f"{shot_counter:.0f} shutter releases" + (f" ({trend:+.0f}/h)" if trend is not None else ""))
+    return "Telemetry: " + ", ".join(parts) if parts else None
+
+def read_telemetry(session):
+    """
+    Reads the telemetry over an open camera session, unless the session is busy.
+
+    Args:
+        session (CameraSession): An open camera session.
+
+    Returns:
+        dict or None: 'battery', 'card_free' and 'shot_counter' (None for a value the camera does not report),
+                      or None if another operation holds the session.
+    """
+    if not session.lock.acquire(blocking=False):
+        return None # A download or another operation is running, skip this sample
+    try:
+        if session.camera is None:
+            return None
+        config = session.camera.get_config(session.context)
+        values = {}
+        for name in (BATTERY_SETTING,) + SHOT_COUNTER_SETTINGS:
+            try:
+                values[name] = config.get_child_by_name(name).get_value()
+            except gp.GPhoto2Error:
+                pass
+        card_free = None
+        try:
+            card_free = sum(info.freekbytes for info in session.camera.get_storageinfo(session.context)) * 1024
+        except gp.GPhoto2Error:
+            pass
+    finally:
+        session.lock.release()
+    shot_counter = next((values[name] for name in SHOT_COUNTER_SETTINGS if name in values), None)
+    try:
+        shot_counter = float(shot_counter) if shot_counter is not None else None
+    except ValueError:
+        shot_counter = None
+    return {'battery': parse_battery(str(values.get(BATTERY_SETTING, ''))), 'card_free': card_free, 'shot_counter': shot_counter}
+
+class TelemetrySampler(threading.Thread):
+    """
+    Samples the telemetry over an open camera session every `interval` seconds until it is stopped.
+    """
+
+    def __init__(self, session, ring, interval=TELEMETRY_INTERVAL):
+        super().__init__(name='camera-telemetry', daemon=True)
+        self.session = session
+        self.ring = ring
+        self.interval = interval
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+        self.join(timeout=5)
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                sample = read_telemetry(self.session)
+            except gp.GPhoto2Error:
+                sample = None # The camera was unplugged or is busy, try again at the next interval
+            if sample is not None:
+                self.ring.add(**sample)
+            self.stopping.wait(self.interval)
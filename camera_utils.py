@@ -1,15 +1,30 @@
 import subprocess
 import os
 import time
-import cv2
 import sys
-import shutil
-from app_utils import calculate_mb_left, choose_save_directory, clear_terminal, wait_for_keypress
+from app_utils import clear_terminal, wait_for_keypress, show_notice
 import re
-import time
-import numpy as np
-import rawpy
-import gphoto2 as gp
+import queue
+import bisect
+from collections import OrderedDict
+import threading
+import tarfile
+import zipfile
+from lazy_imports import lazy_module
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+rawpy = lazy_module('rawpy')
+gp = lazy_module('gphoto2')
+from transfer_utils import PHOTO_EXTENSIONS, FanOutCopier, TransferThrottle, export_archive
+from session_catalog import SessionCatalog
+from session_layout import tether_folder
+from capture_durability import temp_pattern, CaptureWriter
+from pipeline_trace import Tracer
+from storage_watchdog import read_storage_status, format_storage_warning
+from image_analysis import is_likely_reject, format_scores, burst_starts, apply_orientation, fit_display, compute_overlays, next_overlay_step, draw_overlays
+from contact_sheet import ThumbnailCache, compose_page, GRID_COLUMNS, GRID_ROWS
+from roi_zoom import ZOOM_VIEW_SIZE, TileSource, TileCache, render_view, view_size, pan_offset
+from proof_export import PROOF_DIRECTORY, DEFAULT_LONG_EDGE, DEFAULT_QUALITY, export_proofs, format_export_report
 
 """
 This module provides utility functions for interacting with cameras using the gphoto2 library.
@@ -20,11 +35,17 @@ Libraries used:
 - time: Provides various time-related functions, such as getting the current time and delaying execution.
 - cv2: OpenCV library for image processing and computer vision tasks.
 - sys: Provides access to some variables used or maintained by the interpreter and to functions that interact with the interpreter.
-- shutil: Provides high-level file operations, such as copying and moving files.
 - re: Provides regular expression matching operations.
+- queue, threading: Provide the pipelined reader and writer of the camera ingest.
+- tarfile, zipfile: Provide the error types of the archive export.
 - numpy: Library for numerical computing with Python.
 - rawpy: Library for reading RAW image files.
 - gphoto2: Python bindings for the gphoto2 library, which allows communication with digital cameras.
+- pipeline_trace: Records the timings of the download, the viewer and the transfers.
+- storage_watchdog: Provides the warning of the storage watchdog for the viewer.
+- session_layout: Provides the folder of the tether in a sharded session.
+- capture_durability: Provides the temporary names and the flush policies of the downloaded pictures.
+- lazy_imports: Imports OpenCV, NumPy, rawpy and gphoto2 on first use, so the menu starts without them.
 
 """
 
@@ -77,14 +98,46 @@ def get_connected_camera_model(): # Get the model of the connected camera
     """
     try:
         result = subprocess.run(['gphoto2', '--auto-detect'], stdout=subprocess.PIPE)
-        output = result.stdout.decode('utf-8')
-        lines = output.split('\n')
-        for line in lines:
-            if 'usb:' in line:
-                model = line.split('usb:')[0].strip()
-                return model
+        return parse_camera_model(result.stdout.decode('utf-8'))
     except subprocess.CalledProcessError:
         return None
+
+def parse_camera_model(output):
+    """
+    Returns the model of the first USB camera in the output of 'gphoto2 --auto-detect', or None.
+    """
+    for line in output.split('\n'):
+        if 'usb:' in line:
+            return line.split('usb:')[0].strip()
+    return None
+
+def parse_config_value(output):
+    """
+    Returns the current value in the output of 'gphoto2 --get-config', or None.
+    """
+    for line in output.split('\n'):
+        if line.startswith('Current:'):
+            return line.split('Current: ')[1]
+    return None
+
+def parse_camera_free_bytes(output):
+    """
+    Returns the free space in the output of 'gphoto2 --storage-info' in bytes, or None.
+    """
+    match = re.search(r'free=(\d+)', output)
+    return int(match.group(1)) * 1024 if match else None
+
+def parse_camera_free_space(output):
+    """
+    Returns the free space in the output of 'gphoto2 --storage-info' in MiB or GiB, or None.
+    """
+    free_bytes = parse_camera_free_bytes(output)
+    if free_bytes is None:
+        return None
+    free_space_mib = free_bytes / (1024 * 1024)
+    if free_space_mib >= 1024:
+        return f'{free_space_mib / 1024:.2f} GiB'
+    return f'{free_space_mib:.2f} MiB'
   
 def get_camera_info(info): # Get the camera information
     """
@@ -155,14 +208,12 @@ def get_camera_battery_level():
         str: The battery level of the connected camera if successful, otherwise returns None.
     """
     try:
-        # Run the gphoto2 command to get the serial number
+        # Run the gphoto2 command to get the battery level
         result = subprocess.run(['gphoto2', '--get-config', 'batterylevel'], capture_output=True, text=True)
 
-        # Parse the output to get the serial number
-        lines = result.stdout.split('\n')
-        for line in lines:
-            if line.startswith('Current:'):
-                return line.split('Current: ')[1]
+        battery_level = parse_config_value(result.stdout)
+        if battery_level is not None:
+            return battery_level
 
         # If we didn't find the serial number, raise an exception
         raise Exception('Could not find battery level')
@@ -229,16 +280,9 @@ def get_camera_free_space():
         # Run the gphoto2 command to get the storage info
         result = subprocess.run(['gphoto2', '--storage-info'], capture_output=True, text=True)
 
-        # Use a regular expression to find the free space
-        match = re.search(r'free=(\d+)', result.stdout)
-        if match:
-            free_space_kb = int(match.group(1))
-            free_space_mib = free_space_kb / 1024
-            if free_space_mib >= 1024:
-                free_space_gib = free_space_mib / 1024
-                return f'{free_space_gib:.2f} GiB'
-            else:
-                return f'{free_space_mib:.2f} MiB'
+        free_space = parse_camera_free_space(result.stdout)
+        if free_space is not None:
+            return free_space
 
         # If we didn't find the free space, raise an exception
         raise Exception('Could not find free space')
@@ -305,23 +349,44 @@ def wait_for_camera_connection():
     while True:
         cameras = gp.Camera.autodetect(context)
         if cameras:
-            clear_terminal()
-            print("\033[1;32mCamera connected successfully.\033[0m")
-            time.sleep(2)
+            show_notice("\033[1;32mCamera connected successfully.\033[0m")
             return True
         else:
             clear_terminal()
             timer -= 1
             print(f"Waiting for camera connection... \n{timer} seconds remaining...")
             if timer == 0:
-                clear_terminal()
-                print("\033[1;31mTimeout: No camera detected.\033[0m")
-                time.sleep(2)
+                show_notice("\033[1;31mTimeout: No camera detected.\033[0m")
                 return False
             time.sleep(1)
 """
 These functions below capture and save a picture from the connected camera and then show it.
 """
+def tether_command(save_directory, filename, layout='flat'):
+    """
+    Returns the gphoto2 command of a tether session.
+
+    Every picture taken on the camera is downloaded into the save directory and added to the session catalog
+    by the hook script. In the 'hour' layout gphoto2 saves into one subfolder per hour, in the 'frames' layout
+    the hook script moves the pictures into their subfolder (see session_layout).
+    gphoto2 saves every picture under a temporary name, the hook script renames it when the download is complete
+    (see capture_durability).
+
+    Args:
+        save_directory (str): The directory where the pictures are saved.
+        filename (str): The prefix of the file names, or an empty string for the file names of the camera.
+        layout (str): The folder layout of the session, see `session_layout.LAYOUTS`.
+
+    Returns:
+        list: The command line.
+    """
+    folder = tether_folder(save_directory, layout)
+    if filename == "":
+        command = ['gphoto2', '--capture-tethered', '--filename', os.path.join(folder, temp_pattern(f"%f.%C"))]
+    else:
+        command = ['gphoto2', '--capture-tethered', '--filename', os.path.join(folder, temp_pattern(f"{filename}-%f.%C"))]
+    return command + ['--hook-script', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tether_hook.py')]
+
 def save_tethered_picture(save_directory, filename):
     """
     function is not used in the main program
@@ -398,68 +463,451 @@ def capture_and_save_picture(save_directory, filename, camera_model):
     else:
         print("Failed to capture and save the picture.")
 
-def show_latest_picture(save_directory, selected_pictures): # Show the latest picture taken in window
+class CameraSession:
+    """
+    Keeps one gphoto2 connection to the camera open for several operations.
+
+    Every `gphoto2` command line call opens and closes the USB connection, which takes a noticeable time.
+    A `CameraSession` opens the connection once with the gphoto2 Python bindings. gphoto2 can only handle one
+    operation at a time, so every operation takes the `lock` of the session.
+
+    Attributes:
+        camera (gp.Camera or None): The open camera, or None if the session is closed.
+        lock (threading.RLock): The lock that must be held while the camera is used.
+    """
+
+    def __init__(self):
+        self.context = gp.Context()
+        self.camera = None
+        self.lock = threading.RLock()
+
+    def open(self):
+        """
+        Opens the connection to the first detected camera.
+
+        Returns:
+            bool: True if the camera is connected, False otherwise.
+        """
+        with self.lock:
+            if self.camera is not None:
+                return True
+            camera = gp.Camera()
+            try:
+                camera.init(self.context)
+            except gp.GPhoto2Error as e:
+                print(f"\033[91mCould not connect to the camera: {e}\033[0m")
+                return False
+            self.camera = camera
+            return True
+
+    def close(self):
+        """
+        Closes the connection to the camera.
+        """
+        with self.lock:
+            if self.camera is not None:
+                try:
+                    self.camera.exit(self.context)
+                except gp.GPhoto2Error:
+                    pass
+                self.camera = None
+
+    def list_files(self, folder='/'):
+        """
+        Lists all files on the camera storage.
+
+        Args:
+            folder (str): The folder to start in.
+
+        Returns:
+            list: A list of (folder, file name, size in bytes) tuples.
+        """
+        files = []
+        with self.lock:
+            for name, _ in self.camera.folder_list_files(folder, self.context):
+                info = self.camera.file_get_info(folder, name, self.context)
+                files.append((folder, name, info.file.size))
+            subfolders = [name for name, _ in self.camera.folder_list_folders(folder, self.context)]
+        for name in subfolders:
+            files.extend(self.list_files(os.path.join(folder, name)))
+        return files
+
+    def download(self, folder, name):
+        """
+        Downloads a file from the camera storage into memory.
+
+        Args:
+            folder (str): The folder of the file on the camera.
+            name (str): The file name on the camera.
+
+        Returns:
+            bytes: The content of the file.
+        """
+        with self.lock:
+            camera_file = self.camera.file_get(folder, name, gp.GP_FILE_TYPE_NORMAL, self.context)
+            return bytes(camera_file.get_data_and_size())
+
+def ingest_from_camera(save_directory, filename, session=None, queue_size=4):
+    """
+    Downloads the pictures from the camera storage that are not in the save directory yet.
+
+    This is used after shooting without the tether. The camera folders are listed over one `CameraSession`
+    and every file is compared with the session catalog by name and size, using the same file names as the
+    tether session (`<filename>-<camera file name>`), wherever the folder layout put them. Only the missing
+    files are downloaded, into the folder the tether would use (see session_layout).
+    The download is pipelined: the camera is read in this thread while a writer thread saves the previous
+    file to disk, connected by a bounded queue. The throughput is printed during and after the ingest.
+    Every file is written under a temporary name and flushed by the policy of the session, like the tether
+    (see capture_durability).
+
+    Args:
+        save_directory (str): The directory where the pictures are saved.
+        filename (str): The filename prefix of the session, or an empty string for the camera file names.
+        session (CameraSession): An open camera session to use, or None to open a new one.
+        queue_size (int): The number of downloaded files that may wait for the writer.
+
+    Returns:
+        int: The number of downloaded pictures.
+    """
+    own_session = session is None
+    if own_session:
+        session = CameraSession()
+    if not session.open():
+        return 0
+    try:
+        print("Listing the pictures on the camera...")
+        camera_files = [item for item in session.list_files() if item[1].lower().endswith(PHOTO_EXTENSIONS)]
+        catalog = SessionCatalog(save_directory)
+        catalog.refresh()
+        session_index = {os.path.basename(path): size for path, size in catalog.index().items()} # The layout may put the files in subfolders
+        layout, _ = catalog.layout()
+        folder_pattern = tether_folder(save_directory.replace('%', '%%'), layout) # Expanded per file, like gphoto2 does
+
+        missing = []
+        for folder, name, size in camera_files:
+            local_name = f"{filename}-{name}" if filename else name
+            if session_index.get(local_name) != size:
+                missing.append((folder, name, size, local_name))
+        print(f"{len(camera_files)} pictures on the camera, {len(camera_files) - len(missing)} already downloaded, {len(missing)} to download.")
+        if not missing:
+            return 0
+
+        write_queue = queue.Queue(maxsize=queue_size)
+        write_errors = []
+        flush_errors = [] # The files are written, only the final flush of the open batch failed
+        written = []
+        tracer = Tracer(save_directory, 'ingest')
+        capture_writer = CaptureWriter(*catalog.durability()) # The catalog connection stays in this thread
+
+        def writer():
+            while True:
+                item = write_queue.get()
+                if item is None:
+                    break
+                local_name, data = item
+                directory = time.strftime(folder_pattern)
+                path = os.path.join(directory, local_name)
+                try:
+                    with tracer.span('write', file=local_name, bytes=len(data)):
+                        os.makedirs(directory, exist_ok=True)
+                        capture_writer.write(path, data)
+                    written.append(path)
+                except OSError as e:
+                    write_errors.append((local_name, str(e)))
+            try:
+                capture_writer.flush()
+            except OSError as e:
+                flush_errors.append(str(e))
+
+        writer_thread = threading.Thread(target=writer, daemon=True)
+        writer_thread.start()
+
+        total_size = sum(size for _, _, size, _ in missing)
+        downloaded = 0
+        downloaded_bytes = 0
+        start = time.time()
+        try:
+            for folder, name, size, local_name in missing:
+                try:
+                    with tracer.span('download', file=local_name, bytes=size):
+                        data = session.download(folder, name)
+                except gp.GPhoto2Error as e:
+                    print(f"\n\033[91mFailed to download {name}: {e}\033[0m")
+                    continue
+                write_queue.put((local_name, data)) # Blocks while the writer is behind
+                downloaded += 1
+                downloaded_bytes += len(data)
+                elapsed = max(time.time() - start, 0.001)
+                print(f"\rDownloaded {downloaded}/{len(missing)} pictures, {downloaded_bytes / (1024 * 1024):.1f}/{total_size / (1024 * 1024):.1f} MiB ({downloaded_bytes / (1024 * 1024) / elapsed:.1f} MiB/s)", end="")
+        finally:
+            write_queue.put(None)
+            writer_thread.join()
+            for path in written: # Move the downloaded files into the folders of the layout and add them to the session catalog
+                try:
+                    path = catalog.shard_file(path)
+                except OSError as e:
+                    print(f"\n\033[91mFailed to move {os.path.basename(path)} into its folder: {e}\033[0m") # It stays in the save directory
+                catalog.add_file(path)
+            catalog.close()
+            tracer.flush()
+        elapsed = max(time.time() - start, 0.001)
+        print(f"\n\033[92mIngest done: {downloaded - len(write_errors)} pictures, {downloaded_bytes / (1024 * 1024):.1f} MiB in {elapsed:.1f} s ({downloaded / elapsed:.1f} pictures/s, {downloaded_bytes / (1024 * 1024) / elapsed:.1f} MiB/s).\033[0m")
+        for local_name, error in write_errors:
+            print(f"\033[91mFailed to save {local_name}: {error}\033[0m")
+        for error in flush_errors:
+            print(f"\033[91mFailed to flush the last pictures to the disk: {error}\033[0m")
+        return downloaded - len(write_errors)
+    finally:
+        if own_session:
+            session.close()
+
+FRAME_CACHE_SIZE = 8 # Decoded display frames kept by the viewer
+
+def arrange_shots(shots, scores, sort_by_score=False, hide_rejects=False, hashes=None):
+    """
+    Sorts and filters the shots of the viewer by their culling scores and stacks the bursts.
+
+    The bursts are found in capture order (see `image_analysis.burst_starts`) before the shots are sorted, so the
+    frames of a burst stay one stack when the view is sorted by score: the stacks are ordered by their sharpest
+    shot and the shots within a stack by their sharpness.
+
+    Args:
+        shots (list): The shots in capture order, see `SessionCatalog.shots`.
+        scores (dict): The scores of the scored pictures, see `SessionCatalog.scores`.
+        sort_by_score (bool): If True, the sharpest shots come first and the shots that are not scored yet last.
+        hide_rejects (bool): If True, the likely rejects are left out, unless that would leave nothing to show.
+        hashes (dict or None): The hashes of the pictures to stack the bursts, see `SessionCatalog.hashes`,
+                               or None to show every shot on its own.
+
+    Returns:
+        tuple: The arranged shots, the median sharpness of the session (None if nothing is scored yet)
+               and the index of the first shot of every stack.
+    """
+    sharpness = sorted(value['sharpness'] for value in scores.values())
+    median_sharpness = sharpness[len(sharpness) // 2] if sharpness else None
+    arranged = shots
+    if hide_rejects:
+        arranged = [files for files in shots if not is_likely_reject(scores.get(files[0]), median_sharpness)] or shots
+    stack_starts = burst_starts(arranged, hashes) if hashes is not None else list(range(len(arranged)))
+    if sort_by_score:
+        score_key = lambda files: -scores[files[0]]['sharpness'] if files[0] in scores else float('inf')
+        stacks = [sorted(arranged[start:end], key=score_key) for start, end in zip(stack_starts, stack_starts[1:] + [len(arranged)])]
+        stacks.sort(key=lambda stack: score_key(stack[0]))
+        arranged = [files for stack in stacks for files in stack]
+        stack_starts, start = [], 0
+        for stack in stacks:
+            stack_starts.append(start)
+            start += len(stack)
+    return arranged, median_sharpness, stack_starts
+
+def show_latest_picture(save_directory, session_store): # Show the latest picture taken in window
     """
     This function continuously displays the latest picture taken from the specified save directory. It accepts all photo file types.
-    The function starts by checking if there are any selected pictures provided. If there are, they are added to the `selected_photos` list.
-    The function then enters a loop where it continuously checks for new photo files in the save directory. It filters the file list to only include photo file types and sorts them by modification time in descending order.
-    If a new photo file is found, it checks if it is different from the previous newest image. If it is, it updates the `newest_image` variable and resets the index and tag_preview flags.
+    The pictures are taken from the session catalog of the save directory, which is kept up to date by the tether hook.
+    The selected pictures are kept in the `session_store`, which saves every change immediately.
+    The function then enters a loop where it continuously checks the session catalog for new photo files, sorted by capture time (EXIF date, sub-seconds and frame counter) in descending order.
+    The files of a RAW+JPEG pair are one shot: the viewer shows one entry per shot and decodes the JPEG of the pair, the RAW file is only decoded if it has no JPEG sibling.
+    If a new photo file is found (a file name the viewer has not seen yet, taken in capture order, so re-sorting or hiding shots is never mistaken for a new capture), it jumps to the newest shot and resets the tag_preview flag. When the view is re-sorted by new scores or new files, the current shot stays on screen.
     The function then checks the file type of the latest image. If it is a RAW image (e.g., .nef, .cr2, .arw), it uses the `rawpy` library to extract the embedded JPEG preview. If a JPEG preview is found, it decodes the JPEG data and displays the image. Otherwise, it postprocesses the RAW data and displays the image. If there is an error reading the RAW image, it prints an error message and waits for 2 seconds before continuing to the next image.
     If the latest image is not a RAW image, it simply reads and displays the image using OpenCV.
-    If the latest image is in the `selected_photos` list, it adds a green border to the image. Otherwise, it adds a black border.
+    If the latest shot is selected in the `session_store`, it adds a green border to the image. Otherwise, it adds a red border if the shot is a likely reject (out of focus or clipped, see `image_analysis.is_likely_reject`) and a black border if not.
+    The culling scores of the shot, computed in the background by the frame analyzer, are shown in the top left corner.
     The function creates a named window called "Latest Picture Viewer" and sets it to fullscreen windowed mode. It then displays the image in the window.    
-    The function listens for keyboard events. Pressing the 'Esc' key closes the window and returns the `selected_photos` list if it is not empty. Pressing the 'a' key or left arrow key moves to the previous image. Pressing the 'd' key or right arrow key moves to the next image. Pressing the 'Space' key selects or deselects the current image and updates the `selected_photos` list accordingly.
+    The function listens for keyboard events. Pressing the 'Esc' key closes the window and returns the selected pictures if there are any. Pressing the 'a' key or left arrow key moves to the previous image. Pressing the 'd' key or right arrow key moves to the next image. Pressing the 'Space' key selects or deselects all files of the current shot in the `session_store`. Pressing the 's' key switches between capture order and sharpest first. Pressing the 'f' key hides or shows the likely rejects.
+    Bursts of near-identical frames (see `image_analysis.burst_starts`) are collapsed into stacks: the 'a' and 'd' keys jump between stacks, the 'q' and 'e' keys step through the frames of a stack and the 'c' key collapses or expands the bursts.
+    Pressing the 'h' key shows or hides an RGB and luma histogram, pressing the 'b' key paints the clipped highlights red and the clipped shadows blue. The overlays are computed once per frame on the display frame and kept with it in a small frame cache.
+    Pressing the 'z' key opens the 100% zoom (see `roi_zoom`), which renders only the tiles under the zoom window at native resolution: the 'i', 'j', 'k' and 'l' keys pan up, left, down and right and the 'z' key closes the zoom.
+    Pressing the 'g' key switches to the contact sheet, a grid of thumbnails (see `contact_sheet`): the 'a' and 'd' keys move the cursor, the 'q' and 'e' keys flip the pages, the 'Space' key selects or deselects the shot under the cursor and the 'g' key shows the shot under the cursor again.
     If no photos are found in the specified directory, it prints a message and waits for 2 seconds before checking again.
     
     Args:
         save_directory (str): The directory where the pictures are saved.
-        selected_pictures (list): A list of selected pictures.
+        session_store (SessionStore): The session store with the selected pictures.
 
     Returns:
-        list or int: If the 'Esc' key is pressed, the function returns an empty list if no pictures are selected, otherwise it returns the list of selected pictures.
+        list or int: If the 'Esc' key is pressed, the function returns 0 if no pictures are selected, otherwise it returns the list of selected pictures.
     
     functions used for photo capture and save:
     show_latest_picture <- capture_and_save_picture
     """
     index = 0
     latest_image = None
-    newest_image = None
     prev_image = None
-    selected_photos = []
-
-    if selected_pictures is not None or selected_pictures != [] or selected_pictures != "0" or selected_pictures != "" or selected_pictures != "[]" or selected_pictures != "None":
-        selected_photos.extend(selected_pictures)
         
     tag_preview = False
-    file_list = os.listdir(save_directory)
+    sort_by_score = False
+    hide_rejects = False
+    collapse_bursts = True
+    grid_mode = False
+    grid_state = None
+    thumbnails = None # Created when the contact sheet is opened for the first time
+    zoom_source = None # The picture in the 100% zoom, None if the zoom is closed
+    zoom_state = None
+    tile_cache = TileCache()
+    show_histogram = False
+    show_clipping = False
+    overlay_step = 1 # The clipping masks get coarser when the overlays take longer than their budget
+    storage_warning = format_storage_warning(read_storage_status(save_directory), save_directory) # The warning of the storage watchdog, read again when a new picture arrives
+    frame_cache = OrderedDict() # The last decoded display frames with their overlays, so navigating back does not decode again
+    tracer = Tracer(save_directory, 'viewer') # Detect, decode and display timings, see `pipeline_trace`
+    catalog = SessionCatalog(save_directory)
+    catalog.refresh()
+    shots = catalog.shots() # Sorted by capture time in descending order, the files of a RAW+JPEG pair are one shot
+    scores_version = catalog.scores_version()
+    scores = catalog.scores() # Culling scores from the frame analyzer
+    hashes = catalog.hashes() # Perceptual hashes from the frame analyzer
+    known_files = {name for files in shots for name in files} # Every file the viewer has seen, a file that is not in it is a new capture
+
+    def arrange():
+        # The shots in viewing order, the file shown for every shot (the JPEG of a pair) and the first shot of every stack
+        view, median_sharpness, stack_starts = arrange_shots(shots, scores, sort_by_score, hide_rejects, hashes if collapse_bursts else None)
+        return view, median_sharpness, [files[0] for files in view], stack_starts
+
+    def locate(name, fallback):
+        # The position of a shown file after the view was arranged again, or the fallback position if it is gone
+        return images.index(name) if name in images else min(fallback, max(len(images) - 1, 0))
+
+    def take_new_files():
+        # The files that landed since the last call, newest first, in capture order so a re-sorted view does not matter
+        new_files = [name for files in shots for name in files if name not in known_files]
+        known_files.update(new_files)
+        return new_files
+
+    view, median_sharpness, images, stack_starts = arrange()
     
-    if not file_list:
+    if not images:
         cv2.namedWindow("Latest Picture Viewer", cv2.WINDOW_NORMAL) # Create a named window
         cv2.setWindowProperty("Latest Picture Viewer", cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN) # Set the window to fullscreen windowed mode
             
     while True:
-        # Get the list of files in the save directory
-        file_list = os.listdir(save_directory)
-
-        # Filter the file list to only include photo file types
-        images = [file for file in file_list if file.lower().endswith(('.nef', '.cr2', '.arw', '.jpg', '.jpeg', '.png', '.tif', '.tiff'))]
+        arrived = [] # The files that landed since the last pass
+        # Bring the session catalog up to date, the save directory is only scanned if it changed behind the catalog
+        if catalog.refresh():
+            shown_image = images[index] if images else None
+            shots = catalog.shots() # Sorted by capture time in descending order
+            view, median_sharpness, images, stack_starts = arrange()
+            index = locate(shown_image, index)
+            arrived = take_new_files()
+
+        # Reload the scores when the frame analyzer stored new ones
+        if catalog.scores_version() != scores_version:
+            scores_version = catalog.scores_version()
+            shown_image = images[index] if images else None
+            shown_scores = scores.get(shown_image)
+            scores = catalog.scores()
+            hashes = catalog.hashes()
+            view, median_sharpness, images, stack_starts = arrange()
+            index = locate(shown_image, index) # The sharpness order may have moved the current shot
+            if images and scores.get(images[index]) != shown_scores: # Show the new scores of the current shot
+                tag_preview = False
+                prev_image = None
 
         # Wait until there is a supported photo file in the directory
         while not images:
             time.sleep(1)
-            file_list = os.listdir(save_directory)
-            images = [file for file in file_list if file.lower().endswith(('.nef', '.cr2', '.arw', '.jpg', '.jpeg', '.png', '.tif', '.tiff'))]
-
-        # Sort the photo file list by modification time in descending order
-        images.sort(key=lambda x: os.path.getmtime(os.path.join(save_directory, x)), reverse=True)
-        if images[0] != newest_image: # Check if the newest image is different from the previous newest image
-            newest_image = images[0] if images else None
-            index = 0
+            if catalog.refresh():
+                shots = catalog.shots()
+                view, median_sharpness, images, stack_starts = arrange()
+                arrived += take_new_files()
+
+        if arrived: # A new picture arrived while the viewer is open, time since it was written
+            for name in arrived:
+                entry = catalog.get(name)
+                if entry and entry['mtime']:
+                    tracer.record('detect', max(time.time() - entry['mtime'], 0) * 1000, entry['mtime'], file=name)
+            index = next((position for position, name in enumerate(images) if name in shots[0]), index) # The newest shot, wherever the order put it
             tag_preview = False
+            storage_warning = format_storage_warning(read_storage_status(save_directory), save_directory) # Written by the storage watchdog of the tether
             
+        if images and zoom_source is not None:
+            # 100% zoom: only the tiles under the zoom window are rendered, see `roi_zoom`
+            if zoom_state != (zoom_source.path, zoom_center):
+                view_width, view_height = view_size(zoom_orientation)
+                zoom_frame, zoom_center = render_view(zoom_source, tile_cache, zoom_center[0], zoom_center[1], view_width, view_height)
+                cv2.imshow("Latest Picture Viewer", apply_orientation(zoom_frame, zoom_orientation))
+                zoom_state = (zoom_source.path, zoom_center)
+
+            key = cv2.waitKey(30)
+            if key == 27:  # 'Esc' key
+                cv2.destroyAllWindows() # Close all windows
+                zoom_source.close()
+                if thumbnails is not None:
+                    thumbnails.close()
+                catalog.close()
+                if not session_store:
+                    return 0
+                else:
+                    return session_store.pictures
+            elif key in (ord('i'), ord('j'), ord('k'), ord('l')):  # Pan up, left, down and right by half a window
+                step_x, step_y = ZOOM_VIEW_SIZE[0] // 2, ZOOM_VIEW_SIZE[1] // 2
+                display_dx, display_dy = {ord('i'): (0, -step_y), ord('j'): (-step_x, 0), ord('k'): (0, step_y), ord('l'): (step_x, 0)}[key]
+                dx, dy = pan_offset(zoom_orientation, display_dx, display_dy)
+                zoom_center = (zoom_center[0] + dx, zoom_center[1] + dy)
+            elif key == 32:  # 'Space' key selects or deselects the shot
+                session_store.toggle_shot(shot_paths)
+                print("Selected" if any(path in session_store for path in shot_paths) else "Deselected", latest_image)
+            elif key == ord('z'):  # 'z' key closes the zoom
+                zoom_source.close()
+                zoom_source = None
+                prev_image = None
+                tag_preview = False
+            continue
+
+        if images and grid_mode:
+            # Contact sheet: one page of thumbnails composited into one canvas and shown with one imshow
+            per_page = GRID_COLUMNS * GRID_ROWS
+            page_start = index - index % per_page
+            page = view[page_start:page_start + per_page]
+            if grid_state is None or grid_state[0] != (page_start, tuple(images[page_start:page_start + per_page])):
+                # Generate the thumbnails of this page first and then of the next and the previous page
+                for start in (page_start, page_start + per_page, page_start - per_page):
+                    if 0 <= start < len(view):
+                        thumbnails.request([(files[0], catalog.get(files[0])) for files in view[start:start + per_page]])
+            state = ((page_start, tuple(images[page_start:page_start + per_page])), index, thumbnails.version, len(session_store), scores_version, hide_rejects)
+            if state != grid_state:
+                cells = []
+                for position, files in enumerate(page):
+                    if any(os.path.join(save_directory, name) in session_store for name in files):
+                        color = (0, 255, 0) # Green, selected
+                    elif is_likely_reject(scores.get(files[0]), median_sharpness):
+                        color = (0, 0, 255) # Red, likely reject
+                    else:
+                        color = None
+                    cells.append((thumbnails.get(files[0]), color, f"{page_start + position + 1} {os.path.basename(files[0])}"))
+                cv2.imshow("Latest Picture Viewer", compose_page(cells, cursor=index - page_start))
+                cv2.setWindowTitle("Latest Picture Viewer", f"Contact sheet: page {page_start // per_page + 1}/{(len(images) - 1) // per_page + 1}")
+                grid_state = state
+
+            key = cv2.waitKey(30) # Short wait, the page is drawn again when new thumbnails are ready
+            if key == 27:  # 'Esc' key
+                cv2.destroyAllWindows() # Close all windows
+                thumbnails.close()
+                catalog.close()
+                if not session_store:
+                    return 0
+                else:
+                    return session_store.pictures
+            elif key == ord('a'):  # 'a' key, the previous shot
+                index = max(index - 1, 0)
+            elif key == ord('d'):  # 'd' key, the next shot
+                index = min(index + 1, len(images) - 1)
+            elif key == ord('q'):  # 'q' key, the previous page
+                index = max(index - per_page, 0)
+            elif key == ord('e'):  # 'e' key, the next page
+                index = min(index + per_page, len(images) - 1)
+            elif key == 32:  # 'Space' key selects or deselects the shot under the cursor
+                session_store.toggle_shot([os.path.join(save_directory, name) for name in view[index]])
+            elif key == ord('g'):  # 'g' key, back to the single picture
+                grid_mode = False
+                cv2.setWindowTitle("Latest Picture Viewer", "Latest Picture Viewer")
+                prev_image = None
+                tag_preview = False
+            continue
+
         if images:
             # Get the path of the latest photo file
             latest_file_path = os.path.join(save_directory, images[index])
+            shot_paths = [os.path.join(save_directory, name) for name in view[index]]
             if latest_image != latest_file_path: # Check if the latest image is different from the previous latest image
                 latest_image = latest_file_path
                 print("Latest image path:", latest_image)
@@ -467,7 +915,13 @@ def show_latest_picture(save_directory, selected_pictures): # Show the latest pi
             if tag_preview:
                 pass
             else:
-                if latest_image.lower().endswith(('.nef', '.cr2', '.arw', '.tif', '.tiff')):                
+                entry = catalog.get(latest_image)
+                cache_key = (latest_image, entry['mtime'] if entry else None)
+                cached = frame_cache.get(cache_key)
+                decode_start, decode_started = time.time(), time.perf_counter()
+                if cached is not None:
+                    frame_cache.move_to_end(cache_key)
+                elif latest_image.lower().endswith(('.nef', '.cr2', '.arw', '.tif', '.tiff')):                
                     try:
                         with rawpy.imread(latest_image) as raw:
                             
@@ -479,13 +933,18 @@ def show_latest_picture(save_directory, selected_pictures): # Show the latest pi
                                 # Decode the JPEG data
                                 jpeg_array = np.frombuffer(jpeg_data.data, dtype=np.uint8)
                                 frame = cv2.imdecode(jpeg_array, cv2.IMREAD_COLOR)
+                                # The embedded preview is stored unrotated, use the orientation from the catalog
+                                entry = catalog.get(latest_image)
+                                frame = apply_orientation(frame, entry['orientation'] if entry else None)
                             else:
                                 # If no JPEG preview was found, postprocess the RAW data (this will be slower)
                                 rgb = raw.postprocess()
                                 frame = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
                     except rawpy.LibRawNonFatalError:
                         print("Failed to read the RAW image.")
-                        time.sleep(2)
+                        # The tether publishes complete pictures only (see capture_durability), so waiting longer does
+                        # not help: keep the window responsive and let the user move on
+                        key = cv2.waitKey(200)
                         if key == ord('a'):  # 'a' key
                             index = max(index - 1, 0)
                         elif key == ord('d'):  # 'd' key
@@ -495,9 +954,42 @@ def show_latest_picture(save_directory, selected_pictures): # Show the latest pi
                         continue
                 else:
                     frame = cv2.imread(latest_image)
+                if cached is None and frame is None:
+                    print("Failed to read the image.")
+                    cv2.waitKey(200) # The file may still be written, try again
+                    continue
+                if cached is None:
+                    # Shrink the picture to the display size once and keep it with its overlays
+                    cached = {'frame': fit_display(frame)}
+                    frame_cache[cache_key] = cached
+                    tracer.record('decode', (time.perf_counter() - decode_started) * 1000, decode_start, file=images[index])
+                    while len(frame_cache) > FRAME_CACHE_SIZE:
+                        frame_cache.popitem(last=False)
+                if show_histogram or show_clipping:
+                    if 'overlays' not in cached: # Computed once per frame, within OVERLAY_BUDGET_MS
+                        cached['overlays'] = compute_overlays(cached['frame'], overlay_step)
+                        overlay_step = next_overlay_step(overlay_step, cached['overlays']['milliseconds'])
+                    frame = draw_overlays(cached['frame'], cached['overlays'], show_histogram, show_clipping)
+                else:
+                    frame = cached['frame'].copy()
+                # Show the culling scores of the shot, scaled to the size of the frame
+                shot_scores = scores.get(images[index])
+                font_scale = max(frame.shape[1] / 1500, 0.5)
+                cv2.putText(frame, format_scores(shot_scores), (int(20 * font_scale), int(40 * font_scale)), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), max(int(2 * font_scale), 1), cv2.LINE_AA)
+                # Show the position in the stack if the shot is part of a burst
+                stack = bisect.bisect_right(stack_starts, index) - 1
+                stack_end = stack_starts[stack + 1] if stack + 1 < len(stack_starts) else len(images)
+                if stack_end - stack_starts[stack] > 1:
+                    stack_text = f"Stack {stack + 1}/{len(stack_starts)}: frame {index - stack_starts[stack] + 1}/{stack_end - stack_starts[stack]} (Q/E)"
+                    cv2.putText(frame, stack_text, (int(20 * font_scale), int(80 * font_scale)), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), max(int(2 * font_scale), 1), cv2.LINE_AA)
+                # Show the warning of the storage watchdog when the save folder is almost full
+                if storage_warning:
+                    cv2.putText(frame, storage_warning, (int(20 * font_scale), int(120 * font_scale)), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 255), max(int(2 * font_scale), 1), cv2.LINE_AA)
                 # Check if the latest image is in the selected photos list
-                if latest_image in selected_photos:
+                if any(path in session_store for path in shot_paths):
                     frame = cv2.copyMakeBorder(frame, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=(0, 255, 0))  # Green border
+                elif is_likely_reject(shot_scores, median_sharpness):
+                    frame = cv2.copyMakeBorder(frame, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=(0, 0, 255))  # Red border, likely reject
                 else:
                     frame = cv2.copyMakeBorder(frame, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=(0, 0, 0))  # Black border
                     
@@ -505,7 +997,8 @@ def show_latest_picture(save_directory, selected_pictures): # Show the latest pi
             cv2.setWindowProperty("Latest Picture Viewer", cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN) # Set the window to fullscreen windowed mode
            
             if latest_image != prev_image: #check prev image
-                cv2.imshow("Latest Picture Viewer", frame) # Show the frame
+                with tracer.span('display', file=images[index]):
+                    cv2.imshow("Latest Picture Viewer", frame) # Show the frame
                 prev_image = latest_image
                 print("Image framed: " + latest_image)
             
@@ -514,42 +1007,222 @@ def show_latest_picture(save_directory, selected_pictures): # Show the latest pi
             key = cv2.waitKey(200) # Wait for 1 second before checking for new pictures            
             if key == 27:  # 'Esc' key
                 cv2.destroyAllWindows() # Close all windows
-                if selected_photos == []:
+                if thumbnails is not None:
+                    thumbnails.close()
+                catalog.close()
+                if not session_store:
                     return 0
                 else:
-                    return selected_photos
+                    return session_store.pictures
 
-            elif key == ord('a'):  # 'a' key or left arrow key
-                index = max(index - 1, -len(images)) if index > 0 else index
+            elif key == ord('a'):  # 'a' key or left arrow key, the previous stack
+                stack = bisect.bisect_right(stack_starts, index) - 1
+                index = stack_starts[stack - 1] if stack > 0 else index
                 tag_preview = False
-            elif key == ord('d'):  # 'd' key or right arrow key
-                index = min(index + 1, len(images) - 1) if index < len(images) - 1 else index
+            elif key == ord('d'):  # 'd' key or right arrow key, the next stack
+                stack = bisect.bisect_right(stack_starts, index) - 1
+                index = stack_starts[stack + 1] if stack + 1 < len(stack_starts) else index
+                tag_preview = False
+            elif key in (ord('q'), ord('e')):  # 'q' and 'e' keys, the previous and next frame within a stack
+                stack = bisect.bisect_right(stack_starts, index) - 1
+                stack_end = stack_starts[stack + 1] if stack + 1 < len(stack_starts) else len(images)
+                if key == ord('q'):
+                    index = index - 1 if index > stack_starts[stack] else index
+                else:
+                    index = index + 1 if index + 1 < stack_end else index
+                tag_preview = False
+            elif key in (ord('h'), ord('b')):  # 'h' key shows the histogram, 'b' key shows the clipped highlights and shadows
+                if key == ord('h'):
+                    show_histogram = not show_histogram
+                else:
+                    show_clipping = not show_clipping
+                prev_image = None
+                tag_preview = False
+            elif key == ord('z'):  # 'z' key opens the 100% zoom at the center of the picture
+                try:
+                    zoom_source = TileSource(latest_image)
+                except (OSError, rawpy.LibRawError) as e:
+                    print("Failed to open the picture for the zoom:", e)
+                    zoom_source = None
+                else:
+                    entry = catalog.get(latest_image)
+                    zoom_orientation = entry['orientation'] if entry else None
+                    zoom_center = (zoom_source.width // 2, zoom_source.height // 2)
+                    zoom_state = None
+            elif key == ord('g'):  # 'g' key opens the contact sheet at the current shot
+                grid_mode = True
+                grid_state = None
+                if thumbnails is None:
+                    thumbnails = ThumbnailCache(save_directory)
+            elif key == ord('c'):  # 'c' key collapses or expands the bursts
+                collapse_bursts = not collapse_bursts
+                print("Bursts:", "collapsed into stacks" if collapse_bursts else "expanded")
+                shown_image = images[index] if images else None
+                view, median_sharpness, images, stack_starts = arrange()
+                index = locate(shown_image, index)
+                prev_image = None
                 tag_preview = False
             elif key == 32:  # 'Space' key
-                selected_photo = latest_image
                 prev_image = None
-                if selected_photo in selected_photos:
-                    selected_photos.remove(selected_photo)
-                    tag_preview = False
+                session_store.toggle_shot(shot_paths) # The RAW and JPEG of a shot together, saved to the journal immediately
+                tag_preview = False
+            elif key in (ord('s'), ord('f')):  # 's' key sorts by sharpness, 'f' key hides the likely rejects
+                if key == ord('s'):
+                    sort_by_score = not sort_by_score
+                    print("Order:", "sharpest first" if sort_by_score else "capture time")
                 else:
-                    # Add the selected photo to the list
-                    selected_photos.append(selected_photo)
-                    tag_preview = False
-            else:
-                print("No photos found in the specified directory.")
-                time.sleep(2)
+                    hide_rejects = not hide_rejects
+                    print("Likely rejects:", "hidden" if hide_rejects else "shown")
+                view, median_sharpness, images, stack_starts = arrange()
+                index = 0
+                prev_image = None
+                tag_preview = False
+
+CONFLICT_CHOICES = {'rewrite': 'r', 'rename': 'n', 'skip': 's'} # The answers of the prompt for unattended transfers
+
+def resolve_destination_paths(photo_files, destination_directory, on_conflict=None):
+    """
+    Returns the paths the files of one shot will be copied to in the destination directory.
+
+    The files of a RAW+JPEG pair are handled as one unit: if any of them already exists in the destination
+    directory, the user is prompted once to choose whether to overwrite, rename, or skip the shot.
+    A renamed shot gets the same number suffix for all its files, so the pair stays a pair.
+
+    Args:
+        photo_files (list): The file names of the shot.
+        destination_directory (str): The destination directory.
+        on_conflict (str or None): 'rewrite', 'rename' or 'skip' to decide without a prompt, or None to prompt the user.
+
+    Returns:
+        dict: file name -> destination path, empty if the shot is skipped.
+    """
+    destination_paths = {photo_file: os.path.join(destination_directory, photo_file) for photo_file in photo_files}
+    existing = [photo_file for photo_file, path in destination_paths.items() if os.path.exists(path)]
+    if not existing:
+        return destination_paths
+    if on_conflict is not None:
+        choice = CONFLICT_CHOICES[on_conflict]
+    else:
+        choice = input(f"{', '.join(existing)} already exists in {destination_directory}.\nDo you want to (r)ewrite, (n)rename, or (s)kip?: ")
+    if choice.lower() == "r":
+        return destination_paths
+    elif choice.lower() == "n":
+        # Generate new filenames with a number suffix that is free for every file of the shot
+        n = 1
+        while True:
+            new_paths = {photo_file: os.path.join(destination_directory, os.path.splitext(photo_file)[0] + "_" + str(n) + os.path.splitext(photo_file)[1]) for photo_file in photo_files}
+            if not any(os.path.exists(path) for path in new_paths.values()):
+                return new_paths
+            n += 1
+    else:
+        if on_conflict is None:
+            print(f"\nSkipping {', '.join(photo_files)} in {destination_directory}.\n")
+        return {}
+
+def plan_copy_jobs(session_directory, photo_file_list, destination_directories, on_conflict=None):
+    """
+    Resolves the destination paths of every shot before a copy starts, the files of a RAW+JPEG pair together.
+
+    Args:
+        session_directory (str): The directory where the pictures are saved.
+        photo_file_list (list): The file names of the pictures to copy.
+        destination_directories (list): The destination directories.
+        on_conflict (str or None): How existing files are handled, see `resolve_destination_paths`.
+
+    Returns:
+        list: (source path, {destination directory: destination path}) for every file, the jobs of a `FanOutCopier`.
+    """
+    catalog = SessionCatalog(session_directory)
+    listed = set(photo_file_list)
+    shots = [[name for name in files if name in listed] for files in catalog.shots(descending=False)]
+    catalog.close()
+    grouped = {name for files in shots for name in files}
+    shots = [files for files in shots if files] + [[name] for name in photo_file_list if name not in grouped]
+    jobs = []
+    for files in shots:
+        destinations = {photo_file: {} for photo_file in files}
+        for directory in destination_directories:
+            for photo_file, destination_path in resolve_destination_paths(files, directory, on_conflict).items():
+                destinations[photo_file][directory] = destination_path
+        for photo_file in files:
+            if destinations[photo_file]:
+                jobs.append((os.path.join(session_directory, photo_file), destinations[photo_file]))
+    return jobs
+
+def print_transfer_progress(status, total_files):
+    """
+    Prints one progress line for every destination directory of a transfer.
 
-def copy_captured_pictures(session_directory, destination_directory, selected_pictures, trf_all): # Copy the captured pictures
+    Args:
+        status (dict): The status returned by `FanOutCopier.status`.
+        total_files (int): The number of files in the transfer.
+    """
+    for directory, progress in status.items():
+        line = f"\033[94m{directory}\033[0m: {progress['files']}/{total_files} files, {progress['bytes'] / (1024 * 1024):.1f} MiB"
+        if progress['failed']:
+            line += f" \033[91mstopped: {progress['failed']}\033[0m"
+        print(line)
+
+def get_photo_file_list(session_directory, selected_pictures, trf_all):
+    """
+    Returns the file names of the pictures to transfer.
+
+    If trf_all is True, all photo files in the session directory are returned. If trf_all is False and
+    selected_pictures is not empty, only the selected pictures are returned, together with the other file of
+    their RAW+JPEG pair. Otherwise an error message is printed.
+
+    Args:
+        session_directory (str): The path to the session directory where the captured pictures are located.
+        selected_pictures (list): A list of selected pictures.
+        trf_all (bool): A flag indicating whether to transfer all pictures or only selected pictures.
+
+    Returns:
+        list or None: The file names of the pictures, or None if there is nothing to transfer.
     """
-    Copies all captured pictures in the session directory to the desired destination directory.
+    clear_terminal()
+    
+    if trf_all == True:
+        # All photo files from the session catalog
+        catalog = SessionCatalog(session_directory)
+        catalog.refresh()
+        photo_file_list = catalog.pictures(descending=False)
+        catalog.close()
+        if not photo_file_list:
+            print("No photo files found in the session directory.")
+            return None
+    else:
+        if selected_pictures:
+            # Only selected pictures
+            photo_file_list = [os.path.relpath(file, session_directory) for file in selected_pictures if file.lower().endswith(PHOTO_EXTENSIONS)] # Keeps the subfolder of a sharded session
+            # A selected shot is transferred with all its files, the RAW and the JPEG of a pair
+            catalog = SessionCatalog(session_directory)
+            catalog.refresh()
+            photo_file_list = catalog.shot_files(photo_file_list)
+            catalog.close()
+        else:
+            print("No selected pictures found.")
+            return None
+    
+    clear_terminal()
+    
+    if not photo_file_list: # Check if there are no photo files in the session directory
+        print("No photo files found in the session directory.")
+        return None
+    return photo_file_list
+
+TRANSFER_IO_PRIORITY = (5, 2, 7) # Nice increment, best-effort IO class, lowest level
+
+def copy_captured_pictures(session_directory, destination_directory, selected_pictures, trf_all, rate_limit=None): # Copy the captured pictures
+    """
+    Copies all captured pictures in the session directory to the desired destination directory or directories.
 
     This function takes the path to the session directory where the captured pictures are located,
-    the path to the destination directory where the pictures will be copied,
+    the path to the destination directory where the pictures will be copied (or a list of destination directories),
     a list of selected pictures to be copied (if empty, all pictures will be copied),
     and a flag indicating whether to copy all pictures or only selected pictures.
 
-    The function first checks if the session directory and the destination directory exist.
-    If either directory does not exist, an error message is printed and the function returns.
+    The function first checks if the session directory and the destination directories exist.
+    If a directory does not exist, an error message is printed and the function returns.
 
     Next, the function gets the list of files in the session directory and filters the file list
     based on the selected_pictures and trf_all parameters. If trf_all is True, all photo files in
@@ -560,136 +1233,265 @@ def copy_captured_pictures(session_directory, destination_directory, selected_pi
     After filtering the file list, the function checks if there are any photo files to be copied.
     If there are no photo files, an error message is printed and the function returns.
 
-    Finally, the function iterates over each photo file in the filtered list and copies it to the
-    destination directory. If the destination file already exists, the user is prompted to choose
-    whether to overwrite, rename, or skip the file. If the file is successfully copied, a success
-    message is printed. If an error occurs during the copying process, an error message is printed.
+    For every shot and destination directory that already contains a file of the shot, the user is prompted
+    to choose whether to overwrite, rename, or skip the shot; the RAW and JPEG of a pair are handled as one unit. The files are then copied with a `FanOutCopier`,
+    which reads every source file once and writes it to all destination directories at the same time.
+    The progress of every destination is printed after each file. A destination that fails, for example
+    because the drive is full, stops on its own and does not stop the other destinations.
+
+    The transfer threads run with a lower CPU and IO priority and the bandwidth is limited by a `TransferThrottle`.
+    The throttle slows the transfer down automatically while a tether session is downloading into the session
+    directory or the backup mirror is behind, so a transfer can run during a capture session.
 
     Args:
         session_directory (str): The path to the session directory where the captured pictures are located.
-        destination_directory (str): The path to the destination directory where the pictures will be copied.
+        destination_directory (str or list): The path to the destination directory, or a list of destination directories.
         selected_pictures (list): A list of selected pictures to be copied. If empty, all pictures will be copied.
         trf_all (bool): A flag indicating whether to copy all pictures or only selected pictures.
+        rate_limit (int or None): The bandwidth limit in bytes per second, or None for no limit.
 
     Returns:
         None
     """
-    num_errors = 0
+    if isinstance(destination_directory, (list, tuple)):
+        destination_directories = list(destination_directory)
+    else:
+        destination_directories = [destination_directory]
+
     # Check if the session directory exists
     if not os.path.exists(session_directory):
         print("Session directory does not exist.")
         return
     
-    # Check if the destination directory exists
-    if not os.path.exists(destination_directory):
-        print("Destination directory does not exist.")
-        return
-    
-    # Get the list of files in the session directory
-    file_list = os.listdir(session_directory)
-    
-    clear_terminal()
-    
-    if trf_all == True:
-        # Copy all photo files
-        photo_file_list = [file for file in file_list if file.lower().endswith(('.nef', '.cr2', '.arw', '.jpg', '.jpeg', '.png', '.tif', '.tiff'))]
-        if not photo_file_list:
-            print("No photo files found in the session directory.")
-            return
-    else:
-        if selected_pictures:
-            # Copy only selected pictures
-            photo_file_list = [os.path.basename(file) for file in selected_pictures if file.lower().endswith(('.nef', '.cr2', '.arw', '.jpg', '.jpeg', '.png', '.tif', '.tiff'))]
-        else:
-            print("No selected pictures found.")
+    # Check if the destination directories exist
+    for directory in destination_directories:
+        if not os.path.exists(directory):
+            print(f"Destination directory {directory} does not exist.")
             return
     
-    clear_terminal()
-    
-    if not photo_file_list: # Check if there are no photo files in the session directory
-        print("No photo files found in the session directory.")
+    photo_file_list = get_photo_file_list(session_directory, selected_pictures, trf_all)
+    if not photo_file_list:
         return
-    # Copy each photo file to the destination directory
-    for photo_file in photo_file_list:
-        source_path = os.path.join(session_directory, photo_file)
-        destination_path = os.path.join(destination_directory, photo_file)
-        try:
-            if os.path.exists(destination_path):
-                choice = input(f"{photo_file} already exists in {destination_directory}.\nDo you want to (r)ewrite, (n)rename, or (s)kip?: ")
-                if choice.lower() == "r":
-                    shutil.copy2(source_path, destination_path)
-                    print(f"\nSuccessfully overwritten {photo_file} in {destination_directory}.\n")
-                elif choice.lower() == "n":
-                    # Generate a new filename with a number suffix
-                    n = 1
-                    new_filename = os.path.splitext(photo_file)[0] + "_" + str(n) + os.path.splitext(photo_file)[1]
-                    new_destination_path = os.path.join(destination_directory, new_filename)
-                    while os.path.exists(new_destination_path):
-                        n += 1
-                        new_filename = os.path.splitext(photo_file)[0] + "_" + str(n) + os.path.splitext(photo_file)[1]
-                        new_destination_path = os.path.join(destination_directory, new_filename)
-    
-                    shutil.copy2(source_path, new_destination_path)
-                    print(f"\nSuccessfully renamed and copied {photo_file} to {new_destination_path}.\n")
-                else:
-                    print(f"\nSkipping {photo_file}.\n")
-            else:
-                shutil.copy2(source_path, destination_path)
-                print(f"\nSuccessfully copied {photo_file} to {destination_directory}.\n")
-        except shutil.Error as e:
-            print(f"Failed to copy {photo_file}: {e}")
-            num_errors += 1
-        except IOError as e:
-            print(f"Failed to copy {photo_file}: {e}")
-            num_errors += 1
+
+    jobs = plan_copy_jobs(session_directory, photo_file_list, destination_directories)
+
+    # Copy each photo file to all destination directories with one read of the source file
+    def show_progress(status):
+        clear_terminal()
+        print_transfer_progress(status, len(jobs))
+        if throttle.under_pressure:
+            print("\033[38;5;202mCapture in progress, transfer slowed down.\033[0m")
+
+    throttle = TransferThrottle(rate_limit, session_directory)
+    tracer = Tracer(session_directory, 'transfer')
+    copier = FanOutCopier(destination_directories, throttle=throttle, io_priority=TRANSFER_IO_PRIORITY, tracer=tracer)
+    status = copier.copy(jobs, progress=show_progress)
+    tracer.flush()
+
+    num_errors = 0
+    for directory, progress in status.items():
+        for photo_file, error in progress['errors']:
+            print(f"Failed to copy {photo_file} to {directory}: {error}")
+        num_errors += len(progress['errors'])
+        skipped = sum(1 for _, destinations in jobs if directory in destinations) - progress['files'] - len(progress['errors'])
+        if progress['failed'] and skipped > 0:
+            print(f"\033[91m{skipped} photo files were not copied to {directory}.\033[0m")
+            num_errors += skipped
 
     if num_errors == 0:
         print("\033[92mAll photo files copied successfully.\033[0m")
     else:
         print(f"Failed to copy \033[91m{num_errors}\033[0m photo files.")
-    time.sleep(2)
+    wait_for_keypress()
+
+def export_captured_pictures(session_directory, destination_directory, selected_pictures, trf_all, rate_limit=None): # Export the captured pictures as an archive
+    """
+    Exports the captured pictures and their sidecar files as one tar or store-only zip archive.
+
+    The user is asked for the archive format and an optional volume size. The archive is streamed to the
+    first destination directory with `export_archive` and then copied to the other destination directories
+    with a `FanOutCopier`, so the session is read only once. The export is throttled like `copy_captured_pictures`.
+
+    Args:
+        session_directory (str): The path to the session directory where the captured pictures are located.
+        destination_directory (str or list): The path to the destination directory, or a list of destination directories.
+        selected_pictures (list): A list of selected pictures to be exported.
+        trf_all (bool): A flag indicating whether to export all pictures or only selected pictures.
+        rate_limit (int or None): The bandwidth limit in bytes per second, or None for no limit.
+
+    Returns:
+        None
+    """
+    if isinstance(destination_directory, (list, tuple)):
+        destination_directories = list(destination_directory)
+    else:
+        destination_directories = [destination_directory]
+
+    photo_file_list = get_photo_file_list(session_directory, selected_pictures, trf_all)
+    if not photo_file_list:
+        return
+
+    archive_format = input("Archive format (t)ar or (z)ip: ")
+    while archive_format.lower() not in ("t", "z"):
+        print("Invalid input. Please enter 't' or 'z'.")
+        archive_format = input("Archive format (t)ar or (z)ip: ")
+    archive_format = "tar" if archive_format.lower() == "t" else "zip"
+
+    volume_size = None
+    volume_mb = input("Split into volumes of how many MB? (Enter for one file): ")
+    if volume_mb.strip().isdigit() and int(volume_mb) > 0:
+        volume_size = int(volume_mb) * 1024 * 1024
+
+    archive_name = os.path.basename(os.path.normpath(session_directory)) + "-" + time.strftime("%Y%m%d-%H%M%S")
+    total_bytes = sum(os.path.getsize(os.path.join(session_directory, photo_file)) for photo_file in photo_file_list)
+    start = time.time()
+
+    def show_progress(count, exported_bytes):
+        elapsed = max(time.time() - start, 0.001)
+        print(f"\rExported {count}/{len(photo_file_list)} pictures, {exported_bytes / (1024 * 1024):.1f}/{total_bytes / (1024 * 1024):.1f} MiB ({exported_bytes / (1024 * 1024) / elapsed:.1f} MiB/s)", end="")
+
+    throttle = TransferThrottle(rate_limit, session_directory)
+    try:
+        index = export_archive(session_directory, destination_directories[0], photo_file_list, archive_name, archive_format, volume_size, progress=show_progress, throttle=throttle)
+    except (OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+        print(f"\n\033[91mFailed to export the archive: {e}\033[0m")
+        wait_for_keypress()
+        return
+    print(f"\n\033[92mExported {len(index['files'])} files to {', '.join(index['volumes'])}.\033[0m")
+
+    if len(destination_directories) > 1:
+        archive_files = index['volumes'] + [index['archive'] + '.index.json']
+        jobs = [(os.path.join(destination_directories[0], name), {directory: os.path.join(directory, name) for directory in destination_directories[1:]}) for name in archive_files]
+        status = FanOutCopier(destination_directories[1:], throttle=throttle, io_priority=TRANSFER_IO_PRIORITY).copy(jobs)
+        print_transfer_progress(status, len(jobs))
+    wait_for_keypress()
+
+def export_proof_pictures(session_directory, destination_directory, selected_pictures, trf_all, rate_limit=None): # Export resized JPEG files
+    """
+    Exports the pictures as resized JPEG files, for example proofs for a client after culling.
+
+    The user is asked for the long edge, the JPEG quality and whether RAW files without a camera JPEG may use their
+    embedded preview. The JPEG files are rendered on all cores with `export_proofs` into a 'proofs' folder in the
+    first destination directory and then copied to the other destination directories with a `FanOutCopier`.
+    The time of every stage and the number of pictures per second are printed when the export is done.
+
+    Args:
+        session_directory (str): The path to the session directory where the captured pictures are located.
+        destination_directory (str or list): The path to the destination directory, or a list of destination directories.
+        selected_pictures (list): A list of selected pictures to be exported.
+        trf_all (bool): A flag indicating whether to export all pictures or only selected pictures.
+        rate_limit (int or None): The bandwidth limit in bytes per second for the copies, or None for no limit.
+
+    Returns:
+        None
+    """
+    if isinstance(destination_directory, (list, tuple)):
+        destination_directories = list(destination_directory)
+    else:
+        destination_directories = [destination_directory]
+
+    photo_file_list = get_photo_file_list(session_directory, selected_pictures, trf_all)
+    if not photo_file_list:
+        return
+
+    long_edge = input(f"Long edge in pixels (Enter for {DEFAULT_LONG_EDGE}): ")
+    long_edge = int(long_edge) if long_edge.strip().isdigit() and int(long_edge) > 0 else DEFAULT_LONG_EDGE
+    quality = input(f"JPEG quality 1-100 (Enter for {DEFAULT_QUALITY}): ")
+    quality = min(int(quality), 100) if quality.strip().isdigit() and int(quality) > 0 else DEFAULT_QUALITY
+    use_preview = input("Use the embedded preview of RAW files when it is large enough? (y/n): ").lower() != "n"
+
+    output_directory = os.path.join(destination_directories[0], PROOF_DIRECTORY)
+
+    def show_progress(done, total):
+        print(f"\rRendered {done}/{total} pictures", end="")
+
+    report = export_proofs(session_directory, output_directory, photo_file_list, long_edge, quality, use_preview, progress=show_progress)
+    print()
+    for line in format_export_report(report):
+        print(f"\033[92m{line}\033[0m")
+    for source, error in report['errors']:
+        print(f"\033[91mFailed to export {os.path.basename(source)}: {error}\033[0m")
+
+    if len(destination_directories) > 1 and report['files']:
+        throttle = TransferThrottle(rate_limit, session_directory)
+        jobs = [(path, {directory: os.path.join(directory, PROOF_DIRECTORY, os.path.basename(path)) for directory in destination_directories[1:]}) for path in report['files']]
+        for directory in destination_directories[1:]:
+            os.makedirs(os.path.join(directory, PROOF_DIRECTORY), exist_ok=True)
+        status = FanOutCopier(destination_directories[1:], throttle=throttle, io_priority=TRANSFER_IO_PRIORITY).copy(jobs)
+        print_transfer_progress(status, len(jobs))
+    wait_for_keypress()
 
 def copy_confirm(save_directory, destination_directory, selected_pictures): # Copy the selected pictures
     """
     Prompt the user for transfer options and perform the selected picture transfer.
 
     This function allows the user to choose between different transfer options and performs the selected picture transfer.
-    The function uses the `copy_captured_pictures` function to copy the pictures.
+    The function uses the `copy_captured_pictures` function to copy the pictures, `export_captured_pictures` to export
+    them as an archive and `export_proof_pictures` to export them as resized JPEG files.
 
     Args:
         save_directory (str): The directory where the captured pictures are saved.
-        destination_directory (str): The directory where the selected pictures will be copied.
+        destination_directory (str or list): The directory, or list of directories, where the selected pictures will be copied.
         selected_pictures (list): A list of selected pictures to be copied.
 
     Returns:
         int: 0 if the transfer is cancelled.
     """    
+    rate_limit = None # Bandwidth limit in bytes per second
     while True: # Check if the transfer is not cancelled
         clear_terminal()
         print("\033[94mSource directory:\033[0m", save_directory)
-        print("\033[94mDestination directory:\033[0m", destination_directory)
+        if isinstance(destination_directory, (list, tuple)):
+            print("\033[94mDestination directories:\033[0m", ", ".join(destination_directory))
+        else:
+            print("\033[94mDestination directory:\033[0m", destination_directory)
         print("1. Copy all captured pictures")
         print("2. Copy all selected pictures")
-        print("3. Show list of selected pictures")
-        print("4. Cancel")
+        print("3. Export all captured pictures as archive")
+        print("4. Export all selected pictures as archive")
+        print("5. Export all selected pictures as resized JPEG")
+        print("6. Show list of selected pictures")
+        print("7. Bandwidth limit (Current:", f"{rate_limit / (1024 * 1024):.0f} MB/s" if rate_limit else "unlimited", ")")
+        print("8. Cancel")
         trf_all = None
-        transfer_choice = input("Enter your choice (1-4): ")
+        transfer_choice = input("Enter your choice (1-8): ")
 
         if transfer_choice == "1": # Copy all captured pictures
             print("Copying all captured pictures to the destination directory...")
             trf_all = True
-            copy_captured_pictures(save_directory, destination_directory, selected_pictures, trf_all) # Copy all captured pictures to the destination directory
+            copy_captured_pictures(save_directory, destination_directory, selected_pictures, trf_all, rate_limit) # Copy all captured pictures to the destination directory
             print("\nPicture copy done.\n")
             break
 
         elif transfer_choice == "2": # Copy only selected pictures
             print("Copying selected pictures to the destination directory...")
             trf_all = False
-            copy_captured_pictures(save_directory, destination_directory, selected_pictures, trf_all) # Copy selected pictures to the destination directory
+            copy_captured_pictures(save_directory, destination_directory, selected_pictures, trf_all, rate_limit) # Copy selected pictures to the destination directory
             print("\nPicture copy done.\n")
             break
 
-        elif transfer_choice == "3": # Show list of selected pictures
+        elif transfer_choice == "3": # Export all captured pictures as archive
+            print("Exporting all captured pictures to the destination directory...")
+            trf_all = True
+            export_captured_pictures(save_directory, destination_directory, selected_pictures, trf_all, rate_limit)
+            print("\nPicture export done.\n")
+            break
+
+        elif transfer_choice == "4": # Export only selected pictures as archive
+            print("Exporting selected pictures to the destination directory...")
+            trf_all = False
+            export_captured_pictures(save_directory, destination_directory, selected_pictures, trf_all, rate_limit)
+            print("\nPicture export done.\n")
+            break
+
+        elif transfer_choice == "5": # Export only selected pictures as resized JPEG
+            print("Exporting selected pictures as resized JPEG to the destination directory...")
+            trf_all = False
+            export_proof_pictures(save_directory, destination_directory, selected_pictures, trf_all, rate_limit)
+            print("\nPicture export done.\n")
+            break
+
+        elif transfer_choice == "6": # Show list of selected pictures
             print("Selected pictures:")
             if not selected_pictures:
                 print("No selected pictures.")
@@ -698,14 +1500,20 @@ def copy_confirm(save_directory, destination_directory, selected_pictures): # Co
                     print(picture)
             wait_for_keypress()
 
-        elif transfer_choice == "4": # Go back
+        elif transfer_choice == "7": # Bandwidth limit
+            limit = input("Enter the bandwidth limit in MB/s (0 for unlimited): ")
+            if limit.strip().isdigit():
+                rate_limit = int(limit) * 1024 * 1024 if int(limit) > 0 else None
+            else:
+                show_notice("\033[91mInvalid bandwidth limit.\033[0m")
+
+        elif transfer_choice == "8": # Go back
             print("Picture transfer cancelled.")
             wait_for_keypress()
             return 0
 
         else:
-            print("\033[91mInvalid choice. Please try again.\033[0m")
-            time.sleep(1)  # Simulating delay before showing the menu again
+            show_notice("\033[91mInvalid choice. Please try again.\033[0m")
 #TO DO list
 # continuous photo viewer add some kind of exit option xxx
 # add a way that the user is warnend if the copied file already exists x
@@ -0,0 +1,258 @@
+"""
+This module makes the tether write every captured picture under a temporary name and publishes it with an atomic rename.
+
+gphoto2 saves a tethered picture as '.<name>.part' (see `temp_pattern`), which the session catalog, the viewer and
+the backup mirror ignore. When the download is complete the tether hook renames it to its final name
+(`publish_capture`), so a reader only ever sees complete pictures, and flushes it (`sync_capture`).
+
+How often the pictures are flushed to the disk (fsync) is a trade-off between safety and throughput:
+- 'file': Every picture is flushed before it is renamed, and the folder after the rename. A power cut never
+  leaves a renamed picture with missing data, every picture costs one or two disk flushes.
+- 'batch': The pictures are renamed at once and flushed together when `batch_files` pictures are waiting, when
+  the open batch is older than `batch_ms` milliseconds and when the tether stops. The age is checked when the
+  next picture arrives and by a `BatchFlusher` thread while the tether runs, so the last pictures of a burst do
+  not wait for the next shot. A burst costs one flush per batch, a power cut can lose the open batch.
+- 'none': The operating system writes the pictures when it likes, the fastest and the least safe.
+
+The tether hook runs once per picture, so the pictures of the open batch are kept in the session catalog. The hook
+and the flusher run in different processes, so they take the write lock of the catalog before they read the batch.
+
+Libraries used:
+- os: Provides the renames and the flushes.
+- json: Provides the list of the pictures of the open batch in the catalog.
+- time: Provides the age of the open batch.
+- sqlite3: Provides the errors of a busy catalog.
+- threading: Provides the flusher thread.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+
+POLICIES = ('file', 'batch', 'none')
+DEFAULT_POLICY = 'batch'
+BATCH_FILES = 10 # Pictures per flush of the 'batch' policy
+BATCH_MS = 1000 # Maximum age of the open batch of the 'batch' policy
+MIN_FLUSH_WAIT = 0.1 # Seconds the flusher waits at least between two checks
+TEMP_PREFIX = '.'
+TEMP_SUFFIX = '.part'
+
+def describe_policy(policy, batch_files=BATCH_FILES, batch_ms=BATCH_MS):
+    """
+    Returns the name of a policy for the menu.
+    """
+    if policy == 'file':
+        return "Flush every picture"
+    if policy == 'batch':
+        return f"Flush every {batch_files} pictures or {batch_ms} ms"
+    return "No flush"
+
+def temp_pattern(name_pattern):
+    """
+    Returns the temporary form of a gphoto2 --filename pattern, for example '.%f.%C.part' for '%f.%C'.
+    """
+    folder, name = os.path.split(name_pattern)
+    return os.path.join(folder, TEMP_PREFIX + name + TEMP_SUFFIX)
+
+def final_path(path):
+    """
+    Returns the final path of a temporary file, or the path itself if it is not a temporary file.
+    """
+    folder, name = os.path.split(path)
+    if name.startswith(TEMP_PREFIX) and name.endswith(TEMP_SUFFIX):
+        return os.path.join(folder, name[len(TEMP_PREFIX):-len(TEMP_SUFFIX)])
+    return path
+
+def fsync_path(path):
+    """
+    Flushes a file or a folder to the disk, ignoring files that are gone.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass # Some file systems can not flush folders
+    finally:
+        os.close(fd)
+
+def flush_paths(paths):
+    """
+    Flushes pictures and then their folders, every folder once.
+    """
+    for path in paths:
+        fsync_path(path)
+    for folder in sorted({os.path.dirname(path) for path in paths}):
+        fsync_path(folder)
+
+def load_batch(catalog):
+    """
+    Returns the pictures of the open batch of a session and the time of the last flush.
+    """
+    try:
+        pending = json.loads(catalog.get_state('durability_pending', '[]'))
+    except ValueError:
+        pending = []
+    return pending, catalog.get_state('durability_flushed', 0)
+
+def lock_batch(catalog):
+    """
+    Takes the write lock of the catalog for the transaction of a `with catalog.connection` block, so no other
+    process changes the open batch between reading and writing it.
+    """
+    catalog.connection.execute("BEGIN IMMEDIATE")
+
+def publish_capture(catalog, path):
+    """
+    Renames a downloaded picture to its final name, after flushing it if the session uses the 'file' policy.
+
+    Args:
+        catalog (SessionCatalog): The catalog of the save directory, it holds the policy.
+        path (str): The path gphoto2 saved the picture to, usually a temporary name (see `temp_pattern`).
+
+    Returns:
+        str: The final path of the picture.
+    """
+    destination = final_path(path)
+    if catalog.durability()[0] == 'file':
+        fsync_path(path)
+    if destination != path:
+        os.replace(path, destination)
+    return destination
+
+def sync_capture(catalog, path):
+    """
+    Flushes a published picture according to the policy of the session, once it is in its final folder.
+
+    With the 'file' policy the folder is flushed, so the rename survives a power cut. With the 'batch' policy the
+    picture joins the open batch, which is flushed when it is full or too old.
+
+    Args:
+        catalog (SessionCatalog): The catalog of the save directory, it holds the policy and the open batch.
+        path (str): The final path of the picture.
+    """
+    policy, batch_files, batch_ms = catalog.durability()
+    if policy == 'file':
+        fsync_path(os.path.dirname(path))
+    elif policy == 'batch':
+        with catalog.connection:
+            lock_batch(catalog)
+            pending, flushed = load_batch(catalog)
+            pending.append(path)
+            now = time.time()
+            if len(pending) >= batch_files or (now - flushed) * 1000 >= batch_ms:
+                flush_paths(pending)
+                pending, flushed = [], now
+            catalog.set_state('durability_pending', json.dumps(pending))
+            catalog.set_state('durability_flushed', flushed)
+
+def flush_batch(catalog):
+    """
+    Flushes the open batch of a session, called when the tether stops.
+    """
+    with catalog.connection:
+        lock_batch(catalog)
+        pending, _ = load_batch(catalog)
+        flush_paths(pending)
+        catalog.set_state('durability_pending', '[]')
+        catalog.set_state('durability_flushed', time.time())
+
+def flush_due(catalog):
+    """
+    Flushes the open batch of a session if it is older than `batch_ms`, called by the `BatchFlusher`.
+
+    Returns:
+        float: The seconds until the open batch is due, or `batch_ms` in seconds if nothing is waiting.
+    """
+    policy, _, batch_ms = catalog.durability()
+    if policy != 'batch':
+        return batch_ms / 1000
+    with catalog.connection:
+        lock_batch(catalog)
+        pending, flushed = load_batch(catalog)
+        now = time.time()
+        if pending and (now - flushed) * 1000 < batch_ms:
+            return flushed + batch_ms / 1000 - now
+        if pending:
+            flush_paths(pending)
+            catalog.set_state('durability_pending', '[]')
+            catalog.set_state('durability_flushed', now)
+    return batch_ms / 1000
+
+class BatchFlusher(threading.Thread):
+    """
+    Flushes the open batch of a tether session once it is `batch_ms` old, while the tether runs.
+
+    Attributes:
+        save_directory (str): The folder the tether saves into, it is changed when the tether switches folders.
+    """
+
+    def __init__(self, save_directory):
+        super().__init__(name='batch-flusher', daemon=True)
+        self.save_directory = save_directory
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+        self.join(timeout=5)
+
+    def run(self):
+        from session_catalog import SessionCatalog # session_catalog imports this module for the policies
+        catalog = None
+        while not self.stopping.is_set():
+            wait = BATCH_MS / 1000
+            try:
+                if catalog is not None and catalog.save_directory != self.save_directory:
+                    catalog.close()
+                    catalog = None
+                if catalog is None:
+                    catalog = SessionCatalog(self.save_directory)
+                wait = flush_due(catalog)
+            except (OSError, sqlite3.Error):
+                pass # The catalog is busy or the folder is not available right now, try again later
+            self.stopping.wait(max(wait, MIN_FLUSH_WAIT))
+        if catalog is not None:
+            catalog.close()
+
+class CaptureWriter:
+    """
+    Writes pictures under a temporary name and flushes them by a policy, for the downloads that run in one process
+    (the camera ingest), so the open batch is kept in memory instead of the catalog.
+    """
+
+    def __init__(self, policy=DEFAULT_POLICY, batch_files=BATCH_FILES, batch_ms=BATCH_MS):
+        self.policy = policy
+        self.batch_files = batch_files
+        self.batch_ms = batch_ms
+        self.pending = []
+        self.flushed = time.monotonic()
+
+    def write(self, path, data):
+        """
+        Writes the data of a picture to its temporary name, renames it to `path` and flushes it by the policy.
+        """
+        folder, name = os.path.split(path)
+        temp_path = os.path.join(folder, TEMP_PREFIX + name + TEMP_SUFFIX)
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            if self.policy == 'file':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        if self.policy == 'file':
+            fsync_path(folder)
+        elif self.policy == 'batch':
+            self.pending.append(path)
+            if len(self.pending) >= self.batch_files or (time.monotonic() - self.flushed) * 1000 >= self.batch_ms:
+                self.flush()
+
+    def flush(self):
+        """
+        Flushes the open batch, called after the last picture.
+        """
+        flush_paths(self.pending)
+        self.pending = []
+        self.flushed = time.monotonic()
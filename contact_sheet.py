@@ -0,0 +1,184 @@
+"""
+This module provides the contact sheet of the picture viewer: a grid of small previews of many shots.
+
+The thumbnails are made from the smallest source that is large enough: a JPEG is decoded at a reduced size
+by the JPEG decoder itself and a RAW file uses its embedded preview. They are generated in batches by worker
+threads (OpenCV releases the GIL while decoding) and cached in memory and in the '.thumbnails' folder of the
+save directory, so a session is only decoded once.
+
+A page is composited from the cached thumbnails with NumPy slicing into one canvas, which the viewer shows with
+a single imshow. Thumbnails that are not ready yet are drawn as empty cells and filled in when they arrive.
+
+Libraries used:
+- os: Provides a way to interact with the operating system, such as file operations.
+- threading: Provides the lock of the cache.
+- collections: Provides the ordered dictionary for the least recently used cache.
+- concurrent.futures: Provides the worker threads.
+- cv2: Provides the image decoding, resizing and drawing.
+- numpy: Provides the canvas.
+- rawpy: Provides the thumbnail of RAW files without a known preview.
+- image_analysis: Provides the reduced JPEG decoding and the rotation of embedded previews.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from lazy_imports import lazy_module
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+rawpy = lazy_module('rawpy')
+from image_analysis import apply_orientation, reduced_decode_flag
+
+THUMBNAIL_DIRECTORY = '.thumbnails'
+THUMBNAIL_SIZE = 256 # The long edge of a thumbnail in pixels
+CELL_BORDER = 6
+GRID_COLUMNS = 6
+GRID_ROWS = 4
+
+def thumbnail_path(save_directory, name):
+    """
+    Returns the path of the cached thumbnail of a picture.
+    """
+    return os.path.join(save_directory, THUMBNAIL_DIRECTORY, name.replace(os.sep, '_') + '.jpg')
+
+def make_thumbnail(path, entry=None, size=THUMBNAIL_SIZE):
+    """
+    Decodes a picture as a thumbnail that fits into a square of `size` pixels.
+
+    Args:
+        path (str): The path to the picture.
+        entry (dict): The catalog entry of the picture with its dimensions, orientation and preview position, or None.
+        size (int): The long edge of the thumbnail in pixels.
+
+    Returns:
+        numpy.ndarray or None: The thumbnail, or None if the picture can not be decoded.
+    """
+    entry = entry or {}
+    if path.lower().endswith(('.jpg', '.jpeg')):
+        frame = cv2.imread(path, reduced_decode_flag(max(entry.get('width') or 0, entry.get('height') or 0), size, color=True))
+    elif entry.get('preview_offset') is not None and entry.get('preview_length'):
+        with open(path, 'rb') as f:
+            f.seek(entry['preview_offset'])
+            data = np.frombuffer(f.read(entry['preview_length']), dtype=np.uint8)
+        frame = cv2.imdecode(data, cv2.IMREAD_REDUCED_COLOR_2)
+        if frame is not None:
+            frame = apply_orientation(frame, entry.get('orientation')) # The embedded preview is stored unrotated
+    elif path.lower().endswith(('.nef', '.cr2', '.arw')):
+        with rawpy.imread(path) as raw:
+            thumb = raw.extract_thumb()
+        if thumb.format != rawpy.ThumbFormat.JPEG:
+            return None
+        frame = cv2.imdecode(np.frombuffer(thumb.data, dtype=np.uint8), cv2.IMREAD_REDUCED_COLOR_2)
+    else:
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+    if frame is None:
+        return None
+    scale = size / max(frame.shape[:2])
+    if scale < 1:
+        frame = cv2.resize(frame, (max(round(frame.shape[1] * scale), 1), max(round(frame.shape[0] * scale), 1)), interpolation=cv2.INTER_AREA)
+    return frame
+
+class ThumbnailCache:
+    """
+    Generates thumbnails in worker threads and keeps the most recently used ones in memory.
+
+    Attributes:
+        save_directory (str): The directory where the pictures are saved.
+        size (int): The long edge of the thumbnails in pixels.
+        capacity (int): The maximum number of thumbnails in memory.
+        version (int): Changes whenever a thumbnail is ready, so the viewer knows when to draw the page again.
+    """
+
+    def __init__(self, save_directory, size=THUMBNAIL_SIZE, workers=4, capacity=1000):
+        self.save_directory = save_directory
+        self.size = size
+        self.capacity = capacity
+        self.thumbnails = OrderedDict()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.version = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+
+    def get(self, name):
+        """
+        Returns the thumbnail of a picture, or None if it is not ready yet.
+        """
+        with self.lock:
+            thumbnail = self.thumbnails.get(name)
+            if thumbnail is not None:
+                self.thumbnails.move_to_end(name)
+            return thumbnail
+
+    def request(self, entries):
+        """
+        Queues a batch of pictures for the worker threads, the pictures that are cached or queued already are skipped.
+
+        Args:
+            entries (list): (name, catalog entry) for every picture.
+        """
+        with self.lock:
+            batch = [(name, entry) for name, entry in entries if name not in self.thumbnails and name not in self.pending]
+            self.pending.update(name for name, _ in batch)
+        for name, entry in batch:
+            self.executor.submit(self.load, name, entry)
+
+    def load(self, name, entry):
+        """
+        Loads a thumbnail from the disk cache or generates it. This runs in a worker thread.
+        """
+        path = os.path.join(self.save_directory, name)
+        cached_path = thumbnail_path(self.save_directory, name)
+        thumbnail = None
+        try:
+            if os.path.exists(cached_path) and os.path.getmtime(cached_path) >= os.path.getmtime(path):
+                thumbnail = cv2.imread(cached_path, cv2.IMREAD_COLOR)
+            if thumbnail is None:
+                thumbnail = make_thumbnail(path, entry, self.size)
+                if thumbnail is not None:
+                    os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+                    cv2.imwrite(cached_path, thumbnail, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        except (OSError, cv2.error, rawpy.LibRawError):
+            thumbnail = None
+        if thumbnail is None:
+            thumbnail = np.zeros((1, 1, 3), dtype=np.uint8) # Do not try again, draw an empty cell
+        with self.lock:
+            self.pending.discard(name)
+            self.thumbnails[name] = thumbnail
+            while len(self.thumbnails) > self.capacity:
+                self.thumbnails.popitem(last=False)
+            self.version += 1
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def compose_page(cells, columns=GRID_COLUMNS, rows=GRID_ROWS, size=THUMBNAIL_SIZE, cursor=None):
+    """
+    Composites the thumbnails of one page into a single canvas.
+
+    Args:
+        cells (list): (thumbnail or None, border color or None, label) for every cell of the page, row by row.
+        columns (int): The number of columns of the grid.
+        rows (int): The number of rows of the grid.
+        size (int): The long edge of the thumbnails in pixels.
+        cursor (int): The cell with the cursor, which gets a white frame, or None.
+
+    Returns:
+        numpy.ndarray: The canvas of the page.
+    """
+    cell = size + 2 * CELL_BORDER
+    canvas = np.zeros((rows * cell, columns * cell, 3), dtype=np.uint8)
+    for position, (thumbnail, color, label) in enumerate(cells[:columns * rows]):
+        top, left = (position // columns) * cell, (position % columns) * cell
+        if color is not None:
+            canvas[top:top + cell, left:left + cell] = color
+        canvas[top + CELL_BORDER:top + cell - CELL_BORDER, left + CELL_BORDER:left + cell - CELL_BORDER] = 32 # Dark gray cell
+        if thumbnail is not None and thumbnail.shape[0] > 1:
+            height, width = thumbnail.shape[:2]
+            y = top + CELL_BORDER + (size - height) // 2
+            x = left + CELL_BORDER + (size - width) // 2
+            canvas[y:y + height, x:x + width] = thumbnail
+        if label:
+            cv2.putText(canvas, label, (left + CELL_BORDER + 4, top + cell - CELL_BORDER - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
+        if position == cursor:
+            cv2.rectangle(canvas, (left, top), (left + cell - 1, top + cell - 1), (255, 255, 255), 3)
+    return canvas
@@ -0,0 +1,581 @@
+"""
+This module provides the headless mode of the application: a tether session that is controlled through a local socket.
+
+The daemon (tether_daemon.py) runs a `TetherController` behind a local socket server, and the command line tool
+(tether_ctl.py) or any other program sends it commands. Nothing is ever asked on the terminal, so a rig such as
+a product turntable can drive a whole session unattended.
+
+The protocol is one JSON object per line in both directions:
+
+    -> {"command": "set_filename", "prefix": "turntable"}
+    <- {"ok": true, "result": {"filename": "turntable"}}
+    <- {"ok": false, "error": "The tether is not running."}
+
+The server listens on a Unix socket, or on a TCP port of 127.0.0.1 where Unix sockets are not available.
+It is never reachable from other computers.
+
+Commands (the arguments are the keys of the request):
+- status: The save folder, filename, tether, camera, storage, selection and transfer state.
+- set_save_directory(path): Changes the save folder, not while the tether runs.
+- set_filename(prefix): Changes the prefix of the file names, an empty prefix keeps the names of the camera.
+- set_layout(layout, frames): Changes the folder layout of the session ('flat', 'hour' or 'frames'), see session_layout.
+- set_durability(policy, batch_files, batch_ms): Changes how often the tethered pictures are flushed to the disk
+  ('file', 'batch' or 'none'), see capture_durability. It applies to the next picture, also while the tether runs.
+- start_tether, stop_tether: Start and stop the gphoto2 tether (and the backup mirror if there are backup folders).
+  While the tether runs, the storage watchdog warns when the save folder is almost full, see storage_watchdog,
+  and the open batch of the 'batch' policy is flushed once it is batch_ms old, see capture_durability.
+- list_profiles, save_profile(name), apply_profile(name), delete_profile(name): The camera settings profiles, see
+  camera_profiles. Not while the tether runs, the camera stays connected between the profile commands so switching
+  between profiles only writes the settings that differ.
+- telemetry(csv_path): The newest battery level, card space and shutter count with their change per hour, see
+  camera_telemetry. With a csv_path the recorded samples are exported as CSV. No samples are recorded while the
+  tether runs, it holds the connection to the camera; 'tethered' tells the client that the values are paused.
+- list_frames(offset, limit, selected_only): The shots in the save folder, newest first.
+- select(names, selected): Selects or deselects shots, the files of a RAW+JPEG pair together.
+- start_transfer(destinations, selection, on_conflict, rate_limit): Copies the pictures in the background.
+- stats: The p50, p95 and p99 of every pipeline stage in the save folder, see pipeline_trace.
+- shutdown: Stops the tether and the daemon.
+
+Libraries used:
+- os: Provides a way to interact with the operating system, such as file operations.
+- json: Provides the encoding of the requests and responses.
+- shutil: Provides the free space of the save folder.
+- inspect: Provides the check of the command arguments.
+- socket, socketserver: Provide the local socket server and client.
+- subprocess: Provides the tether and backup mirror processes.
+- tempfile: Provides the folder of the default socket.
+- threading: Provides the lock of the controller and the transfer thread.
+- camera_utils: Provides the tether command, the camera connection and the planning of the copy jobs.
+- camera_profiles: Provides the camera settings profiles.
+- camera_telemetry: Provides the time series of the camera and its sampler.
+- menu_status: Provides the camera status.
+- session_catalog, session_store: Provide the pictures, the folder layout and the selection of the session.
+- capture_durability: Provides the flush policies of the tethered pictures.
+- transfer_utils: Provides the copier and the bandwidth limit of the transfers.
+- pipeline_trace: Provides the timings of the transfers and the pipeline statistics.
+- storage_watchdog: Provides the projection of the remaining shots while the tether runs.
+"""
+import os
+import json
+import shutil
+import inspect
+import socket
+import socketserver
+import subprocess
+import tempfile
+import threading
+from camera_utils import tether_command, plan_copy_jobs, CameraSession, CONFLICT_CHOICES, TRANSFER_IO_PRIORITY
+from camera_profiles import load_profiles, save_profiles, capture_profile, apply_profile
+from camera_telemetry import TelemetrySampler, TELEMETRY_INTERVAL, FIELDS
+from menu_status import StatusMonitor
+from session_catalog import SessionCatalog
+from session_store import SessionStore
+from transfer_utils import FanOutCopier, TransferThrottle, read_mirror_status
+from pipeline_trace import Tracer, read_trace, stage_statistics
+from storage_watchdog import StorageWatchdog
+from session_layout import LAYOUTS, SHARD_FRAMES
+from capture_durability import POLICIES, BATCH_FILES, BATCH_MS, flush_batch, BatchFlusher
+from lazy_imports import lazy_module
+gp = lazy_module('gphoto2')
+
+DEFAULT_ADDRESS = os.path.join(tempfile.gettempdir(), 'tether-control.sock')
+DEFAULT_PORT = 8765 # Used where Unix sockets are not available
+INVALID_FILENAME_CHARACTERS = ['/', '\\', ':', '*', '?', '"', '<', '>', '|']
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# The JSON types every command argument accepts, checked before the command runs. A list is a list of strings.
+ARGUMENT_TYPES = {
+    'path': (str,), 'prefix': (str,), 'layout': (str,), 'frames': (int,), 'policy': (str,), 'batch_files': (int,),
+    'batch_ms': (int,), 'name': (str,), 'csv_path': (str, type(None)), 'offset': (int,), 'limit': (int,),
+    'selected_only': (bool,), 'names': (str, list), 'selected': (bool,), 'destinations': (str, list),
+    'selection': (str,), 'on_conflict': (str,), 'rate_limit': (int, float, type(None)), 'since': (int, float, type(None)),
+}
+
+class ControlError(Exception):
+    """
+    A command that can not be carried out, the message is sent to the client.
+    """
+
+def check_argument(name, value):
+    """
+    Checks the JSON type of a command argument, see ARGUMENT_TYPES.
+
+    Raises:
+        ControlError: If the value has the wrong type.
+    """
+    types = ARGUMENT_TYPES.get(name)
+    if types is None:
+        return
+    if isinstance(value, bool) and bool not in types:
+        valid = False # True and False are ints in Python, not numbers in the protocol
+    elif isinstance(value, list):
+        valid = list in types and all(isinstance(item, str) for item in value)
+    else:
+        valid = isinstance(value, types)
+    if not valid:
+        expected = " or ".join('null' if kind is type(None) else 'a list of strings' if kind is list else kind.__name__ for kind in types)
+        raise ControlError(f"Invalid argument {name}: expected {expected}, got {json.dumps(value)}")
+
+def parse_address(address):
+    """
+    Converts an address from the command line to a socket address.
+
+    Args:
+        address (str or None): A path of a Unix socket, a port number, or None for the default.
+
+    Returns:
+        str or tuple: The path of the Unix socket, or ('127.0.0.1', port).
+    """
+    if address is None:
+        return DEFAULT_ADDRESS if hasattr(socket, 'AF_UNIX') else ('127.0.0.1', DEFAULT_PORT)
+    if str(address).isdigit():
+        return ('127.0.0.1', int(address))
+    return address
+
+class TetherController:
+    """
+    Carries out the commands of the headless mode, see the module description.
+
+    Every command is a method named `command_<name>` and returns a JSON-serializable result.
+    The commands run one at a time.
+    """
+
+    def __init__(self, save_directory=None, filename="", backup_directories=(), telemetry_interval=TELEMETRY_INTERVAL):
+        self.lock = threading.RLock()
+        self.save_directory = None
+        self.session_store = None
+        self.filename = filename
+        self.backup_directories = list(backup_directories)
+        self.tether = None
+        self.mirror = None
+        self.storage_watchdog = None
+        self.batch_flusher = None
+        self.transfer = None
+        self.camera_session = None # Open between the profile commands
+        self.telemetry_sampler = None
+        self.telemetry_interval = telemetry_interval
+        self.stop_requested = threading.Event()
+        self.status_monitor = StatusMonitor(telemetry_interval)
+        self.status_monitor.start()
+        if save_directory:
+            self.command_set_save_directory(save_directory)
+
+    def handle(self, request):
+        """
+        Carries out one request.
+
+        Returns:
+            dict: The response, see the module description.
+        """
+        if not isinstance(request, dict) or not isinstance(request.get('command'), str):
+            return {'ok': False, 'error': "The request must be an object with a command."}
+        method = getattr(self, 'command_' + request['command'], None)
+        if method is None:
+            return {'ok': False, 'error': f"Unknown command: {request['command']}"}
+        arguments = {key: value for key, value in request.items() if key != 'command'}
+        try:
+            inspect.signature(method).bind(**arguments)
+            for name, value in arguments.items():
+                check_argument(name, value)
+        except TypeError as e:
+            return {'ok': False, 'error': f"Invalid arguments: {e}"}
+        except ControlError as e:
+            return {'ok': False, 'error': str(e)}
+        try:
+            with self.lock:
+                return {'ok': True, 'result': method(**arguments)}
+        except (ControlError, OSError, ValueError) as e:
+            return {'ok': False, 'error': str(e)}
+        except TypeError as e: # A value of the right type that a command still can not use, the client gets an answer
+            return {'ok': False, 'error': f"Invalid arguments: {e}"}
+
+    def require_save_directory(self):
+        if not self.save_directory:
+            raise ControlError("No save directory is set.")
+
+    def tether_running(self):
+        return self.tether is not None and self.tether.poll() is None
+
+    def open_camera(self):
+        """
+        Returns the camera session of the profile commands, it is opened by the first one and kept open until the
+        tether starts, so the status monitor does not poll the camera in between.
+        """
+        if self.tether_running():
+            raise ControlError("Stop the tether before the camera settings are changed.")
+        if self.camera_session is None:
+            self.status_monitor.pause_camera()
+            session = CameraSession()
+            if not session.open():
+                self.status_monitor.resume_camera()
+                raise ControlError("Could not connect to the camera.")
+            self.camera_session = session
+            self.telemetry_sampler = TelemetrySampler(session, self.status_monitor.telemetry, self.telemetry_interval)
+            self.telemetry_sampler.start()
+        return self.camera_session
+
+    def release_camera(self):
+        if self.camera_session is not None:
+            self.telemetry_sampler.stop()
+            self.telemetry_sampler = None
+            self.camera_session.close()
+            self.camera_session = None
+            self.status_monitor.resume_camera()
+
+    def command_status(self):
+        if self.tether is not None and not self.tether_running():
+            self.command_stop_tether() # The tether ended on its own, for example because the camera was unplugged
+        camera = self.status_monitor.snapshot()
+        status = {
+            'save_directory': self.save_directory,
+            'free_bytes': shutil.disk_usage(self.save_directory).free if self.save_directory else None,
+            'filename': self.filename,
+            'backup_directories': self.backup_directories,
+            'tether': {'running': self.tether_running(), 'pid': self.tether.pid if self.tether_running() else None},
+            'camera': {key: camera[key] for key in ('connected', 'model', 'battery', 'camera_free_space', 'card_shots')},
+            'storage': self.storage_watchdog.status() if self.storage_watchdog else None,
+            'pictures': None,
+            'selected': None,
+            'transfer': self.transfer_status(),
+        }
+        if self.save_directory:
+            catalog = SessionCatalog(self.save_directory)
+            catalog.refresh()
+            status['pictures'] = catalog.count()
+            status['layout'], status['shard_frames'] = catalog.layout()
+            status['durability'] = dict(zip(('policy', 'batch_files', 'batch_ms'), catalog.durability()))
+            catalog.close()
+            self.session_store.load()
+            status['selected'] = len(self.session_store)
+            if self.backup_directories:
+                status['mirror'] = read_mirror_status(self.save_directory)
+        return status
+
+    def command_set_save_directory(self, path):
+        if self.tether_running():
+            raise ControlError("Stop the tether before the save directory is changed.")
+        path = os.path.abspath(os.path.expanduser(path))
+        if not os.path.isdir(path):
+            raise ControlError(f"The save directory does not exist: {path}")
+        if self.session_store is not None:
+            self.session_store.compact() # Save the selection of the old save folder
+        self.save_directory = path
+        self.session_store = SessionStore(path)
+        catalog = SessionCatalog(path)
+        catalog.refresh()
+        pictures = catalog.count()
+        catalog.close()
+        return {'save_directory': path, 'pictures': pictures, 'selected': len(self.session_store)}
+
+    def command_set_filename(self, prefix):
+        if any(char in prefix for char in INVALID_FILENAME_CHARACTERS):
+            raise ControlError("Invalid filename. The following characters are not allowed: " + " ".join(INVALID_FILENAME_CHARACTERS))
+        self.filename = prefix.strip()
+        return {'filename': self.filename}
+
+    def command_set_layout(self, layout, frames=SHARD_FRAMES):
+        self.require_save_directory()
+        if self.tether_running():
+            raise ControlError("Stop the tether before the folder layout is changed.")
+        if layout not in LAYOUTS:
+            raise ControlError(f"Unknown layout: {layout}, use one of {', '.join(LAYOUTS)}.")
+        if not isinstance(frames, int) or frames < 1:
+            raise ControlError("The shots per folder must be a positive number.")
+        catalog = SessionCatalog(self.save_directory)
+        catalog.set_layout(layout, frames)
+        catalog.close()
+        return {'layout': layout, 'frames': frames}
+
+    def command_set_durability(self, policy, batch_files=BATCH_FILES, batch_ms=BATCH_MS):
+        self.require_save_directory()
+        if policy not in POLICIES:
+            raise ControlError(f"Unknown policy: {policy}, use one of {', '.join(POLICIES)}.")
+        if not isinstance(batch_files, int) or batch_files < 1:
+            raise ControlError("The pictures per flush must be a positive number.")
+        if not isinstance(batch_ms, int) or batch_ms < 0:
+            raise ControlError("The milliseconds between flushes can not be negative.")
+        catalog = SessionCatalog(self.save_directory)
+        catalog.set_durability(policy, batch_files, batch_ms)
+        catalog.close()
+        return {'policy': policy, 'batch_files': batch_files, 'batch_ms': batch_ms}
+
+    def command_start_tether(self):
+        self.require_save_directory()
+        if self.tether_running():
+            return {'running': True, 'pid': self.tether.pid}
+        catalog = SessionCatalog(self.save_directory) # The hook script finds the save directory by its catalog
+        layout, _ = catalog.layout()
+        catalog.close()
+        self.release_camera()
+        self.status_monitor.pause_camera() # The tether uses the camera until it is stopped
+        try:
+            self.tether = subprocess.Popen(tether_command(self.save_directory, self.filename, layout), stdin=subprocess.DEVNULL)
+        except OSError:
+            self.status_monitor.resume_camera()
+            raise
+        if self.backup_directories:
+            self.mirror = subprocess.Popen(['python3', os.path.join(SCRIPT_DIRECTORY, 'backup_mirror.py'), self.save_directory, json.dumps(self.backup_directories)], stdin=subprocess.DEVNULL)
+        self.storage_watchdog = StorageWatchdog(self.save_directory) # Warns only, the save folder of the daemon is set by the client
+        self.storage_watchdog.start()
+        self.batch_flusher = BatchFlusher(self.save_directory)
+        self.batch_flusher.start()
+        return {'running': True, 'pid': self.tether.pid}
+
+    def command_stop_tether(self):
+        if self.tether is None:
+            return {'running': False}
+        if self.storage_watchdog is not None:
+            self.storage_watchdog.stop()
+            self.storage_watchdog = None
+        self.tether.terminate()
+        returncode = self.tether.wait()
+        self.tether = None
+        if self.batch_flusher is not None:
+            self.batch_flusher.stop()
+            self.batch_flusher = None
+        catalog = SessionCatalog(self.save_directory) # The pictures that wait for a batch flush
+        flush_batch(catalog)
+        catalog.close()
+        self.status_monitor.resume_camera()
+        if self.mirror is not None:
+            self.mirror.terminate() # The mirror finishes the queued pictures before it exits
+            self.mirror.wait()
+            self.mirror = None
+        return {'running': False, 'returncode': returncode}
+
+    def command_list_profiles(self):
+        return {'profiles': load_profiles()}
+
+    def command_save_profile(self, name):
+        if not name.strip():
+            raise ControlError("The profile needs a name.")
+        try:
+            settings = capture_profile(self.open_camera())
+        except gp.GPhoto2Error as e:
+            raise ControlError(f"Could not read the camera settings: {e}")
+        profiles = load_profiles()
+        profiles[name.strip()] = settings
+        save_profiles(profiles)
+        return {'name': name.strip(), 'settings': settings}
+
+    def command_apply_profile(self, name):
+        profiles = load_profiles()
+        if name not in profiles:
+            raise ControlError(f"There is no profile {name}.")
+        try:
+            changes, problems = apply_profile(self.open_camera(), profiles[name])
+        except gp.GPhoto2Error as e:
+            raise ControlError(f"Could not apply the profile {name}: {e}")
+        return {'name': name, 'changed': changes, 'skipped': problems}
+
+    def command_delete_profile(self, name):
+        profiles = load_profiles()
+        if profiles.pop(name, None) is None:
+            raise ControlError(f"There is no profile {name}.")
+        save_profiles(profiles)
+        return {'deleted': name}
+
+    def command_telemetry(self, csv_path=None):
+        telemetry = self.status_monitor.telemetry
+        result = {'samples': len(telemetry), 'tethered': self.tether_running()} # The tether owns the camera, see camera_telemetry
+        for field in FIELDS:
+            result[field] = {'latest': telemetry.latest(field), 'per_hour': telemetry.trend(field)}
+        if csv_path:
+            csv_path = os.path.abspath(os.path.expanduser(csv_path))
+            result['csv_path'], result['exported'] = csv_path, telemetry.export_csv(csv_path)
+        return result
+
+    def command_list_frames(self, offset=0, limit=100, selected_only=False):
+        self.require_save_directory()
+        catalog = SessionCatalog(self.save_directory)
+        catalog.refresh()
+        shots = catalog.shots()
+        catalog.close()
+        self.session_store.load()
+        frames = []
+        for files in shots:
+            selected = any(os.path.join(self.save_directory, name) in self.session_store for name in files)
+            if selected or not selected_only:
+                frames.append({'files': files, 'selected': selected})
+        return {'total': len(frames), 'frames': frames[offset:offset + limit]}
+
+    def command_select(self, names, selected=True):
+        self.require_save_directory()
+        if isinstance(names, str):
+            names = [names]
+        catalog = SessionCatalog(self.save_directory)
+        catalog.refresh()
+        known = set(catalog.pictures())
+        unknown = [name for name in names if name not in known]
+        if unknown:
+            catalog.close()
+            raise ControlError(f"Not in the save directory: {', '.join(unknown)}")
+        files = catalog.shot_files(names) # The RAW and JPEG of a shot together
+        catalog.close()
+        self.session_store.load() # The viewer may have changed the selection
+        for name in files:
+            if selected:
+                self.session_store.add(os.path.join(self.save_directory, name))
+            else:
+                self.session_store.remove(os.path.join(self.save_directory, name))
+        return {'files': files, 'selected': len(self.session_store)}
+
+    def command_start_transfer(self, destinations, selection='selected', on_conflict='rename', rate_limit=None):
+        self.require_save_directory()
+        if self.transfer is not None and self.transfer['thread'].is_alive():
+            raise ControlError("A transfer is already running.")
+        if isinstance(destinations, str):
+            destinations = [destinations]
+        destinations = [os.path.abspath(os.path.expanduser(directory)) for directory in destinations]
+        if not destinations:
+            raise ControlError("No destination directory.")
+        for directory in destinations:
+            if not os.path.isdir(directory):
+                raise ControlError(f"The destination directory does not exist: {directory}")
+            if directory == self.save_directory:
+                raise ControlError("The save directory can not be a destination directory.")
+        if selection not in ('all', 'selected'):
+            raise ControlError("The selection must be 'all' or 'selected'.")
+        if on_conflict not in CONFLICT_CHOICES:
+            raise ControlError(f"on_conflict must be one of: {', '.join(CONFLICT_CHOICES)}")
+
+        catalog = SessionCatalog(self.save_directory)
+        catalog.refresh()
+        if selection == 'all':
+            photo_file_list = catalog.pictures(descending=False)
+        else:
+            self.session_store.load()
+            photo_file_list = catalog.shot_files([os.path.relpath(picture, self.save_directory) for picture in self.session_store.pictures])
+        catalog.close()
+        if not photo_file_list:
+            raise ControlError("No pictures to transfer.")
+
+        jobs = plan_copy_jobs(self.save_directory, photo_file_list, destinations, on_conflict)
+        throttle = TransferThrottle(int(rate_limit * 1024 * 1024) if rate_limit else None, self.save_directory)
+        tracer = Tracer(self.save_directory, 'transfer')
+        copier = FanOutCopier(destinations, throttle=throttle, io_priority=TRANSFER_IO_PRIORITY, tracer=tracer)
+
+        def run_transfer():
+            copier.copy(jobs)
+            tracer.flush()
+
+        thread = threading.Thread(target=run_transfer, name='control-transfer', daemon=True)
+        self.transfer = {'thread': thread, 'copier': copier, 'files': len(jobs), 'destinations': destinations}
+        thread.start()
+        return {'files': len(jobs), 'destinations': destinations}
+
+    def transfer_status(self):
+        if self.transfer is None:
+            return None
+        status = {'running': self.transfer['thread'].is_alive(), 'files': self.transfer['files'], 'destinations': {}}
+        for directory, progress in self.transfer['copier'].status().items():
+            status['destinations'][directory] = {
+                'files': progress['files'],
+                'bytes': progress['bytes'],
+                'errors': [list(error) for error in progress['errors']],
+                'failed': progress['failed'] and str(progress['failed']),
+            }
+        return status
+
+    def command_stats(self, since=None):
+        self.require_save_directory()
+        return stage_statistics(read_trace(self.save_directory, since))
+
+    def command_shutdown(self):
+        self.command_stop_tether()
+        self.stop_requested.set()
+        return {'stopping': True}
+
+    def close(self):
+        """
+        Stops the tether, waits for a running transfer and saves the selection.
+        """
+        with self.lock:
+            self.command_stop_tether()
+            self.release_camera()
+            if self.transfer is not None:
+                self.transfer['thread'].join()
+            if self.session_store is not None:
+                self.session_store.compact()
+        self.status_monitor.stop()
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    """
+    Reads the requests of one client line by line and writes a response line for every request.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response = {'ok': False, 'error': "The request is not valid JSON."}
+            else:
+                response = self.server.controller.handle(request)
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+class ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def create_server(controller, address=None):
+    """
+    Creates the server of the headless mode.
+
+    Args:
+        controller (TetherController): The controller that carries out the commands.
+        address (str or None): The address, see `parse_address`.
+
+    Returns:
+        socketserver.BaseServer: The server, call `serve_forever` to run it.
+    """
+    address = parse_address(address)
+    if isinstance(address, tuple):
+        server = ThreadingTCPServer(address, ControlHandler)
+    else:
+        if os.path.exists(address):
+            # A socket left behind by a daemon that did not exit cleanly, unless another daemon is listening on it
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.connect(address)
+                raise ControlError(f"Another daemon is listening on {address}")
+            except ConnectionRefusedError:
+                os.remove(address)
+        server = socketserver.ThreadingUnixStreamServer(address, ControlHandler)
+        server.daemon_threads = True
+        os.chmod(address, 0o600) # Only the user of the daemon can control it
+    server.controller = controller
+    return server
+
+def send_command(command, address=None, timeout=None, **arguments):
+    """
+    Sends one command to the daemon and waits for the response.
+
+    Args:
+        command (str): The name of the command, see the module description.
+        address (str or None): The address of the daemon, see `parse_address`.
+        timeout (float or None): The maximum wait for the response in seconds, or None to wait as long as the command takes.
+        **arguments: The arguments of the command.
+
+    Returns:
+        The result of the command.
+
+    Raises:
+        ControlError: If the daemon refused the command.
+        OSError: If the daemon is not reachable.
+    """
+    address = parse_address(address)
+    family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+    with socket.socket(family, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(address)
+        connection.sendall(json.dumps(dict(arguments, command=command)).encode('utf-8') + b'\n')
+        with connection.makefile('rb') as response_file:
+            line = response_file.readline()
+    if not line:
+        raise ControlError("The daemon closed the connection.")
+    response = json.loads(line)
+    if not response['ok']:
+        raise ControlError(response['error'])
+    return response['result']
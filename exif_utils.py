@@ -0,0 +1,252 @@
+"""
+This module reads the metadata of captured pictures from their EXIF/TIFF header.
+
+Only the header structures are read with small seeks and reads, never the image data, so reading the
+metadata of a 50 MB RAW file costs a few kilobytes of IO. JPEG files and the TIFF based RAW formats
+(.nef, .cr2, .arw, .tif, .tiff) are supported.
+
+Libraries used:
+- os: Provides a way to get the size of a file.
+- struct: Provides a way to unpack the binary TIFF structures.
+"""
+import os
+import struct
+
+# TIFF tags
+TAG_IMAGE_WIDTH = 0x0100
+TAG_IMAGE_LENGTH = 0x0101
+TAG_COMPRESSION = 0x0103
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_STRIP_OFFSETS = 0x0111
+TAG_ORIENTATION = 0x0112
+TAG_STRIP_BYTE_COUNTS = 0x0117
+TAG_SUB_IFDS = 0x014A
+TAG_JPEG_OFFSET = 0x0201
+TAG_JPEG_LENGTH = 0x0202
+TAG_EXIF_IFD = 0x8769
+TAG_DATE_TIME_ORIGINAL = 0x9003
+TAG_IMAGE_NUMBER = 0x9211
+TAG_SUB_SEC_TIME_ORIGINAL = 0x9291
+TAG_BODY_SERIAL_NUMBER = 0xA431
+TAG_EXIF_IMAGE_WIDTH = 0xA002
+TAG_EXIF_IMAGE_HEIGHT = 0xA003
+
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+MAX_IFDS = 16 # Protects against loops in broken files
+MAX_ENTRIES = 1000
+
+class TiffReader:
+    """
+    Reads IFD entries from a TIFF structure that starts at `base` in a file.
+    """
+
+    def __init__(self, f, base=0):
+        self.f = f
+        self.base = base
+        f.seek(base)
+        header = f.read(8)
+        if header[:2] == b'II':
+            self.endian = '<'
+        elif header[:2] == b'MM':
+            self.endian = '>'
+        else:
+            raise ValueError("Not a TIFF header")
+        self.first_ifd = struct.unpack(self.endian + 'I', header[4:8])[0]
+
+    def read_ifd(self, offset):
+        """
+        Returns the entries of the IFD at `offset` as {tag: value} and the offset of the next IFD.
+        """
+        self.f.seek(self.base + offset)
+        data = self.f.read(2)
+        if len(data) < 2:
+            return {}, 0
+        count = struct.unpack(self.endian + 'H', data)[0]
+        if count > MAX_ENTRIES:
+            return {}, 0
+        data = self.f.read(count * 12 + 4)
+        if len(data) < count * 12 + 4:
+            return {}, 0
+        entries = {}
+        for i in range(count):
+            tag, value_type, value_count = struct.unpack(self.endian + 'HHI', data[i * 12:i * 12 + 8])
+            entries[tag] = (value_type, value_count, data[i * 12 + 8:i * 12 + 12])
+        next_ifd = struct.unpack(self.endian + 'I', data[count * 12:count * 12 + 4])[0]
+        return entries, next_ifd
+
+    def value(self, entry):
+        """
+        Returns the value of an IFD entry: a string, a number or a list of numbers.
+        """
+        value_type, value_count, raw = entry
+        size = TYPE_SIZES.get(value_type, 1) * value_count
+        if size > 4:
+            if size > 65536:
+                return None
+            self.f.seek(self.base + struct.unpack(self.endian + 'I', raw)[0])
+            raw = self.f.read(size)
+            if len(raw) < size:
+                return None
+        if value_type == 2: # ASCII
+            return raw[:size].split(b'\0', 1)[0].decode('ascii', 'replace').strip()
+        if value_type == 3:
+            values = struct.unpack(self.endian + 'H' * value_count, raw[:size])
+        elif value_type in (4, 13):
+            values = struct.unpack(self.endian + 'I' * value_count, raw[:size])
+        elif value_type == 5:
+            numbers = struct.unpack(self.endian + 'I' * (2 * value_count), raw[:size])
+            values = tuple(numbers[i] / numbers[i + 1] if numbers[i + 1] else 0 for i in range(0, len(numbers), 2))
+        else:
+            return raw[:size]
+        return values[0] if value_count == 1 else list(values)
+
+def single_number(value):
+    """
+    Returns a tag value as one integer: the value itself, the only item of a list, or None for anything else.
+    Broken or unusual files store offsets and lengths as lists or other types, which must not end up in arithmetic.
+    """
+    if isinstance(value, list) and len(value) == 1:
+        value = value[0]
+    return value if isinstance(value, int) else None
+
+def single_text(value):
+    """
+    Returns a tag value as text, or None if the file stores it as another type (bytes or numbers).
+    """
+    return value if isinstance(value, str) else None
+
+def read_tiff_metadata(f, base=0):
+    """
+    Reads the metadata from a TIFF structure.
+
+    Args:
+        f (file): The file opened in binary mode.
+        base (int): The position of the TIFF header in the file (not 0 for the EXIF block of a JPEG).
+
+    Returns:
+        dict: The metadata, see `read_metadata`.
+    """
+    reader = TiffReader(f, base)
+    metadata = {}
+    previews = []
+    images = []
+    pending = [reader.first_ifd]
+    visited = set()
+    exif_offset = None
+    while pending and len(visited) < MAX_IFDS:
+        offset = pending.pop(0)
+        if not offset or offset in visited:
+            continue
+        visited.add(offset)
+        entries, next_ifd = reader.read_ifd(offset)
+        pending.append(next_ifd)
+        if TAG_SUB_IFDS in entries:
+            sub_ifds = reader.value(entries[TAG_SUB_IFDS])
+            pending.extend(offset for offset in (sub_ifds if isinstance(sub_ifds, list) else [sub_ifds]) if isinstance(offset, int))
+        if TAG_EXIF_IFD in entries and exif_offset is None:
+            exif_offset = single_number(reader.value(entries[TAG_EXIF_IFD]))
+        for tag, key, convert in ((TAG_MAKE, 'make', single_text), (TAG_MODEL, 'model', single_text), (TAG_ORIENTATION, 'orientation', single_number)):
+            if tag in entries and key not in metadata:
+                value = convert(reader.value(entries[tag]))
+                if value is not None:
+                    metadata[key] = value
+        if TAG_JPEG_OFFSET in entries and TAG_JPEG_LENGTH in entries:
+            length, offset = single_number(reader.value(entries[TAG_JPEG_LENGTH])), single_number(reader.value(entries[TAG_JPEG_OFFSET]))
+            if length is not None and offset is not None:
+                previews.append((length, offset))
+        elif TAG_COMPRESSION in entries and reader.value(entries[TAG_COMPRESSION]) in (6, 7) and TAG_STRIP_OFFSETS in entries and TAG_STRIP_BYTE_COUNTS in entries:
+            strip_offset = single_number(reader.value(entries[TAG_STRIP_OFFSETS]))
+            strip_length = single_number(reader.value(entries[TAG_STRIP_BYTE_COUNTS]))
+            width = single_number(reader.value(entries[TAG_IMAGE_WIDTH])) if TAG_IMAGE_WIDTH in entries else None
+            if strip_offset is not None and strip_length is not None and width is not None and width < 10000:
+                previews.append((strip_length, strip_offset)) # A JPEG preview stored as one strip
+        if TAG_IMAGE_WIDTH in entries and TAG_IMAGE_LENGTH in entries:
+            width, height = single_number(reader.value(entries[TAG_IMAGE_WIDTH])), single_number(reader.value(entries[TAG_IMAGE_LENGTH]))
+            if width is not None and height is not None:
+                images.append((width * height, width, height))
+    if exif_offset:
+        entries, _ = reader.read_ifd(exif_offset)
+        for tag, key, convert in ((TAG_DATE_TIME_ORIGINAL, 'date_time_original', single_text), (TAG_SUB_SEC_TIME_ORIGINAL, 'sub_sec_time_original', single_text),
+                                  (TAG_IMAGE_NUMBER, 'image_number', single_number), (TAG_BODY_SERIAL_NUMBER, 'serial', single_text)):
+            if tag in entries:
+                value = convert(reader.value(entries[tag]))
+                if value is not None:
+                    metadata[key] = value
+        if TAG_EXIF_IMAGE_WIDTH in entries and TAG_EXIF_IMAGE_HEIGHT in entries:
+            width, height = single_number(reader.value(entries[TAG_EXIF_IMAGE_WIDTH])), single_number(reader.value(entries[TAG_EXIF_IMAGE_HEIGHT]))
+            if width is not None and height is not None:
+                metadata['width'], metadata['height'] = width, height
+    if 'width' not in metadata and images:
+        _, metadata['width'], metadata['height'] = max(images)
+    if previews:
+        length, offset = max(previews)
+        metadata['preview_offset'] = base + offset
+        metadata['preview_length'] = length
+    return metadata
+
+def read_jpeg_metadata(f):
+    """
+    Reads the metadata from the EXIF block and the frame header of a JPEG file.
+
+    Args:
+        f (file): The file opened in binary mode.
+
+    Returns:
+        dict: The metadata, see `read_metadata`.
+    """
+    metadata = {}
+    f.seek(2)
+    while True:
+        marker = f.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            break
+        code = marker[1]
+        length = struct.unpack('>H', marker[2:4])[0]
+        position = f.tell()
+        if code == 0xE1 and 'exif_read' not in metadata: # APP1
+            if f.read(6) == b'Exif\0\0':
+                metadata.update(read_tiff_metadata(f, position + 6))
+                metadata.pop('preview_offset', None) # The thumbnail of a JPEG is not needed, the file is the preview
+                metadata.pop('preview_length', None)
+                metadata['exif_read'] = True
+        elif code in (0xC0, 0xC1, 0xC2): # Start of frame
+            f.seek(position)
+            frame = f.read(5)
+            metadata['height'], metadata['width'] = struct.unpack('>HH', frame[1:5])
+            break
+        elif code == 0xDA: # Start of scan, the image data follows
+            break
+        f.seek(position + length - 2)
+    metadata.pop('exif_read', None)
+    return metadata
+
+def read_metadata(path):
+    """
+    Reads the metadata of a picture from its header.
+
+    Args:
+        path (str): The path to the picture.
+
+    Returns:
+        dict: The metadata that was found. Possible keys are 'make', 'model', 'serial', 'date_time_original'
+              (as 'YYYY:MM:DD HH:MM:SS'), 'sub_sec_time_original' (the fraction of the second as digits),
+              'image_number', 'orientation' (1-8), 'width', 'height', 'preview_offset' and 'preview_length'
+              (the position of the largest embedded JPEG preview of a RAW file).
+              An empty dictionary is returned if the file can not be parsed, also for tags of an unexpected type.
+    """
+    try:
+        with open(path, 'rb') as f:
+            start = f.read(4)
+            if start[:2] == b'\xff\xd8':
+                metadata = read_jpeg_metadata(f)
+            elif start[:2] in (b'II', b'MM'):
+                metadata = read_tiff_metadata(f)
+            else:
+                return {}
+            if 'preview_offset' in metadata and metadata['preview_offset'] + metadata['preview_length'] > os.path.getsize(path):
+                metadata.pop('preview_offset') # Broken or truncated file
+                metadata.pop('preview_length')
+            return metadata
+    except (OSError, ValueError, TypeError, struct.error):
+        return {}
@@ -0,0 +1,43 @@
+# Description: This script scores every new picture in the save directory for culling.
+import sys
+import signal
+import time
+from image_analysis import analyze_pictures, create_analysis_pool
+from session_catalog import SessionCatalog
+from transfer_utils import set_io_priority
+
+"""
+this script is started by the picture viewer and runs as long as the viewer is open.
+It scores the pictures of the session catalog that are not scored yet, newest first, in a process pool,
+so the scores of a new capture are ready a moment after it landed.
+The scores are stored in the session catalog, where the viewer reads them to sort, filter and flag the pictures.
+"""
+BATCH_SIZE = 32 # Small batches, so a new capture does not wait for a large backlog
+
+if __name__ == '__main__':
+    save_directory = sys.argv[1] # Get the save directory from the command line arguments
+
+    set_io_priority() # Never slow down the tether download or the viewer
+    stop_requested = False
+
+    def request_stop(signum, frame):
+        global stop_requested
+        stop_requested = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    catalog = SessionCatalog(save_directory)
+    pool = create_analysis_pool() # Created once, starting workers for every capture would take longer than scoring it
+    try:
+        while not stop_requested:
+            catalog.refresh()
+            entries = catalog.unscored(BATCH_SIZE)
+            if not entries:
+                time.sleep(0.5)
+                continue
+            scores = analyze_pictures(save_directory, entries, pool)
+            catalog.set_scores([(entry['name'], result) for entry, result in zip(entries, scores)])
+    finally:
+        pool.shutdown(cancel_futures=True)
+        catalog.close()
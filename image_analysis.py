@@ -0,0 +1,346 @@
+"""
+This module scores captured pictures for culling: focus, clipping and exposure.
+
+Every picture is scored on a small grayscale version of its preview, never on the full image:
+- JPEG files are decoded at a reduced size by the JPEG decoder itself (IMREAD_REDUCED_GRAYSCALE_*),
+  which skips most of the decoding work.
+- RAW files are scored on their embedded JPEG preview, read directly from the position recorded in the
+  session catalog, so LibRaw is not needed.
+
+The scores are computed with whole-array NumPy/OpenCV operations:
+- sharpness: The variance of the Laplacian, high for sharp pictures and low for blurred or missed focus.
+- highlight_clip, shadow_clip: The fraction of pixels that are blown out or crushed black.
+- luminance: The mean brightness between 0 and 1.
+- dhash: A 64 bit perceptual difference hash, near-identical frames of a burst differ in only a few bits.
+
+The module also provides the histogram and clipping overlays of the viewer, which are computed on the display
+frame (at most DISPLAY_SIZE pixels) with a few whole-array OpenCV operations. They are held to OVERLAY_BUDGET_MS:
+when a frame takes longer, the clipping masks of the next frames are computed on every second or fourth pixel
+(see `next_overlay_step`) and scaled up when they are drawn.
+
+Libraries used:
+- os: Provides a way to interact with the operating system, such as file operations.
+- time: Provides the timer for the overlay budget.
+- cv2: Provides the image decoding and the Laplacian.
+- numpy: Provides the array operations.
+- worker_pool: Provides the process pool for scoring many pictures at once.
+"""
+import os
+import time
+from lazy_imports import lazy_module
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+from worker_pool import create_worker_pool
+
+ANALYSIS_SIZE = 640 # The long edge of the image that is scored, so scores of different cameras are comparable
+HIGHLIGHT_LEVEL = 250
+SHADOW_LEVEL = 5
+ANALYSIS_POOL_THRESHOLD = 8 # Fewer pictures are scored in this process
+
+DISPLAY_SIZE = 1920 # The long edge of the frames shown by the viewer, the window scales them to the screen
+HISTOGRAM_SIZE = (256, 120) # Width and height of the histogram panel before it is scaled onto the frame
+HISTOGRAM_SAMPLES = 250000 # The histogram is computed from about this many pixels of the frame
+OVERLAY_BUDGET_MS = 8 # The time the overlays of one frame may take
+MAX_OVERLAY_STEP = 4 # The coarsest clipping masks, every fourth pixel in both directions
+
+HASH_SIZE = 8 # 8x8 gradient bits, a 64 bit hash
+BURST_DISTANCE = 10 # The maximum number of different hash bits between two frames of the same burst
+
+# A picture is flagged as a likely reject if it is much less sharp than the typical picture of the session,
+# or if a large part of it is clipped.
+REJECT_SHARPNESS_RATIO = 0.35 # Of the median sharpness of the session
+REJECT_HIGHLIGHT_CLIP = 0.08
+REJECT_SHADOW_CLIP = 0.5
+
+def apply_orientation(frame, orientation):
+    """
+    Rotates a frame according to its EXIF orientation.
+
+    Args:
+        frame (numpy.ndarray): The image.
+        orientation (int or None): The EXIF orientation, 1 (or None) for upright, 3 for upside down,
+                                   6 for rotated 90 degrees clockwise and 8 for rotated 90 degrees counterclockwise.
+
+    Returns:
+        numpy.ndarray: The upright image.
+    """
+    if orientation == 3:
+        return cv2.rotate(frame, cv2.ROTATE_180)
+    elif orientation == 6:
+        return cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
+    elif orientation == 8:
+        return cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return frame
+
+def reduced_decode_flag(size, target=ANALYSIS_SIZE, color=False):
+    """
+    Returns the decode flag that reduces a JPEG as far as possible while keeping at least `target` pixels.
+
+    The JPEG decoder reduces by 2, 4 or 8 while decoding, which skips most of the decoding work.
+
+    Args:
+        size (int): The width (or long edge) of the JPEG, or None if it is not known.
+        target (int): The minimum width (or long edge) of the decoded image.
+        color (bool): If True, the image is decoded in color, otherwise in grayscale.
+
+    Returns:
+        int: The cv2.imread flag.
+    """
+    if color:
+        flags = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+        full = cv2.IMREAD_COLOR
+    else:
+        flags = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4), (2, cv2.IMREAD_REDUCED_GRAYSCALE_2))
+        full = cv2.IMREAD_GRAYSCALE
+    if not size:
+        return flags[2][1] if not color else full
+    for factor, flag in flags:
+        if size // factor >= target:
+            return flag
+    return full
+
+def load_analysis_image(path, width=None, preview_offset=None, preview_length=None):
+    """
+    Loads a small grayscale version of a picture for scoring.
+
+    Args:
+        path (str): The path to the picture.
+        width (int): The width of the picture from the catalog, used to choose the reduced decode size.
+        preview_offset (int): The position of the embedded JPEG preview of a RAW file.
+        preview_length (int): The length of the embedded JPEG preview of a RAW file.
+
+    Returns:
+        numpy.ndarray or None: The grayscale image with a long edge of at most ANALYSIS_SIZE, or None if it can not be decoded.
+    """
+    if preview_offset is not None and preview_length:
+        with open(path, 'rb') as f:
+            f.seek(preview_offset)
+            data = np.frombuffer(f.read(preview_length), dtype=np.uint8)
+        gray = cv2.imdecode(data, cv2.IMREAD_REDUCED_GRAYSCALE_2)
+    elif path.lower().endswith(('.jpg', '.jpeg')):
+        gray = cv2.imread(path, reduced_decode_flag(width))
+    else:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None
+    scale = ANALYSIS_SIZE / max(gray.shape)
+    if scale < 1:
+        gray = cv2.resize(gray, (round(gray.shape[1] * scale), round(gray.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+    return gray
+
+def difference_hash(gray):
+    """
+    Computes the difference hash (dHash) of a grayscale image.
+
+    The image is shrunk to 9x8 pixels and every bit tells if a pixel is brighter than its left neighbour,
+    so the hash follows the structure of the picture and not its exact exposure or noise.
+
+    Returns:
+        int: The 64 bit hash.
+    """
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def hamming_distance(a, b):
+    """
+    Returns the number of different bits of two hashes.
+    """
+    return bin(a ^ b).count('1')
+
+def burst_starts(shots, hashes, max_distance=BURST_DISTANCE):
+    """
+    Collapses bursts into stacks: consecutive shots with nearly the same hash belong to one stack.
+
+    Every shot is compared with the shot before it, which follows a burst that slowly pans or zooms and
+    takes one pass over the shots, so it stays fast for tens of thousands of frames.
+
+    Args:
+        shots (list): The shots in capture order (not sorted by score, that would separate the frames of a burst),
+                      see `SessionCatalog.shots`.
+        hashes (dict): The hash of every hashed picture, see `SessionCatalog.hashes`.
+        max_distance (int): The maximum number of different bits between two shots of the same stack.
+
+    Returns:
+        list: The index of the first shot of every stack, in ascending order.
+    """
+    starts = []
+    previous = None
+    for index, files in enumerate(shots):
+        current = hashes.get(files[0])
+        if previous is None or current is None or hamming_distance(previous, current) > max_distance:
+            starts.append(index)
+        previous = current
+    return starts
+
+def score_image(gray):
+    """
+    Computes the culling scores and the hash of a grayscale image.
+
+    Returns:
+        dict: 'sharpness', 'highlight_clip', 'shadow_clip', 'luminance' and 'dhash', see the module description.
+    """
+    histogram = np.bincount(gray.ravel(), minlength=256)
+    pixels = gray.size
+    return {
+        'sharpness': float(cv2.Laplacian(gray, cv2.CV_32F).var()),
+        'highlight_clip': float(histogram[HIGHLIGHT_LEVEL:].sum() / pixels),
+        'shadow_clip': float(histogram[:SHADOW_LEVEL + 1].sum() / pixels),
+        'luminance': float(np.dot(histogram, np.arange(256)) / (pixels * 255)),
+        'dhash': difference_hash(gray),
+    }
+
+def analyze_picture(path, width=None, preview_offset=None, preview_length=None):
+    """
+    Loads and scores one picture.
+
+    Returns:
+        dict or None: The scores, see `score_image`, or None if the picture can not be decoded.
+    """
+    try:
+        gray = load_analysis_image(path, width, preview_offset, preview_length)
+    except (OSError, cv2.error):
+        return None
+    return score_image(gray) if gray is not None else None
+
+def create_analysis_pool(workers=None):
+    """
+    Creates the process pool for `analyze_pictures`, see worker_pool.
+    """
+    return create_worker_pool(workers)
+
+def analyze_pictures(save_directory, entries, pool=None):
+    """
+    Scores many pictures, in a process pool if there are many of them.
+
+    Args:
+        save_directory (str): The directory where the pictures are saved.
+        entries (list): Catalog entries with 'name', 'width', 'preview_offset' and 'preview_length'.
+        pool (ProcessPoolExecutor): The pool to use, or None to create one when it is needed.
+
+    Returns:
+        list: The scores of every picture, or None for the pictures that can not be decoded.
+    """
+    arguments = (
+        [os.path.join(save_directory, entry['name']) for entry in entries],
+        [entry['width'] for entry in entries],
+        [entry['preview_offset'] for entry in entries],
+        [entry['preview_length'] for entry in entries],
+    )
+    if pool is not None:
+        return list(pool.map(analyze_picture, *arguments))
+    if len(entries) < ANALYSIS_POOL_THRESHOLD:
+        return list(map(analyze_picture, *arguments))
+    with create_analysis_pool() as pool:
+        return list(pool.map(analyze_picture, *arguments, chunksize=4))
+
+def is_likely_reject(scores, median_sharpness):
+    """
+    Checks if a picture is a likely reject: out of focus compared to the rest of the session, or badly clipped.
+
+    Args:
+        scores (dict): The scores of the picture, or None if it is not scored yet.
+        median_sharpness (float): The median sharpness of the session, or None if it is not known yet.
+
+    Returns:
+        bool: True if the picture should be flagged.
+    """
+    if not scores or scores.get('sharpness') is None:
+        return False
+    if median_sharpness and scores['sharpness'] < REJECT_SHARPNESS_RATIO * median_sharpness:
+        return True
+    return scores['highlight_clip'] > REJECT_HIGHLIGHT_CLIP or scores['shadow_clip'] > REJECT_SHADOW_CLIP
+
+def format_scores(scores):
+    """
+    Returns the scores of a picture as one short line for the viewer.
+    """
+    if not scores or scores.get('sharpness') is None:
+        return "Not scored yet"
+    return f"Sharpness {scores['sharpness']:.0f}  Highlights {scores['highlight_clip'] * 100:.1f}%  Shadows {scores['shadow_clip'] * 100:.1f}%  Luminance {scores['luminance']:.2f}"
+
+def fit_display(frame, size=DISPLAY_SIZE):
+    """
+    Shrinks a decoded picture to the display size, so drawing, overlays and imshow work on a small frame.
+    """
+    scale = size / max(frame.shape[:2])
+    if scale < 1:
+        frame = cv2.resize(frame, (round(frame.shape[1] * scale), round(frame.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+    return frame
+
+def compute_overlays(frame, step=1):
+    """
+    Computes the histogram panel and the clipping masks of a display frame.
+
+    The histogram is computed from every n-th pixel (a strided view, no copy) and drawn with one comparison
+    per channel. A pixel is clipped in the highlights if any channel is at HIGHLIGHT_LEVEL or above, and in the
+    shadows if all channels are at SHADOW_LEVEL or below.
+
+    Args:
+        frame (numpy.ndarray): The BGR display frame.
+        step (int): The clipping masks are computed on every `step`-th pixel, see `next_overlay_step`.
+
+    Returns:
+        dict: 'histogram' (the panel as BGR image), 'highlights' and 'shadows' (boolean masks of the frame,
+              smaller than the frame for a step above 1) and 'milliseconds' (the time it took).
+    """
+    start = time.perf_counter()
+    sample_step = max(int((frame.shape[0] * frame.shape[1] / HISTOGRAM_SAMPLES) ** 0.5), 1)
+    sample = frame[::sample_step, ::sample_step]
+    width, height = HISTOGRAM_SIZE
+    rows = np.arange(height)[:, None]
+    panel = np.zeros((height, width, 3), dtype=np.uint8)
+    for channel in range(3):
+        counts = cv2.calcHist([sample], [channel], None, [width], [0, 256]).ravel()
+        heights = counts / max(counts.max(), 1) * height
+        panel[:, :, channel] = np.where(rows >= height - heights[None, :], 255, 0)
+    luma = cv2.calcHist([cv2.cvtColor(sample, cv2.COLOR_BGR2GRAY)], [0], None, [width], [0, 256]).ravel()
+    luma_heights = (luma / max(luma.max(), 1) * height).astype(int)
+    panel[np.clip(height - 1 - luma_heights, 0, height - 1), np.arange(width)] = 255 # The luma curve in white
+    blue, green, red = cv2.split(frame[::step, ::step] if step > 1 else frame)
+    brightest = cv2.max(cv2.max(blue, green), red)
+    return {
+        'histogram': panel,
+        'highlights': brightest >= HIGHLIGHT_LEVEL,
+        'shadows': brightest <= SHADOW_LEVEL,
+        'milliseconds': (time.perf_counter() - start) * 1000,
+    }
+
+def next_overlay_step(step, milliseconds, budget_ms=OVERLAY_BUDGET_MS):
+    """
+    Returns the step of the clipping masks for the next frame: coarser when the last frame took longer than the
+    budget, finer again when it took less than a quarter of it.
+    """
+    if milliseconds > budget_ms:
+        return min(step * 2, MAX_OVERLAY_STEP)
+    if milliseconds < budget_ms / 4:
+        return max(step // 2, 1)
+    return step
+
+def draw_overlays(frame, overlays, show_histogram=True, show_clipping=True):
+    """
+    Draws the overlays of `compute_overlays` onto a copy of a display frame.
+
+    The clipped highlights are painted red and the clipped shadows blue. The histogram is blended into the
+    bottom right corner.
+
+    Returns:
+        numpy.ndarray: The frame with the overlays.
+    """
+    frame = frame.copy()
+    if show_clipping:
+        highlights, shadows = overlays['highlights'], overlays['shadows']
+        if highlights.shape != frame.shape[:2]: # Computed on a coarser grid, see `next_overlay_step`
+            size = (frame.shape[1], frame.shape[0])
+            highlights = cv2.resize(highlights.view(np.uint8), size, interpolation=cv2.INTER_NEAREST).view(bool)
+            shadows = cv2.resize(shadows.view(np.uint8), size, interpolation=cv2.INTER_NEAREST).view(bool)
+        frame[highlights] = (0, 0, 255)
+        frame[shadows] = (255, 0, 0)
+    if show_histogram:
+        scale = max(frame.shape[1] // 4 // HISTOGRAM_SIZE[0], 1)
+        panel = cv2.resize(overlays['histogram'], (HISTOGRAM_SIZE[0] * scale, HISTOGRAM_SIZE[1] * scale), interpolation=cv2.INTER_NEAREST)
+        height, width = panel.shape[:2]
+        if height < frame.shape[0] and width < frame.shape[1]:
+            corner = frame[-height - 10:-10, -width - 10:-10]
+            corner[:] = cv2.addWeighted(corner, 0.3, panel, 0.7, 0)
+    return frame
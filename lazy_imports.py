@@ -0,0 +1,48 @@
+"""
+This module provides lazy imports for the heavy libraries of the application (OpenCV, NumPy, rawpy and gphoto2).
+
+Importing these libraries takes a large part of the start time of the program, while the menu needs none of them.
+A lazy module is imported on the first access of one of its attributes, so the program and the picture viewer
+only pay for the libraries they actually use:
+
+    cv2 = lazy_module('cv2')   # Nothing is imported yet
+    cv2.imread(path)           # OpenCV is imported here
+
+If a library is not installed, the ModuleNotFoundError is raised on the first use instead of at start.
+
+Libraries used:
+- sys: Provides the modules that are imported already.
+- types: Provides the module type.
+- importlib: Provides the import of a module by name.
+"""
+import sys
+import types
+import importlib
+
+class LazyModule(types.ModuleType):
+    """
+    A placeholder for a module that imports the module on the first attribute access.
+
+    After the import the attributes of the module are copied into the placeholder,
+    so later attribute accesses are as fast as on the module itself.
+    """
+
+    def __getattr__(self, attribute):
+        # Only called for attributes that are not in the placeholder yet, which means the module is not imported yet
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+def lazy_module(name):
+    """
+    Returns a module that is imported on first use.
+
+    Args:
+        name (str): The name of the module, for example 'cv2' or 'gphoto2'.
+
+    Returns:
+        module: The module if it is imported already, otherwise a `LazyModule`.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
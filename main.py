@@ -7,12 +7,25 @@ The main menu provides options to start a capture session, configure the save fo
 
 The script also includes a picture viewer module for viewing and selecting pictures during the capture session.
 
+The heavy libraries (OpenCV, NumPy, rawpy and gphoto2) are imported on first use, see lazy_imports. Run the script with
+`--startup-report` to print the time to the menu and the slowest imports, and see startup_benchmark for the regression check.
+
 Note: Some parts of the code are commented out or marked as work in progress.
 
 """
 #!/usr/bin/env python3
-from camera_utils import is_camera_connected, list_available_cameras, wait_for_camera_connection, save_tethered_picture, list_available_usb_ports, disconnect_camera, copy_confirm, show_camera_info, get_camera_abilities, get_connected_camera_model, get_connected_camera_serial_number, get_camera_firmware_version, get_camera_battery_level, get_camera_abilities, get_camera_free_space
-from app_utils import choose_save_directory, calculate_mb_left, wait_for_keypress, clear_terminal, change_save_directory
+from camera_utils import list_available_cameras, wait_for_camera_connection, save_tethered_picture, list_available_usb_ports, disconnect_camera, copy_confirm, show_camera_info, get_camera_abilities, get_connected_camera_serial_number, get_camera_firmware_version, get_camera_battery_level, get_camera_abilities, get_camera_free_space, ingest_from_camera, tether_command, CameraSession
+from app_utils import choose_save_directory, wait_for_keypress, clear_terminal, change_save_directory, choose_destination_directories, show_notice
+from transfer_utils import read_mirror_status, format_mirror_status
+from session_store import SessionStore, session_exists
+from session_catalog import SessionCatalog
+from menu_status import StatusMonitor
+from storage_watchdog import StorageWatchdog
+from session_layout import LAYOUTS, SHARD_FRAMES, describe_layout
+from capture_durability import POLICIES, DEFAULT_POLICY, BATCH_FILES, BATCH_MS, describe_policy, flush_batch, BatchFlusher
+from camera_telemetry import TelemetrySampler, format_trends
+from camera_profiles import load_profiles, save_profiles, capture_profile, apply_profile, format_changes
+from pipeline_trace import read_trace, stage_statistics, format_stage_statistics, write_stats_snapshot
 #import msvcrt   # Windows-specific module for keyboard input
 import time # Module for time-related functions
 import tkinter as tk # Cross-platform module for GUI
@@ -20,6 +33,9 @@ import subprocess # Module for running shell commands
 import os # Module for interacting with the operating system
 import sys # Module for system-specific parameters and functions
 import json # Module for working with JSON data
+import threading # Module for the lock between the tether failover and its teardown
+from lazy_imports import lazy_module
+gp = lazy_module('gphoto2') # Only for the errors of the camera settings profiles
 
 try:
     import keyboard
@@ -62,531 +78,836 @@ Save Folder: „usr/pictures“ (None) / xx.xxMB left
 	8. Exit
 
 """
-new_session_check = True # Set starting value of the new session check variable to True
-selected_pictures = [] # Define the "selected_pictures" variable as an empty list
+if __name__ == '__main__': # The menu runs only when started, the workers of a process pool import this script as well (see worker_pool)
+    new_session_check = True # Set starting value of the new session check variable to True
+    selected_pictures = [] # Define the "selected_pictures" variable as an empty list
+    session_store = None # The session store keeps the selected pictures in the save directory
+    backup_directories = [] # Directories the captured pictures are mirrored to during capture
+    overflow_directory = None # The tether switches to this directory when the save directory is full
+    folder_layout = 'flat' # The subfolders of a very large session, see session_layout
+    shard_frames = SHARD_FRAMES
+    durability_policy = DEFAULT_POLICY # How often the tethered pictures are flushed to the disk, see capture_durability
+    batch_files, batch_ms = BATCH_FILES, BATCH_MS
 
+    if '--startup-exit' in sys.argv: # Used by startup_report to measure the time to the menu
+        sys.exit(0)
+    if '--startup-report' in sys.argv: # Print the time to the menu and the slowest imports
+        from startup_report import measure_startup, format_startup_report
+        for line in format_startup_report(measure_startup(os.path.abspath(__file__))):
+            print(line)
+        sys.exit(0)
 
-wait_for_keypress()
+    status_monitor = StatusMonitor() # Refreshes the camera and free space status in the background, the menu shows the last known state
+    status_monitor.start()
 
-while True: # Main menu loop
-    """
-    this if statement is used to check if a new session is started and initialize the variables.
+    wait_for_keypress()
+
+    while True: # Main menu loop
+        """
+        this if statement is used to check if a new session is started and initialize the variables.
     
-    """    
-    if new_session_check: # Check if a new session is started and initialize the variables
-        is_camera_connected()
-        clear_terminal()
-        print("New session started.")
-        print("\033[94mChoose a save directory.\033[0m")
-        new_session_check = False
-        cameras = []  # Define the "cameras" variable as an empty list
-
-        while True:
-            save_directory = choose_save_directory() # Choose the save directory
-            if not save_directory:
-                print("No save directory chosen. Please choose a save directory.")
-            else:
-                print("Save directory:", save_directory)
-                break
+        """    
+        if new_session_check: # Check if a new session is started and initialize the variables
+            clear_terminal()
+            print("New session started.")
+            print("\033[94mChoose a save directory.\033[0m")
+            new_session_check = False
+            cameras = []  # Define the "cameras" variable as an empty list
 
-        class ConnectedCamera:
-            """
-            Represents a connected camera.
-
-            Attributes:
-                model (str): The model of the camera.
-                serial_number (str): The serial number of the camera.
-                firmware_version (str): The firmware version of the camera.
-                battery_level (float): The battery level of the camera.
-                remaining_storage (float): The remaining storage capacity of the camera.
-            """
+            while True:
+                save_directory = choose_save_directory() # Choose the save directory
+                if not save_directory:
+                    print("No save directory chosen. Please choose a save directory.")
+                else:
+                    print("Save directory:", save_directory)
+                    break
 
-            def __init__(self, model, serial_number, firmware_version, battery_level, remaining_storage):
-                self.model = model
-                self.serial_number = serial_number
-                self.firmware_version = firmware_version
-                self.battery_level = battery_level
-                self.remaining_storage = remaining_storage
+            class ConnectedCamera:
+                """
+                Represents a connected camera.
 
-        ConnectedCamera.model = get_connected_camera_model()        
-        """
-        prototype of getting camera info
-        ConnectedCamera.serial_number = get_connected_camera_serial_number()
-        ConnectedCamera.firmware_version = get_camera_firmware_version()
-        ConnectedCamera.battery_level = get_camera_battery_level()
-        ConnectedCamera.remaining_storage = get_camera_free_space()
-        """         
-        camera_model = ConnectedCamera.model
-        """
-        prototype of getting camera info
-        serial_number = ConnectedCamera.serial_number
-        firmware_version = ConnectedCamera.firmware_version
-        battery_level = ConnectedCamera.battery_level
-        remaining_storage = ConnectedCamera.remaining_storage
-        """
+                Attributes:
+                    model (str): The model of the camera.
+                    serial_number (str): The serial number of the camera.
+                    firmware_version (str): The firmware version of the camera.
+                    battery_level (float): The battery level of the camera.
+                    remaining_storage (float): The remaining storage capacity of the camera.
+                """
 
-        """
-        makes the filename from the camera model.
-        """        
-        if camera_model:
-            filename = camera_model.replace(" ", "_")
-        else:
-            filename = "picture"
+                def __init__(self, model, serial_number, firmware_version, battery_level, remaining_storage):
+                    self.model = model
+                    self.serial_number = serial_number
+                    self.firmware_version = firmware_version
+                    self.battery_level = battery_level
+                    self.remaining_storage = remaining_storage
+
+            status_monitor.wait_for_detection() # The camera model is needed for the filename
+            ConnectedCamera.model = status_monitor.snapshot()['model']
+            """
+            prototype of getting camera info
+            ConnectedCamera.serial_number = get_connected_camera_serial_number()
+            ConnectedCamera.firmware_version = get_camera_firmware_version()
+            ConnectedCamera.battery_level = get_camera_battery_level()
+            ConnectedCamera.remaining_storage = get_camera_free_space()
+            """         
+            camera_model = ConnectedCamera.model
+            """
+            prototype of getting camera info
+            serial_number = ConnectedCamera.serial_number
+            firmware_version = ConnectedCamera.firmware_version
+            battery_level = ConnectedCamera.battery_level
+            remaining_storage = ConnectedCamera.remaining_storage
+            """
+
+            """
+            makes the filename from the camera model.
+            """        
+            if camera_model:
+                filename = camera_model.replace(" ", "_")
+            else:
+                filename = "picture"
         
-        """
-        checks if the selected_pictures.json file exists and if it does, it will load the selected pictures.
-        """        
-        if os.path.exists(save_directory + '/selected_pictures.json'):
-            with open(save_directory + '/selected_pictures.json', 'r') as f:
-                selected_pictures = json.load(f)
-                if selected_pictures == 0 or selected_pictures is None:
-                    os.remove(save_directory + '/selected_pictures.json')
+            """
+            checks if the save directory has a session store with selected pictures and if it does, it asks to continue the session.
+            """        
+            session_store = SessionStore(save_directory)
+            selected_pictures = session_store.pictures
+        
+            """
+            brings the session catalog up to date. only new files are read, the catalog is shared with the viewer and the transfers.
+            """        
+            catalog = SessionCatalog(save_directory)
+            catalog.refresh()
+            print("Pictures in the save folder:", catalog.count())
+            catalog.close()
         
-        if os.path.exists(save_directory + '/selected_pictures.json'): # Check if there is an active session in the folder
-            print("\033[93mWarning: There is still an active session in this folder.\033[0m")
-            response = input("Do you want to continue with the session? (y/n): ")
-            while response.lower() != 'y' and response.lower() != 'n':
-                print("Invalid input. Please enter 'y' or 'n'.")
+            if session_exists(save_directory): # Check if there is an active session in the folder
+                print("\033[93mWarning: There is still an active session in this folder.\033[0m")
                 response = input("Do you want to continue with the session? (y/n): ")
+                while response.lower() != 'y' and response.lower() != 'n':
+                    print("Invalid input. Please enter 'y' or 'n'.")
+                    response = input("Do you want to continue with the session? (y/n): ")
             
-            """
-            if the response is 'n', the selected_pictures.json file will be deleted. If the file does not exist, it will print that the file does not exist. 
-            If the response is 'y', the selected_pictures.json file will be loaded.
-            """            
-            if response.lower() == 'n':
-                # Delete the selected_pictures.json file
-                if os.path.exists(save_directory + '/selected_pictures.json'):
-                    os.remove(save_directory + '/selected_pictures.json')
-                    print("selected_pictures.json file deleted.")
+                """
+                if the response is 'n', the session store will be deleted. 
+                If the response is 'y', the selected pictures of the session store will be used.
+                """            
+                if response.lower() == 'n':
+                    # Delete the session store
+                    session_store.delete()
+                    print("Session deleted.")
                     selected_pictures = []
                 else:
-                    print("selected_pictures.json file does not exist.")
-            else:
-                with open(save_directory + '/selected_pictures.json', 'r') as f:
-                    selected_pictures = json.load(f)
                     print(selected_pictures)
-            wait_for_keypress()
-    
-    """
-    checks if the camera is connected and if it is not, it will print that the camera is disconnected and wait for the camera to be connected.
-    """    
-    if not is_camera_connected():
-        print("Camera is disconnected.")
-        print("Please connect the camera.")
-        while not is_camera_connected():
-            time.sleep(2)  # Simulating delay before checking again
-        print("Camera is connected.")
-        time.sleep(2)  # Simulating delay before showing the main menu
+                wait_for_keypress()
     
-    ConnectedCamera.model = get_connected_camera_model()
+        """
+        the camera status and the free space come from the status monitor, which refreshes them in the background.
+        the menu is drawn from the last known state, so it never waits for the camera or the disks.
+        """    
+        status_monitor.watch_directories([save_directory] + backup_directories)
+        status = status_monitor.snapshot()
+        ConnectedCamera.model = status['model']
     
-    """
-    main menu layout.
-    """    
-    clear_terminal()
-    print("Menu:")
-    if not ConnectedCamera.model == None:
-        print("\033[92mCamera is connected.\033[0m")
-    else:
-        print("\033[91mNo camera is connected.\033[0m")
+        """
+        main menu layout.
+        """    
+        clear_terminal()
+        print("Menu:")
+        if status['connected'] is None:
+            print("\033[93mChecking the camera...\033[0m")
+        elif status['connected']:
+            print("\033[92mCamera is connected.\033[0m")
+        else:
+            print("\033[91mNo camera is connected. Please connect the camera.\033[0m")
         
-    print("Connected Camera:", ConnectedCamera.model)
-    print("Save Folder: \033[94m{}\033[0m ({})".format(save_directory, calculate_mb_left(save_directory)))
-
-    print("1. Capture")
-    print("2. Save Folder settings")
-    print("3. Transfer captured pictures in this session") 
-    print("4. Camera and system info (Work in progress)")
-    print("5. Start new session")
-    print("6. Reconnect camera")
-    print("7. Disconnect camera")
-    print("8. Exit")
-    """
-    Following input is used to choose the menu option.
-    """
-    choice = input("Enter your choice (1-8): ")
+        print("Connected Camera:", ConnectedCamera.model)
+        if status['connected']:
+            card_shots = " (~{} shots)".format(status['card_shots']) if status['card_shots'] is not None else ""
+            print("Battery: {} | Card: {} free{}".format(status['battery'] or "unknown", status['camera_free_space'] or "unknown", card_shots))
+            telemetry = format_trends(status_monitor.telemetry)
+            if telemetry:
+                print(telemetry)
+        print("Save Folder: \033[94m{}\033[0m ({})".format(save_directory, status_monitor.free_space(save_directory)))
+        if backup_directories:
+            print("Backup Folders: \033[94m{}\033[0m".format(", ".join(backup_directories)))
+            print(format_mirror_status(read_mirror_status(save_directory)))
 
-    if choice == "1": # Start Capture
-        while True:
-            clear_terminal()
-            print("Connected Camera:", ConnectedCamera.model)
-            print("Save Folder: \033[94m{}\033[0m ({})".format(save_directory, calculate_mb_left(save_directory))) # Show the save folder and remaining storage
-            print("1. Start Capture session")
-            print("2. Change the save folder")
-            print("3. View pictures")
-            print("4. Go back")
+        print("1. Capture")
+        print("2. Save Folder settings")
+        print("3. Transfer captured pictures in this session") 
+        print("4. Camera and system info (Work in progress)")
+        print("5. Start new session")
+        print("6. Reconnect camera")
+        print("7. Disconnect camera")
+        print("8. Exit")
+        """
+        Following input is used to choose the menu option.
+        """
+        choice = input("Enter your choice (1-8): ")
+
+        if choice == "1": # Start Capture
+            while True:
+                clear_terminal()
+                print("Connected Camera:", ConnectedCamera.model)
+                print("Save Folder: \033[94m{}\033[0m ({})".format(save_directory, status_monitor.free_space(save_directory))) # Show the save folder and remaining storage
+                print("1. Start Capture session")
+                print("2. Change the save folder")
+                print("3. View pictures")
+                print("4. Download pictures from the camera card")
+                print("5. Camera settings profiles")
+                print("6. Go back")
         
-            choice = input("Enter your choice (1-4): ")
-            """
-            Main function for this program. It allows the user to start a capture session, change the save folder, view pictures, and go back to the main menu.
-            """            
-            if choice == "1": # Start Capture
+                choice = input("Enter your choice (1-6): ")
+                """
+                Main function for this program. It allows the user to start a capture session, change the save folder, view pictures, and go back to the main menu.
+                """            
+                if choice == "1": # Start Capture
                 
-                timeout = wait_for_camera_connection()
-                if timeout == False:
-                    continue
+                    timeout = wait_for_camera_connection()
+                    if timeout == False:
+                        continue
                 
-                clear_terminal()
-                print("Connected Camera:", ConnectedCamera.model)
-                print("Save Folder: \033[94m{}\033[0m ({})".format(save_directory, calculate_mb_left(save_directory)))
-                time.sleep(1)  # Simulating delay before capturing picture
-                print("Starting capturing picture...")
-                time.sleep(1)  # Simulating delay before capturing picture
-                clear_terminal()
-                print('Press Esc key to exit the viewer.\nUse "A" and "D" keys to navigate the pictures.\n\nPress (A) key to go forward.\nPress (D) key to go back.\n\nPress spacebar to select and deselect the picture.\n')
-                wait_for_keypress()
-                time.sleep(1)
+                    clear_terminal()
+                    print('Press Esc key to exit the viewer.\nUse "A" and "D" keys to navigate the pictures.\n\nPress (A) key to go forward.\nPress (D) key to go back.\n\nPress spacebar to select and deselect the picture.\nPress (S) key to sort by sharpness.\nPress (F) key to hide the likely rejects (red border).\n\nBursts are stacked: (A) and (D) jump between stacks, (Q) and (E) step through a stack, (C) expands the stacks.\nPress (G) key for the contact sheet, (Q) and (E) flip its pages.\nPress (Z) key for a 100% zoom, pan with (I), (J), (K) and (L).\nPress (H) key for the histogram and (B) key for the clipping warning.\n')
+                    wait_for_keypress()
                 
-                """
-                checks if the filename is empty and if it is, it will use the default filename from the camera.
-                command is a list of commands that will be executed in the subprocess.
-                """                
-                if filename == "":
-                    command = ['gphoto2', '--capture-tethered', '--filename', os.path.join(save_directory, f"%f.%C")]
-                else:
-                    command = ['gphoto2', '--capture-tethered', '--filename', os.path.join(save_directory, f"{filename}-%f.%C")]
+                    """
+                    checks if the filename is empty and if it is, it will use the default filename from the camera.
+                    command is a list of commands that will be executed in the subprocess.
+                    the hook script adds every downloaded picture to the session catalog.
+                    the folder layout is stored in the session catalog, the hook script reads it to shard the pictures.
+                    the flush policy is stored as well, the hook script renames and flushes every downloaded picture.
+                    """                
+                    catalog = SessionCatalog(save_directory)
+                    catalog.set_layout(folder_layout, shard_frames)
+                    catalog.set_durability(durability_policy, batch_files, batch_ms)
+                    catalog.close()
+                    command = tether_command(save_directory, filename, folder_layout)
                 
-                """
-                commands are executed in the subprocess.
-                p1 is the picture viewer and p2 is the command that captures the picture.
+                    """
+                    commands are executed in the subprocess.
+                    p1 is the picture viewer and p2 is the command that captures the picture.
+                
+                    """                
+                    status_monitor.pause_camera() # The tether uses the camera until it is terminated
+                    p1 = subprocess.Popen(['python3', 'picture_viewer.py', save_directory])
+                    tether = {'p2': subprocess.Popen(command), 'p3': None, 'directory': save_directory, 'stopped': False}
+                    tether_lock = threading.Lock() # The failover runs on the watchdog thread, the teardown waits for it
                 
-                """                
-                p1 = subprocess.Popen(['python3', 'picture_viewer.py', save_directory, json.dumps(selected_pictures)])
-                p2 = subprocess.Popen(command)
+                    """
+                    p3 is the backup mirror. It copies every new picture to the backup folders while the tether is running.
+                    """                
+                    if backup_directories:
+                        tether['p3'] = subprocess.Popen(['python3', 'backup_mirror.py', save_directory, json.dumps(backup_directories)])
 
-                """
-                p2 is being terminated after p1 is done running.
-                """                
-                p1.wait()
-                p2.terminate()
-                clear_terminal()
+                    """
+                    the batch flusher flushes the open batch of the 'batch' policy once it is older than batch_ms,
+                    so the last pictures of a burst do not wait for the next shot.
+                    """
+                    batch_flusher = BatchFlusher(save_directory)
+                    batch_flusher.start()
+
+                    """
+                    the storage watchdog warns when the save folder is almost full and switches the tether and the backup mirror
+                    to the overflow folder before the disk fills in the middle of a burst.
+                    """                
+                    def switch_tether(directory):
+                        with tether_lock:
+                            if tether['stopped']: # The viewer was closed while the watchdog decided to switch
+                                return
+                            tether['p2'].terminate()
+                            tether['p2'].wait()
+                            catalog = SessionCatalog(tether['directory']) # The pictures that wait for a batch flush
+                            flush_batch(catalog)
+                            catalog.close()
+                            tether['directory'] = directory
+                            batch_flusher.save_directory = directory
+                            catalog = SessionCatalog(directory)
+                            catalog.set_layout(folder_layout, shard_frames)
+                            catalog.set_durability(durability_policy, batch_files, batch_ms)
+                            catalog.close()
+                            tether['p2'] = subprocess.Popen(tether_command(directory, filename, folder_layout))
+                            if tether['p3']:
+                                tether['p3'].terminate()
+                                tether['p3'].wait()
+                                tether['p3'] = subprocess.Popen(['python3', 'backup_mirror.py', directory, json.dumps(backup_directories)])
+                    storage_watchdog = StorageWatchdog(save_directory, [overflow_directory], switch_tether)
+                    storage_watchdog.start()
+
+                    """
+                    p2 is being terminated after p1 is done running, then the pictures of the last batch are flushed to the disk.
+                    a failover that is still running finishes first, so the gphoto2 process it started is the one that is terminated.
+                    p3 is asked to stop after p2 and finishes copying the pictures that are still queued.
+                    """                
+                    p1.wait()
+                    storage_watchdog.stop()
+                    with tether_lock:
+                        tether['stopped'] = True
+                    tether['p2'].terminate()
+                    tether['p2'].wait()
+                    batch_flusher.stop()
+                    catalog = SessionCatalog(tether['directory'])
+                    flush_batch(catalog)
+                    catalog.close()
+                    status_monitor.resume_camera()
+                    if tether['p3']:
+                        tether['p3'].terminate()
+                        tether['p3'].wait()
+                    clear_terminal()
+
+                    """
+                    if the watchdog switched to the overflow folder, the overflow folder becomes the save folder.
+                    the selection made in the viewer stays in the session of the previous save folder.
+                    """                
+                    if storage_watchdog.save_directory != save_directory:
+                        show_notice("\033[38;5;202mThe save folder was full, the pictures after the switch are in {}. It is the save folder now.\033[0m".format(storage_watchdog.save_directory))
+                        session_store.load() # The selection the viewer made in the previous save folder
+                        session_store.compact()
+                        save_directory = storage_watchdog.save_directory
+                        overflow_directory = None
+                        session_store = SessionStore(save_directory)
                 
-                """
-                loads the selected_pictures.json file into the selected_pictures variable.
-                """                
-                with open(save_directory + '/selected_pictures.json', 'r', encoding='utf-8') as f:
-                    selected_pictures = json.load(f)
-                    #selected_pictures = [os.path.basename(file) for file in selected_pictures]
-                print(selected_pictures)
-                wait_for_keypress()
+                    """
+                    reloads the session store, which the picture viewer changed, into the selected_pictures variable.
+                    """                
+                    session_store.load()
+                    selected_pictures = session_store.pictures
+                    print(selected_pictures)
+                    wait_for_keypress()
                 
-                """
-                after the pictures are taken, the user can choose to copy the picture to the destination directory.
-                if the user chooses to copy the picture, the user can choose the destination directory.
-                if the user chooses not to copy the picture, the program will print that the picture copy is cancelled.
-                """                
-                while True: # Picture transfer menu loop
-                    copy_choice = input("Do you want to copy the captured pictures? (y/n): ")
-                    if copy_choice.lower() == "y":
-                        clear_terminal()
-                        print("\033[94mChoose a destination directory to transfer the captured pictures.\n\033[0m")
-                        wait_for_keypress()
-                        destination_directory = choose_save_directory()  # Choose the destination directory
-                        print("Destination directory:", destination_directory)
-                        time.sleep(1)  # Simulating delay before copying the pictures
-
-                        if not destination_directory:  # Check if a destination directory is chosen
-                            clear_terminal()
-                            print("No destination directory chosen. Transfer cancelled.")
-                            time.sleep(1)
-                            break
-                        elif not save_directory:  # Check if a save directory is chosen
+                    """
+                    after the pictures are taken, the user can choose to copy the picture to the destination directory.
+                    if the user chooses to copy the picture, the user can choose the destination directory.
+                    if the user chooses not to copy the picture, the program will print that the picture copy is cancelled.
+                    """                
+                    while True: # Picture transfer menu loop
+                        copy_choice = input("Do you want to copy the captured pictures? (y/n): ")
+                        if copy_choice.lower() == "y":
                             clear_terminal()
-                            print("No save directory chosen. Transfer cancelled.")
-                            time.sleep(1)
-                            break
-                        elif save_directory == destination_directory:  # Check if the save and destination directories are the same
-                            print("Save and destination directories are the same.")
-                            print("Please choose a different destination directory.\n Transfer cancelled.")
-                            time.sleep(1)
+                            print("\033[94mChoose a destination directory to transfer the captured pictures.\n\033[0m")
+                            wait_for_keypress()
+                            destination_directory = choose_save_directory()  # Choose the destination directory
+                            print("Destination directory:", destination_directory)
+
+                            if not destination_directory:  # Check if a destination directory is chosen
+                                show_notice("No destination directory chosen. Transfer cancelled.")
+                                break
+                            elif not save_directory:  # Check if a save directory is chosen
+                                show_notice("No save directory chosen. Transfer cancelled.")
+                                break
+                            elif save_directory == destination_directory:  # Check if the save and destination directories are the same
+                                show_notice("Save and destination directories are the same.\nPlease choose a different destination directory.\n Transfer cancelled.")
+                                break
+                            else:
+                                destination_directories = choose_destination_directories(save_directory, destination_directory)
+                                copy_confirm(save_directory, destination_directories, selected_pictures)
+                                break
+                            
+                        elif copy_choice.lower() == "n":
+                            print("Picture copy cancelled.")
+                            wait_for_keypress()
                             break
                         else:
-                            copy_confirm(save_directory, destination_directory, selected_pictures)
-                            break
-                            
-                    elif copy_choice.lower() == "n":
-                        print("Picture copy cancelled.")
-                        wait_for_keypress()
-                        break
-                    else:
-                        print("Invalid choice. Please try again.")
-                        time.sleep(1)  # Simulating delay before showing the menu again
+                            print("Invalid choice. Please try again.")
 
-            elif choice == "2": # Change the save folder
-                """
-                this part of the code allows the user to change the save folder. If the user chooses to change the save folder, the program will ask the user to choose a new save directory.
+                elif choice == "2": # Change the save folder
+                    """
+                    this part of the code allows the user to change the save folder. If the user chooses to change the save folder, the program will ask the user to choose a new save directory.
                 
-                """
-                save_directory, selected_pictures = change_save_directory(save_directory, selected_pictures)
+                    """
+                    save_directory, session_store = change_save_directory(save_directory, session_store)
+                    selected_pictures = session_store.pictures
                     
-            elif choice == "3": # View pictures
-                """
-                this part of the code allows the user to view the pictures taken during the session. 
-                If the user chooses to view the pictures, the program will show the latest picture taken in a window.
-                selected_pictures.json file is loaded into the selected_pictures variable ad
-                """                
+                elif choice == "3": # View pictures
+                    """
+                    this part of the code allows the user to view the pictures taken during the session. 
+                    If the user chooses to view the pictures, the program will show the latest picture taken in a window.
+                    the selected pictures are changed in the session store of the save directory.
+                    """                
                 
-                clear_terminal()
-                """
-                instructions are shown for the user on how to navigate the picture viewer.
-                """                
-                print('Press Esc key to exit the viewer.\nUse "A" and "D" keys to navigate the pictures.\n\nPress (A) key to go back.\nPress (D) key to go forward.\n\nPress spacebar to select and deselect the picture.\n')
-                wait_for_keypress()
-                time.sleep(1)
+                    clear_terminal()
+                    """
+                    instructions are shown for the user on how to navigate the picture viewer.
+                    """                
+                    print('Press Esc key to exit the viewer.\nUse "A" and "D" keys to navigate the pictures.\n\nPress (A) key to go back.\nPress (D) key to go forward.\n\nPress spacebar to select and deselect the picture.\nPress (S) key to sort by sharpness.\nPress (F) key to hide the likely rejects (red border).\n\nBursts are stacked: (A) and (D) jump between stacks, (Q) and (E) step through a stack, (C) expands the stacks.\nPress (G) key for the contact sheet, (Q) and (E) flip its pages.\nPress (Z) key for a 100% zoom, pan with (I), (J), (K) and (L).\nPress (H) key for the histogram and (B) key for the clipping warning.\n')
+                    wait_for_keypress()
                 
-                p1 = subprocess.Popen(['python3', 'picture_viewer.py', save_directory, json.dumps(selected_pictures)])
-                p1.wait()
-                """
-                after selecting pictures in the picture viewer 
-                selected_pictures.json file is loaded into the selected_pictures variable. 
-                """                
-                with open(save_directory + '/selected_pictures.json', 'r', encoding='utf-8') as f:
-                    selected_pictures = json.load(f)
+                    p1 = subprocess.Popen(['python3', 'picture_viewer.py', save_directory])
+                    p1.wait()
+                    """
+                    after selecting pictures in the picture viewer 
+                    the session store is reloaded into the selected_pictures variable. 
+                    """                
+                    session_store.load()
+                    selected_pictures = session_store.pictures
                     
-                #clear_terminal()
-                wait_for_keypress()
+                    #clear_terminal()
+                    wait_for_keypress()
             
             
-            elif choice == "4": # Go back
-                """
-                option to go back to the main menu.
-                """                
-                break
-            else:
-                print("\033[91mInvalid choice. Please try again.\033[0m")
-                time.sleep(1)  # Simulating delay before showing the menu again
+                elif choice == "4": # Download pictures from the camera card
+                    """
+                    downloads the pictures that were taken without the tether.
+                    only the pictures that are not in the save folder yet are downloaded.
+                    the camera telemetry is sampled over the same connection between the downloads.
+                    """                
+                    clear_terminal()
+                    status_monitor.pause_camera() # The download uses the camera
+                    camera_session = CameraSession()
+                    telemetry_sampler = TelemetrySampler(camera_session, status_monitor.telemetry)
+                    try:
+                        if camera_session.open():
+                            telemetry_sampler.start()
+                            ingest_from_camera(save_directory, filename, camera_session)
+                    finally:
+                        if telemetry_sampler.is_alive():
+                            telemetry_sampler.stop()
+                        camera_session.close()
+                        status_monitor.resume_camera()
+                    wait_for_keypress()
+            
+                elif choice == "5": # Camera settings profiles
+                    """
+                    camera settings profiles menu. A profile is a saved set of camera settings (ISO, shutter speed, aperture,
+                    white balance, image quality, capture target...), see camera_profiles.
+                    the camera stays connected while the menu is open, so switching between profiles only writes the settings that differ.
+                    """                
+                    status_monitor.pause_camera() # The profiles use the camera
+                    camera_session = CameraSession()
+                    telemetry_sampler = TelemetrySampler(camera_session, status_monitor.telemetry)
+                    try:
+                        if not camera_session.open():
+                            wait_for_keypress()
+                            continue
+                        telemetry_sampler.start()
+                        while True:
+                            clear_terminal()
+                            profiles = load_profiles()
+                            profile_names = sorted(profiles)
+                            print("Camera settings profiles:")
+                            for number, name in enumerate(profile_names, start=1):
+                                print(f"{number}. {name} ({len(profiles[name])} settings)")
+                            print("S. Save the current camera settings as a profile")
+                            print("X. Delete a profile")
+                            print("B. Go back")
+                            profile_choice = input("Enter your choice: ").strip()
+                            if profile_choice.isdigit() and 1 <= int(profile_choice) <= len(profile_names):
+                                name = profile_names[int(profile_choice) - 1]
+                                start = time.perf_counter()
+                                try:
+                                    changes, problems = apply_profile(camera_session, profiles[name])
+                                except gp.GPhoto2Error as e:
+                                    show_notice(f"\033[91mCould not apply the profile {name}: {e}\033[0m")
+                                    continue
+                                show_notice(f"\033[92mProfile {name} applied in {(time.perf_counter() - start) * 1000:.0f} ms:\033[0m\n" + "\n".join(format_changes(changes, problems)))
+                            elif profile_choice.lower() == "s":
+                                name = input("Profile name: ").strip()
+                                if not name:
+                                    show_notice("\033[91mThe profile needs a name.\033[0m")
+                                    continue
+                                if name in profiles and input(f"Replace the profile {name}? (y/n): ").lower() != "y":
+                                    continue
+                                try:
+                                    profiles[name] = capture_profile(camera_session)
+                                except gp.GPhoto2Error as e:
+                                    show_notice(f"\033[91mCould not read the camera settings: {e}\033[0m")
+                                    continue
+                                save_profiles(profiles)
+                                show_notice(f"\033[92mProfile {name} saved: \033[0m" + ", ".join(f"{key}={value}" for key, value in profiles[name].items()))
+                            elif profile_choice.lower() == "x":
+                                name = input("Name of the profile to delete: ").strip()
+                                if profiles.pop(name, None) is None:
+                                    show_notice(f"\033[91mThere is no profile {name}.\033[0m")
+                                else:
+                                    save_profiles(profiles)
+                                    show_notice(f"Profile {name} deleted.")
+                            elif profile_choice.lower() == "b":
+                                break
+                            else:
+                                show_notice("\033[91mInvalid choice. Please try again.\033[0m")
+                    finally:
+                        if telemetry_sampler.is_alive():
+                            telemetry_sampler.stop()
+                        camera_session.close()
+                        status_monitor.resume_camera()
+            
+                elif choice == "6": # Go back
+                    """
+                    option to go back to the main menu.
+                    """                
+                    break
+                else:
+                    show_notice("\033[91mInvalid choice. Please try again.\033[0m")
                     
-    elif choice == "2": # Save Folder settings
+        elif choice == "2": # Save Folder settings
         
-        while True:
-            clear_terminal()
-            print("Connected Camera:", ConnectedCamera.model)
-            print("Save Folder: \033[94m{}\033[0m ({})".format(save_directory, calculate_mb_left(save_directory)))
-            print("1. Open save folder")
-            print("2. Change save folder")
-            print("3. Change filename (Current filename:", filename, ")")
-            print("4. Go back")
-            choice = input("Enter your choice (1-4): ")
+            while True:
+                clear_terminal()
+                print("Connected Camera:", ConnectedCamera.model)
+                print("Save Folder: \033[94m{}\033[0m ({})".format(save_directory, status_monitor.free_space(save_directory)))
+                print("1. Open save folder")
+                print("2. Change save folder")
+                print("3. Change filename (Current filename:", filename, ")")
+                print("4. Backup mirror folders (Current:", len(backup_directories), ")")
+                print("5. Overflow folder (Current:", overflow_directory or "none", ")")
+                print("6. Folder layout (Current:", describe_layout(folder_layout, shard_frames), ")")
+                print("7. Write safety (Current:", describe_policy(durability_policy, batch_files, batch_ms), ")")
+                print("8. Go back")
+                choice = input("Enter your choice (1-8): ")
             
-            if choice == "1": # Open save folder
-                """
-                opens the save folder in the file explorer using the subprocess module. It uses the os.devnull to suppress the output of the command.
-                it checks the platform and uses the appropriate command to open the file explorer.
-                """                
-                with open(os.devnull, 'w') as devnull: # Suppressing the output of the command
-                    try:
-                        if sys.platform == "darwin": # Mac
-                            subprocess.Popen(['open', save_directory], stderr=devnull)
-                        else: # Linux
-                            subprocess.Popen(['xdg-open', save_directory], stderr=devnull)
-                    except PermissionError:
-                        print("Please run the program with sudo privileges to open the save folder.")
-                wait_for_keypress()
+                if choice == "1": # Open save folder
+                    """
+                    opens the save folder in the file explorer using the subprocess module. It uses the os.devnull to suppress the output of the command.
+                    it checks the platform and uses the appropriate command to open the file explorer.
+                    """                
+                    with open(os.devnull, 'w') as devnull: # Suppressing the output of the command
+                        try:
+                            if sys.platform == "darwin": # Mac
+                                subprocess.Popen(['open', save_directory], stderr=devnull)
+                            else: # Linux
+                                subprocess.Popen(['xdg-open', save_directory], stderr=devnull)
+                        except PermissionError:
+                            print("Please run the program with sudo privileges to open the save folder.")
+                    wait_for_keypress()
                 
-            elif choice == "2": # Choose save folder
-                """
-                changes the save folder. If the user chooses to change the save folder, the program will ask the user to choose a new save directory.
-                """        
-                save_directory, selected_pictures = change_save_directory(save_directory, selected_pictures)   
+                elif choice == "2": # Choose save folder
+                    """
+                    changes the save folder. If the user chooses to change the save folder, the program will ask the user to choose a new save directory.
+                    """        
+                    save_directory, session_store = change_save_directory(save_directory, session_store)
+                    selected_pictures = session_store.pictures   
             
                 
-            elif choice == "3": # Filename change
-                """
-                filename change menu. If the user chooses to change the filename, the program will ask the user to enter a custom filename.
-                it checks if the filename is empty and if it is, it will use the default filename from the camera.
-                there is a check for invalid characters in the filename.
-                if the filename is invalid, the program will print an error message and ask the user to enter a valid filename.
-                """                
-                previous_filename = filename
-                while True: # Filename change menu loop
-                    clear_terminal()
-                    print("Current filename:", previous_filename)
-                    filename = input("Enter the custom filename: ")
-                    if not filename or filename.strip() == "":
-                        print("Invalid filename. Please enter a valid filename.")
-                        filename = previous_filename
-                        time.sleep(1)  # Simulating delay before showing the menu again
-                    elif any(char in filename for char in ['/', '\\', ':', '*', '?', '"', '<', '>', '|']):
-                        print("Invalid filename. The following characters are not allowed: / \\ : * ? \" < > |")
-                        filename = previous_filename
-                        time.sleep(1)  # Simulating delay before showing the menu again
-                    else:
-                        # Continue with the rest of the code
+                elif choice == "3": # Filename change
+                    """
+                    filename change menu. If the user chooses to change the filename, the program will ask the user to enter a custom filename.
+                    it checks if the filename is empty and if it is, it will use the default filename from the camera.
+                    there is a check for invalid characters in the filename.
+                    if the filename is invalid, the program will print an error message and ask the user to enter a valid filename.
+                    """                
+                    previous_filename = filename
+                    while True: # Filename change menu loop
+                        clear_terminal()
+                        print("Current filename:", previous_filename)
+                        filename = input("Enter the custom filename: ")
+                        if not filename or filename.strip() == "":
+                            show_notice("Invalid filename. Please enter a valid filename.")
+                            filename = previous_filename
+                        elif any(char in filename for char in ['/', '\\', ':', '*', '?', '"', '<', '>', '|']):
+                            show_notice("Invalid filename. The following characters are not allowed: / \\ : * ? \" < > |")
+                            filename = previous_filename
+                        else:
+                            # Continue with the rest of the code
+                            print("Filename changed to:", filename)
+                            previous_filename = filename
+                            break
                         print("Filename changed to:", filename)
                         previous_filename = filename
-                        time.sleep(0.5)  # Simulating delay before showing the menu again
-                        break
-                    print("Filename changed to:", filename)
-                    previous_filename = filename
-                time.sleep(0.5)  # Simulating delay before showing the menu again
-                wait_for_keypress()
+                    wait_for_keypress()
                 
-            elif choice == "4": # Go back
-                break
-            else:
-                print("\033[91mInvalid choice. Please try again.\033[0m")
-                time.sleep(1)  # Simulating delay before showing the menu again
+                elif choice == "4": # Backup mirror folders
+                    """
+                    backup mirror folders menu. Every picture captured in the capture session is copied to these folders as soon as it lands.
+                    the user can add a folder or remove all of them. The save folder itself can not be used as a backup folder.
+                    """                
+                    while True: # Backup mirror folders menu loop
+                        clear_terminal()
+                        print("Backup mirror folders:")
+                        if not backup_directories:
+                            print("No backup folders. Pictures are only saved to the save folder.")
+                        status_monitor.watch_directories([save_directory] + backup_directories)
+                        for backup_directory in backup_directories:
+                            print("\033[94m{}\033[0m ({})".format(backup_directory, status_monitor.free_space(backup_directory)))
+                        print("1. Add backup folder")
+                        print("2. Remove all backup folders")
+                        print("3. Go back")
+                        backup_choice = input("Enter your choice (1-3): ")
+                        if backup_choice == "1":
+                            backup_directory = choose_save_directory()
+                            if not backup_directory:
+                                print("No backup folder chosen.")
+                            elif backup_directory == save_directory:
+                                print("The backup folder can not be the save folder.")
+                            elif backup_directory in backup_directories:
+                                print("This folder is already a backup folder.")
+                            else:
+                                backup_directories.append(backup_directory)
+                                print("Backup folder added:", backup_directory)
+                            wait_for_keypress()
+                        elif backup_choice == "2":
+                            backup_directories = []
+                            print("All backup folders removed.")
+                            wait_for_keypress()
+                        elif backup_choice == "3":
+                            break
+                        else:
+                            show_notice("\033[91mInvalid choice. Please try again.\033[0m")
+
+                elif choice == "5": # Overflow folder
+                    """
+                    overflow folder menu. When the save folder is almost full during a capture session, the tether switches to this folder
+                    at the next pause between bursts (see storage_watchdog). It should be on another drive than the save folder.
+                    """                
+                    overflow_choice = choose_save_directory()
+                    if not overflow_choice:
+                        overflow_directory = None
+                        print("No overflow folder. The capture session only warns when the save folder is almost full.")
+                    elif overflow_choice == save_directory:
+                        print("The overflow folder can not be the save folder.")
+                    else:
+                        overflow_directory = overflow_choice
+                        print("Overflow folder:", overflow_directory)
+                    wait_for_keypress()
                 
-    elif choice == "3": # Transfer captured pictures in this session
-        """
-        transfer captured pictures menu. 
-        If the user chooses to transfer the captured pictures, the program will ask the user to choose the destination directory.
-        depending on the user's choice, the program will either copy the pictures to the destination directory or print that the transfer is cancelled.
-        """        
-        clear_terminal()
-        cancel = 0
-        print("Choose a destination directory to transfer the captured pictures.\n")
-        time.sleep(1)  # Simulating delay before choosing the destination directory
-        while True:
-            destination_directory = choose_save_directory()  # Choose the destination directory
-            print("Destination directory:", destination_directory)
-            time.sleep(1)  # Simulating delay before copying the pictures
-
-            if not destination_directory:  # Check if a destination directory is chosen
-                clear_terminal()
-                print("No destination directory chosen. Transfer cancelled.")
-                cancel = 1
-                break
+                elif choice == "6": # Folder layout
+                    """
+                    folder layout menu. Very large sessions can be split into subfolders, so no folder grows past a few thousand pictures.
+                    the layout is used from the next capture session on, the pictures that are already saved stay where they are.
+                    """                
+                    clear_terminal()
+                    for number, layout in enumerate(LAYOUTS, start=1):
+                        print(f"{number}. {describe_layout(layout, shard_frames)}")
+                    layout_choice = input(f"Enter your choice (1-{len(LAYOUTS)}): ")
+                    if layout_choice.isdigit() and 1 <= int(layout_choice) <= len(LAYOUTS):
+                        folder_layout = LAYOUTS[int(layout_choice) - 1]
+                        if folder_layout == 'frames':
+                            frames_choice = input(f"Shots per folder (Enter for {shard_frames}): ")
+                            if frames_choice.isdigit() and int(frames_choice) > 0:
+                                shard_frames = int(frames_choice)
+                        print("Folder layout:", describe_layout(folder_layout, shard_frames))
+                        wait_for_keypress()
+                    else:
+                        show_notice("\033[91mInvalid choice. Please try again.\033[0m")
 
-            if not save_directory:  # Check if a save directory is chosen
-                clear_terminal()
-                print("No save directory chosen. Transfer cancelled.")
-                cancel = 1
-                break
-
-            if save_directory == destination_directory:  # Check if the save and destination directories are the same
-                print("Save and destination directories are the same.")
-                print("Please choose a different destination directory.")
-                continue
-
-            while cancel == 0: # Check if the transfer is not cancelled
-                copy_confirm(save_directory, destination_directory, selected_pictures)      
-                break
+                elif choice == "7": # Write safety
+                    """
+                    write safety menu. Every tethered picture is saved under a temporary name and renamed when it is complete,
+                    the policy sets how often the pictures are flushed to the disk: every picture, in batches or never.
+                    """                
+                    clear_terminal()
+                    for number, policy in enumerate(POLICIES, start=1):
+                        print(f"{number}. {describe_policy(policy, batch_files, batch_ms)}")
+                    policy_choice = input(f"Enter your choice (1-{len(POLICIES)}): ")
+                    if policy_choice.isdigit() and 1 <= int(policy_choice) <= len(POLICIES):
+                        durability_policy = POLICIES[int(policy_choice) - 1]
+                        if durability_policy == 'batch':
+                            files_choice = input(f"Pictures per flush (Enter for {batch_files}): ")
+                            if files_choice.isdigit() and int(files_choice) > 0:
+                                batch_files = int(files_choice)
+                            ms_choice = input(f"Maximum milliseconds between flushes (Enter for {batch_ms}): ")
+                            if ms_choice.isdigit():
+                                batch_ms = int(ms_choice)
+                        print("Write safety:", describe_policy(durability_policy, batch_files, batch_ms))
+                        wait_for_keypress()
+                    else:
+                        show_notice("\033[91mInvalid choice. Please try again.\033[0m")
+
+                elif choice == "8": # Go back
+                    break
+                else:
+                    show_notice("\033[91mInvalid choice. Please try again.\033[0m")
+                
+        elif choice == "3": # Transfer captured pictures in this session
+            """
+            transfer captured pictures menu. 
+            If the user chooses to transfer the captured pictures, the program will ask the user to choose the destination directory.
+            depending on the user's choice, the program will either copy the pictures to the destination directory or print that the transfer is cancelled.
+            """        
+            clear_terminal()
+            cancel = 0
+            print("Choose a destination directory to transfer the captured pictures.\n")
+            while True:
+                destination_directory = choose_save_directory()  # Choose the destination directory
+                print("Destination directory:", destination_directory)
+
+                if not destination_directory:  # Check if a destination directory is chosen
+                    clear_terminal()
+                    print("No destination directory chosen. Transfer cancelled.")
+                    cancel = 1
+                    break
+
+                if not save_directory:  # Check if a save directory is chosen
+                    clear_terminal()
+                    print("No save directory chosen. Transfer cancelled.")
+                    cancel = 1
+                    break
+
+                if save_directory == destination_directory:  # Check if the save and destination directories are the same
+                    print("Save and destination directories are the same.")
+                    print("Please choose a different destination directory.")
+                    continue
+
+                while cancel == 0: # Check if the transfer is not cancelled
+                    destination_directories = choose_destination_directories(save_directory, destination_directory)
+                    copy_confirm(save_directory, destination_directories, selected_pictures)      
+                    break
             
-            if cancel == 0:
-                break
-            wait_for_keypress()
+                if cancel == 0:
+                    break
+                wait_for_keypress()
             
-    elif choice == "4": # Camera info (work in progress)
-        """
-        shows the camera and system info.
-        is in the work in progress state. some functions are commented out.
-        """        
-        while True: # Camera info menu loop
-            clear_terminal()                
-            print("Connected Camera:", ConnectedCamera.model)
-            print("Save Folder: \033[94m{}\033[0m ({})".format(save_directory, calculate_mb_left(save_directory)))
-            print("\033[91m1. My Camera info: WARNING not reliable\033[0m")
-            print("2. All connected cameras")
-            print("3. All supported cameras")
-            print("4. All available USB ports")
-            print("5. Go back")
-            choice = input("Enter your choice (1-5): ") 
+        elif choice == "4": # Camera info (work in progress)
+            """
+            shows the camera and system info.
+            is in the work in progress state. some functions are commented out.
+            """        
+            while True: # Camera info menu loop
+                clear_terminal()                
+                print("Connected Camera:", ConnectedCamera.model)
+                print("Save Folder: \033[94m{}\033[0m ({})".format(save_directory, status_monitor.free_space(save_directory)))
+                print("\033[91m1. My Camera info: WARNING not reliable\033[0m")
+                print("2. All connected cameras")
+                print("3. All supported cameras")
+                print("4. All available USB ports")
+                print("5. Pipeline timings (p50/p95/p99)")
+                print("6. Camera telemetry")
+                print("7. Go back")
+                choice = input("Enter your choice (1-7): ") 
                             
-            if choice == "1": # My Camera info
-                clear_terminal()
-                #print("All supported abbilities of the connected camera:")
-                #print(get_camera_abilities())
-                print("\nCamera Information:")
-                print("Model:", camera_model)
-                #show_camera_info(camera_model, serial_number, firmware_version, battery_level, remaining_storage) # Show the camera information
-                wait_for_keypress()
+                if choice == "1": # My Camera info
+                    clear_terminal()
+                    #print("All supported abbilities of the connected camera:")
+                    #print(get_camera_abilities())
+                    print("\nCamera Information:")
+                    print("Model:", camera_model)
+                    #show_camera_info(camera_model, serial_number, firmware_version, battery_level, remaining_storage) # Show the camera information
+                    wait_for_keypress()
                     
-            elif choice == "2": # All connected cameras
-                clear_terminal()
-                print("All Connected Cameras:")
-                print(ConnectedCamera.model)
-                wait_for_keypress()
+                elif choice == "2": # All connected cameras
+                    clear_terminal()
+                    print("All Connected Cameras:")
+                    print(ConnectedCamera.model)
+                    wait_for_keypress()
                 
-            elif choice == "3": # All supported cameras
-                clear_terminal()
-                print("All Supported Cameras:")
-                supported_cameras = list_available_cameras()
-                for camera in supported_cameras:
-                    print(camera)
-                wait_for_keypress()
+                elif choice == "3": # All supported cameras
+                    clear_terminal()
+                    print("All Supported Cameras:")
+                    supported_cameras = list_available_cameras()
+                    for camera in supported_cameras:
+                        print(camera)
+                    wait_for_keypress()
                 
-            elif choice == "4": # All available USB ports
-                clear_terminal()
-                print("All Available USB Ports:")
-                usb_ports = list_available_usb_ports()
-                for port in usb_ports:
-                    print(port)
-                wait_for_keypress()
+                elif choice == "4": # All available USB ports
+                    clear_terminal()
+                    print("All Available USB Ports:")
+                    usb_ports = list_available_usb_ports()
+                    for port in usb_ports:
+                        print(port)
+                    wait_for_keypress()
                 
-            elif choice == "5": # Go back
-                break
-            else:
-                print("\033[91mInvalid choice. Please try again.\033[0m")
-                time.sleep(1)  # Simulating delay before showing the menu again
+                elif choice == "5": # Pipeline timings
+                    """
+                    shows how long every stage of the pipeline took in this save folder: download, catalog, detect, decode, display and transfers.
+                    the timings are recorded by every process into the trace of the save folder, see pipeline_trace.
+                    the summary is also written as a Prometheus text file next to the trace.
+                    """
+                    clear_terminal()
+                    print("Pipeline timings of \033[94m{}\033[0m:".format(save_directory))
+                    statistics = stage_statistics(read_trace(save_directory))
+                    for line in format_stage_statistics(statistics):
+                        print(line)
+                    if statistics:
+                        try:
+                            print("Snapshot written to", write_stats_snapshot(save_directory, statistics))
+                        except OSError as e:
+                            print("\033[91mCould not write the snapshot:", e, "\033[0m")
+                    wait_for_keypress()
+                
+                elif choice == "6": # Camera telemetry
+                    """
+                    shows the battery level, the card space and the shutter count of the camera with their trends per hour.
+                    the samples are recorded in the background, see camera_telemetry, and can be exported as CSV into the save folder.
+                    no samples are recorded while the tether runs, the gphoto2 tether holds the connection to the camera.
+                    """
+                    clear_terminal()
+                    print(format_trends(status_monitor.telemetry) or "No telemetry recorded yet.")
+                    print(len(status_monitor.telemetry), "samples recorded.")
+                    print("No samples are recorded while the tether runs: the tether holds the connection to the camera, which accepts only one.")
+                    if len(status_monitor.telemetry) and input("Export the samples as CSV into the save folder? (y/n): ").lower() == "y":
+                        csv_path = os.path.join(save_directory, 'camera_telemetry.csv')
+                        try:
+                            print(status_monitor.telemetry.export_csv(csv_path), "samples written to", csv_path)
+                        except OSError as e:
+                            print("\033[91mCould not write the CSV file:", e, "\033[0m")
+                    wait_for_keypress()
+                
+                elif choice == "7": # Go back
+                    break
+                else:
+                    show_notice("\033[91mInvalid choice. Please try again.\033[0m")
             
-    elif choice == "5": # Start new session
-        """
-        starts a new session. If the user chooses to start a new session, the program will ask the user to confirm the new session.
-        if the user confirms the new session, the program will start a new session, meaning that the selected_pictures.json file will be deleted and the variables will be initialized.
-        """        
-        clear_terminal()
-        confirm = input("Are you sure you want to start a new session? (y/n): ")
-        if confirm.lower() == "y":
-            print("New session starting...")
-
-            selected_pictures = []
-            cameras = []
-            destination_directory = None
-            camera = {}
-            new_session_check = True
-            if os.path.exists(save_directory + '/selected_pictures.json'):
-                os.remove(save_directory + '/selected_pictures.json')
-                print("selected_pictures.json file deleted.")
-            save_directory = None
-
-            time.sleep(2)  # Simulating delay before showing the main menu
-            wait_for_keypress()
-        else:
-            print("Session not restarted.")
-            time.sleep(2) 
+        elif choice == "5": # Start new session
+            """
+            starts a new session. If the user chooses to start a new session, the program will ask the user to confirm the new session.
+            if the user confirms the new session, the program will start a new session, meaning that the session store will be deleted and the variables will be initialized.
+            """        
+            clear_terminal()
+            confirm = input("Are you sure you want to start a new session? (y/n): ")
+            if confirm.lower() == "y":
+                print("New session starting...")
+
+                selected_pictures = []
+                cameras = []
+                destination_directory = None
+                camera = {}
+                new_session_check = True
+                session_store.delete()
+                print("Session deleted.")
+                save_directory = None
+
+                wait_for_keypress()
+            else:
+                show_notice("Session not restarted.")
                         
-    elif choice == "6": # Reconnect camera
-        """
-        reconnects the camera. If the user chooses to reconnect the camera, the program will ask the user to confirm the reconnection.
-        """        
-        print("Reconnecting camera...")
-        confirm = input("Are you sure you want to reconnect the camera? (y/n): ")
-        if confirm.lower() == "y":
-            while not is_camera_connected():
-                time.sleep(2)  # Simulating delay before checking again
-            print("Camera reconnected.")
-        else:
-            print("Camera not reconnected.")
+        elif choice == "6": # Reconnect camera
+            """
+            reconnects the camera. If the user chooses to reconnect the camera, the program will ask the user to confirm the reconnection.
+            """        
+            print("Reconnecting camera...")
+            confirm = input("Are you sure you want to reconnect the camera? (y/n): ")
+            if confirm.lower() == "y":
+                print("Waiting for the camera...")
+                if status_monitor.wait_for_camera(timeout=20):
+                    print("Camera reconnected.")
+                else:
+                    print("\033[91mTimeout: No camera detected.\033[0m")
+            else:
+                print("Camera not reconnected.")
             
-        wait_for_keypress()
+            wait_for_keypress()
             
-    elif choice == "7": # Disconnect camera
-        """
-        asks the user to confirm the disconnection of the camera. If the user confirms the disconnection, the program will disconnect the camera.
-        """        
-        confirm = input("Are you sure you want to disconnect the camera? (y/n): ")
-        if confirm.lower() == "y":
-            disconnect_camera()
-            print("Camera disconnected.")
-        else:
-            print("Camera not disconnected.")
+        elif choice == "7": # Disconnect camera
+            """
+            asks the user to confirm the disconnection of the camera. If the user confirms the disconnection, the program will disconnect the camera.
+            """        
+            confirm = input("Are you sure you want to disconnect the camera? (y/n): ")
+            if confirm.lower() == "y":
+                status_monitor.pause_camera()
+                disconnect_camera()
+                status_monitor.resume_camera()
+                print("Camera disconnected.")
+            else:
+                print("Camera not disconnected.")
         
-        wait_for_keypress()
+            wait_for_keypress()
     
-    elif choice == "8": # Exit
-        """
-        exits the program. If the user chooses to exit the program, the program will ask the user to confirm the exit.
-        """    
-        break
-    else:
-        print("\033[91mInvalid choice. Please try again.\033[0m")
-        time.sleep(1) # Simulating delay before showing the menu again
+        elif choice == "8": # Exit
+            """
+            exits the program. If the user chooses to exit the program, the program will ask the user to confirm the exit.
+            """    
+            break
+        else:
+            show_notice("\033[91mInvalid choice. Please try again.\033[0m")
  
-print("Exiting camera application.")
-"""
-if the selected_pictures.json file exists and the selected_pictures variable is empty, the program will delete the selected_pictures.json file.
-"""
-if os.path.exists(save_directory + '/selected_pictures.json'):
-    if selected_pictures == 0 or selected_pictures is None or selected_pictures == [] or selected_pictures == "[]" or selected_pictures == "":
-        os.remove(save_directory + '/selected_pictures.json')
+    print("Exiting camera application.")
+    status_monitor.stop()
+    """
+    the journal of the session store is compacted into selected_pictures.json.
+    if no pictures are selected, the session store is deleted.
+    """
+    session_store.load()
+    if session_store:
+        session_store.compact()
+    else:
+        session_store.delete()
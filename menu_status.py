@@ -0,0 +1,239 @@
+"""
+This module keeps the status that the main menu shows up to date in the background.
+
+The camera state (connected, model, battery level and free space on the card) and the free space of the save
+and backup folders are refreshed by asyncio tasks in a background thread. The free space comes with the number of
+shots that still fit (see `storage_watchdog`) and the write throughput while something writes to the folder. The menu draws the last known state
+with `snapshot`, so drawing the menu and reading the menu input never wait for USB or the file system:
+- The camera is detected every CAMERA_INTERVAL seconds with `gphoto2 --auto-detect` as an asyncio subprocess.
+  The battery level and the card space need the camera itself and are read every `details_interval` seconds,
+  every read is also added to the telemetry ring (see camera_telemetry).
+- The free space of the folders is read every DISK_INTERVAL seconds in the default executor, so a slow network
+  drive only delays its own value.
+
+gphoto2 can only be used by one process at a time, so the camera is not polled while the tether or the card
+download use it, see `pause_camera` and `resume_camera`.
+
+Libraries used:
+- time: Provides the monotonic clock for the refresh intervals.
+- asyncio: Provides the event loop, the subprocesses and the timers of the background tasks.
+- threading: Provides the background thread and the lock of the shared state.
+- storage_watchdog: Provides the free space, the write throughput and the projection of the remaining shots.
+- camera_utils: Provides the parsing of the gphoto2 output.
+- camera_telemetry: Provides the time series of the battery level and the card space.
+"""
+import time
+import asyncio
+import threading
+from storage_watchdog import free_bytes, shot_size, project, format_projection, ThroughputTracker
+from camera_utils import parse_camera_model, parse_config_value, parse_camera_free_space, parse_camera_free_bytes
+from camera_telemetry import TelemetryRing, TELEMETRY_INTERVAL, parse_battery
+
+CAMERA_INTERVAL = 3 # Seconds between two camera detections
+CAMERA_DETAILS_INTERVAL = TELEMETRY_INTERVAL # Seconds between two reads of the battery level and the card space
+DISK_INTERVAL = 5 # Seconds between two reads of the free space of the folders
+COMMAND_TIMEOUT = 10 # Seconds until a hanging gphoto2 command is killed
+
+async def run_gphoto2(*arguments, timeout=COMMAND_TIMEOUT):
+    """
+    Runs a gphoto2 command as an asyncio subprocess.
+
+    Returns:
+        str or None: The output of the command, or None if it failed, timed out or gphoto2 is not installed.
+    """
+    try:
+        process = await asyncio.create_subprocess_exec('gphoto2', *arguments, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    except OSError:
+        return None
+    try:
+        output, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return None
+    return output.decode('utf-8', errors='replace') if process.returncode == 0 else None
+
+class StatusMonitor:
+    """
+    Refreshes the camera and folder status in a background thread.
+
+    The state is a dictionary with:
+    - 'connected' (bool or None): If a camera is detected, None until the first detection finished.
+    - 'model' (str or None): The model of the camera.
+    - 'battery' (str or None): The battery level of the camera.
+    - 'camera_free_space' (str or None): The free space on the card of the camera.
+    - 'card_shots' (int or None): The number of shots that still fit on the card.
+    - 'free_space' (dict): The formatted free space and remaining shots of every watched folder.
+
+    Attributes:
+        telemetry (TelemetryRing): The time series of the camera, also filled by a `TelemetrySampler` while the
+                                   program holds a camera session.
+    """
+
+    def __init__(self, details_interval=CAMERA_DETAILS_INTERVAL):
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.state = {'connected': None, 'model': None, 'battery': None, 'camera_free_space': None, 'card_shots': None, 'free_space': {}}
+        self.directories = []
+        self.trackers = {} # The write throughput of every watched folder
+        self.bytes_per_shot = None # The average shot size in the save folder
+        self.details_interval = details_interval
+        self.telemetry = TelemetryRing()
+        self.camera_paused = False
+        self.camera_idle = threading.Event() # Cleared while a gphoto2 command of the monitor runs
+        self.camera_idle.set()
+        self.stopping = False
+        self.loop = None
+        self.wake_camera = None
+        self.wake_disk = None
+        self.started = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='menu-status', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        self.started.wait()
+
+    def stop(self):
+        self.stopping = True
+        self.refresh()
+        self.thread.join(timeout=COMMAND_TIMEOUT)
+
+    def run(self):
+        asyncio.run(self.main())
+
+    async def main(self):
+        self.loop = asyncio.get_running_loop()
+        self.wake_camera = asyncio.Event()
+        self.wake_disk = asyncio.Event()
+        self.started.set()
+        await asyncio.gather(self.watch_camera(), self.watch_disks())
+
+    async def sleep(self, seconds, wake):
+        """
+        Waits until the next refresh, or until `refresh` is called.
+        """
+        try:
+            await asyncio.wait_for(wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        wake.clear()
+
+    def update(self, **values):
+        with self.changed:
+            self.state.update(values)
+            self.changed.notify_all()
+
+    async def watch_camera(self):
+        details_due = 0
+        while not self.stopping:
+            with self.lock:
+                paused = self.camera_paused
+                if not paused:
+                    self.camera_idle.clear()
+            if not paused:
+                try:
+                    output = await run_gphoto2('--auto-detect')
+                    model = parse_camera_model(output) if output else None
+                    if model is None:
+                        self.update(connected=False, model=None, battery=None, camera_free_space=None, card_shots=None)
+                        details_due = 0
+                    else:
+                        self.update(connected=True, model=model)
+                        if time.monotonic() >= details_due:
+                            battery = await run_gphoto2('--get-config', 'batterylevel')
+                            storage = await run_gphoto2('--storage-info')
+                            card_bytes = parse_camera_free_bytes(storage) if storage else None
+                            battery = parse_config_value(battery) if battery else None
+                            if battery is not None or card_bytes is not None:
+                                self.telemetry.add(battery=parse_battery(battery), card_free=card_bytes)
+                            self.update(battery=battery,
+                                        camera_free_space=parse_camera_free_space(storage) if storage else None,
+                                        card_shots=project(card_bytes, self.bytes_per_shot)['shots'] if card_bytes is not None else None)
+                            details_due = time.monotonic() + self.details_interval
+                finally:
+                    self.camera_idle.set()
+            await self.sleep(CAMERA_INTERVAL, self.wake_camera)
+
+    async def watch_disks(self):
+        while not self.stopping:
+            with self.lock:
+                directories = list(self.directories)
+            free_space = {}
+            if directories:
+                self.bytes_per_shot = await self.loop.run_in_executor(None, shot_size, directories[0]) or self.bytes_per_shot
+            for directory in directories:
+                try:
+                    free = await self.loop.run_in_executor(None, free_bytes, directory)
+                except OSError:
+                    free_space[directory] = "\033[91mnot available\033[0m"
+                    continue
+                tracker = self.trackers.setdefault(directory, ThroughputTracker())
+                tracker.add(free)
+                free_space[directory] = format_projection(free, project(free, self.bytes_per_shot, tracker.rate()), tracker.rate())
+            self.update(free_space=free_space)
+            await self.sleep(DISK_INTERVAL, self.wake_disk)
+
+    def refresh(self):
+        """
+        Refreshes the camera and folder status now instead of at the next interval.
+        """
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.wake_camera.set)
+            self.loop.call_soon_threadsafe(self.wake_disk.set)
+
+    def watch_directories(self, directories):
+        """
+        Sets the folders whose free space is shown, the save folder and the backup folders.
+        """
+        directories = [directory for directory in directories if directory]
+        with self.lock:
+            changed = directories != self.directories
+            self.directories = directories
+        if changed:
+            self.loop.call_soon_threadsafe(self.wake_disk.set)
+
+    def snapshot(self):
+        """
+        Returns a copy of the last known state, see the class description.
+        """
+        with self.lock:
+            return dict(self.state, free_space=dict(self.state['free_space']))
+
+    def free_space(self, directory):
+        """
+        Returns the last known free space of a folder, or a placeholder until it is read.
+        """
+        with self.lock:
+            return self.state['free_space'].get(directory, "checking free space...")
+
+    def pause_camera(self):
+        """
+        Stops polling the camera and waits until a running gphoto2 command of the monitor finished.
+        Call this before another process uses the camera.
+        """
+        with self.lock:
+            self.camera_paused = True
+        self.camera_idle.wait(COMMAND_TIMEOUT)
+
+    def resume_camera(self):
+        with self.lock:
+            self.camera_paused = False
+        self.refresh()
+
+    def wait_for_detection(self, timeout=COMMAND_TIMEOUT):
+        """
+        Waits until the camera was detected at least once.
+        """
+        with self.changed:
+            self.changed.wait_for(lambda: self.state['connected'] is not None, timeout)
+
+    def wait_for_camera(self, timeout):
+        """
+        Waits until a camera is connected.
+
+        Returns:
+            bool: True if a camera is connected, False after the timeout.
+        """
+        self.refresh()
+        with self.changed:
+            return self.changed.wait_for(lambda: self.state['connected'], timeout)
@@ -1,24 +1,27 @@
 # Description: This script will show the latest picture taken in a window.
+import os
 import sys
+import subprocess
 from camera_utils import show_latest_picture
-import json
+from session_store import SessionStore
 
 """
 this function is called by the main program to show the latest picture taken.
 It will show the latest picture taken in a window.
-it will return the selected pictures and dump them to a JSON file.
+the selected pictures are read from and written to the session store of the save directory,
+every pick and unpick is saved immediately, so nothing is lost if the viewer crashes.
+the frame analyzer runs alongside the viewer and scores every picture for culling.
 """
-print("Showing the latest picture taken...")
-save_directory = sys.argv[1] # Get the save directory from the command line arguments
-selected_pictures = sys.argv[2]
-if isinstance(selected_pictures, str) or selected_pictures is None:
-    selected_pictures = json.loads(selected_pictures)
-    
-selected_pictures = show_latest_picture(save_directory, selected_pictures) # Show the latest picture taken in a window
+if __name__ == '__main__':
+    print("Showing the latest picture taken...")
+    save_directory = sys.argv[1] # Get the save directory from the command line arguments
+    session_store = SessionStore(save_directory)
+    analyzer = subprocess.Popen(['python3', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'frame_analyzer.py'), save_directory])
 
-if selected_pictures == 0:
-    selected_pictures = None
+    try:
+        show_latest_picture(save_directory, session_store) # Show the latest picture taken in a window
+    finally:
+        analyzer.terminate()
+        analyzer.wait()
 
-# Save the file names to a JSON file
-with open(save_directory + '/selected_pictures.json', 'w') as f:
-    json.dump(selected_pictures, f)
\ No newline at end of file
+    session_store.compact() # Fold the journal into selected_pictures.json
@@ -0,0 +1,217 @@
+"""
+This module records how long every stage of the picture pipeline takes, so a slow shoot can be traced to its cause.
+
+The stages:
+- download: Reading a picture from the camera over USB (card download).
+- write: Writing a downloaded picture to the save folder (card download).
+- catalog: Adding a tethered picture to the session catalog (hook script).
+- detect: The time from the last write of a new picture until the viewer found it.
+- decode: Decoding a picture and shrinking it to the display size in the viewer.
+- display: Handing the frame to the viewer window (imshow).
+- transfer_read: Reading a file once for a transfer.
+- transfer_write: Writing a file to one destination of a transfer, including the sync to disk.
+
+Every process appends its spans to '.pipeline_trace.jsonl' in the save folder, one JSON object per line:
+
+    {"stage": "decode", "start": 1718000000.123, "ms": 41.7, "process": "viewer", "file": "DSC_0001.NEF"}
+
+The lines are buffered and appended with a single write per flush, so the lines of several processes never mix.
+`stage_statistics` summarizes a trace with the count, p50, p95, p99 and maximum of every stage, and
+`write_stats_snapshot` stores the summary in the Prometheus text format in '.pipeline_stats.prom'.
+
+Libraries used:
+- os: Provides the appending writes and the rotation of the trace.
+- json: Provides the trace lines.
+- math: Provides the rounding of the percentile ranks.
+- time: Provides the clocks of the spans.
+- atexit: Flushes the buffered spans when a process exits.
+- threading: Provides the lock of the buffer, the transfer threads share one tracer.
+- contextlib: Provides the span context manager.
+"""
+import os
+import json
+import math
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+TRACE_FILE = '.pipeline_trace.jsonl'
+STATS_FILE = '.pipeline_stats.prom'
+TRACE_MAX_BYTES = 20 * 1024 * 1024 # The trace is rotated to '.pipeline_trace.jsonl.1' at this size
+FLUSH_INTERVAL = 1.0 # Seconds the spans may wait in the buffer
+FLUSH_RECORDS = 64
+STAGES = ('download', 'write', 'catalog', 'detect', 'decode', 'display', 'transfer_read', 'transfer_write')
+
+class Tracer:
+    """
+    Records the spans of one process into the trace of a save folder.
+
+    Attributes:
+        trace_path (str): The path of the trace file.
+        process (str): The name of the process in the trace, for example 'viewer'.
+    """
+
+    def __init__(self, save_directory, process):
+        self.trace_path = os.path.join(save_directory, TRACE_FILE)
+        self.process = process
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        atexit.register(self.close)
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        """
+        Measures the code in the with block as one span of a stage.
+
+        Args:
+            stage (str): The stage, see STAGES.
+            **attributes: Extra values for the trace line, for example the file name.
+        """
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - started) * 1000, start, **attributes)
+
+    def record(self, stage, milliseconds, start=None, **attributes):
+        """
+        Records a span that was measured by the caller.
+
+        Args:
+            stage (str): The stage, see STAGES.
+            milliseconds (float): The duration of the span.
+            start (float or None): The start of the span as Unix time, or None for now minus the duration.
+            **attributes: Extra values for the trace line.
+        """
+        entry = {'stage': stage, 'start': round(start if start is not None else time.time() - milliseconds / 1000, 3), 'ms': round(milliseconds, 3), 'process': self.process}
+        entry.update(attributes)
+        with self.lock:
+            self.buffer.append(json.dumps(entry))
+            due = len(self.buffer) >= FLUSH_RECORDS or time.monotonic() - self.last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Appends the buffered spans to the trace file.
+        """
+        with self.lock:
+            lines, self.buffer = self.buffer, []
+            self.last_flush = time.monotonic()
+        if not lines:
+            return
+        try:
+            if os.path.exists(self.trace_path) and os.path.getsize(self.trace_path) > TRACE_MAX_BYTES:
+                os.replace(self.trace_path, self.trace_path + '.1')
+            fd = os.open(self.trace_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, ('\n'.join(lines) + '\n').encode('utf-8'))
+            finally:
+                os.close(fd)
+        except OSError:
+            pass # Tracing must never stop the pipeline, for example when the save folder is full
+
+    def close(self):
+        self.flush()
+
+def read_trace(save_directory, since=None):
+    """
+    Reads the spans of the trace of a save folder, the rotated part first.
+
+    Args:
+        save_directory (str): The save folder.
+        since (float or None): Only the spans that started after this Unix time, or None for all.
+
+    Returns:
+        list: The spans as dictionaries.
+    """
+    trace_path = os.path.join(save_directory, TRACE_FILE)
+    spans = []
+    for path in (trace_path + '.1', trace_path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        span = json.loads(line)
+                    except ValueError:
+                        continue # A line that is being written right now
+                    if since is None or span['start'] >= since:
+                        spans.append(span)
+        except OSError:
+            pass
+    return spans
+
+def percentile(sorted_values, fraction):
+    """
+    Returns the nearest-rank percentile of sorted values, for example fraction 0.95 for p95.
+    """
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+def stage_statistics(spans):
+    """
+    Summarizes spans per stage.
+
+    Returns:
+        dict: stage -> dict with 'count', 'sum', 'p50', 'p95', 'p99' and 'max' in milliseconds,
+              the stages of STAGES first and in pipeline order.
+    """
+    durations = {}
+    for span in spans:
+        durations.setdefault(span['stage'], []).append(span['ms'])
+    statistics = {}
+    for stage in sorted(durations, key=lambda stage: (STAGES.index(stage) if stage in STAGES else len(STAGES), stage)):
+        values = sorted(durations[stage])
+        statistics[stage] = {
+            'count': len(values),
+            'sum': sum(values),
+            'p50': percentile(values, 0.50),
+            'p95': percentile(values, 0.95),
+            'p99': percentile(values, 0.99),
+            'max': values[-1],
+        }
+    return statistics
+
+def format_stage_statistics(statistics):
+    """
+    Returns the summary of `stage_statistics` as printable lines.
+    """
+    if not statistics:
+        return ["No timings recorded in this save folder yet."]
+    lines = [f"{'Stage':<16}{'Count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for stage, values in statistics.items():
+        lines.append(f"{stage:<16}{values['count']:>8}{values['p50']:>10.1f}{values['p95']:>10.1f}{values['p99']:>10.1f}{values['max']:>10.1f}")
+    return lines
+
+def prometheus_text(statistics):
+    """
+    Returns the summary of `stage_statistics` in the Prometheus text exposition format.
+    """
+    lines = [
+        "# HELP tether_stage_milliseconds Time spent in every stage of the picture pipeline.",
+        "# TYPE tether_stage_milliseconds summary",
+    ]
+    for stage, values in statistics.items():
+        for quantile in ('0.5', '0.95', '0.99'):
+            key = 'p' + str(round(float(quantile) * 100))
+            lines.append(f'tether_stage_milliseconds{{stage="{stage}",quantile="{quantile}"}} {values[key]:.3f}')
+        lines.append(f'tether_stage_milliseconds_sum{{stage="{stage}"}} {values["sum"]:.3f}')
+        lines.append(f'tether_stage_milliseconds_count{{stage="{stage}"}} {values["count"]}')
+    return '\n'.join(lines) + '\n'
+
+def write_stats_snapshot(save_directory, statistics):
+    """
+    Writes the summary to '.pipeline_stats.prom' in the save folder, for example for the textfile collector
+    of the Prometheus node exporter.
+
+    Returns:
+        str: The path of the snapshot.
+    """
+    path = os.path.join(save_directory, STATS_FILE)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text(statistics))
+    os.replace(temp_path, path)
+    return path
@@ -0,0 +1,200 @@
+"""
+This module exports pictures as resized JPEG files, for example proofs for a client after culling.
+
+Every picture is rendered in a process pool, one picture per worker, in four stages:
+- decode: A JPEG is decoded at a reduced size by the JPEG decoder itself when it is much larger than the target.
+  A RAW file uses its embedded JPEG preview when that is at least as large as the target, otherwise it is
+  developed with `rawpy.postprocess` (at half size when that is still large enough).
+- resize: The picture is shrunk to the target long edge, it is never enlarged.
+- encode: The picture is encoded as JPEG with the chosen quality.
+- write: The file is written to a temporary name and renamed, so an interrupted export leaves no broken files.
+
+The time of every stage is measured in the workers and reported together with the number of pictures per second.
+
+Libraries used:
+- os: Provides a way to interact with the operating system, such as file operations.
+- time: Provides the timers for the stage timings.
+- concurrent.futures: Provides the results of the workers in the order they finish.
+- cv2: Provides the JPEG decoding, resizing and encoding.
+- numpy: Provides the buffer for the embedded preview.
+- rawpy: Develops RAW files without a large enough preview.
+- image_analysis: Provides the reduced JPEG decoding and the rotation of embedded previews.
+- session_catalog: Provides the RAW+JPEG pairs and the position of the embedded previews.
+- worker_pool: Provides the process pool.
+"""
+import os
+import time
+from concurrent.futures import as_completed
+from lazy_imports import lazy_module
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+rawpy = lazy_module('rawpy')
+from image_analysis import apply_orientation, reduced_decode_flag
+from session_catalog import SessionCatalog, PREVIEW_EXTENSIONS
+from worker_pool import create_worker_pool
+
+PROOF_DIRECTORY = 'proofs'
+DEFAULT_LONG_EDGE = 2048
+DEFAULT_QUALITY = 85
+STAGES = ('decode', 'resize', 'encode', 'write')
+
+def limit_worker_threads():
+    """
+    Lets every worker process use one OpenCV thread, the pool already uses all cores.
+    """
+    cv2.setNumThreads(1)
+
+def decode_picture(source_path, entry, long_edge, use_preview):
+    """
+    Decodes a picture for the export, see the module description.
+
+    Returns:
+        tuple: The image and the decode method ('jpeg', 'preview', 'raw' or 'image').
+    """
+    entry = entry or {}
+    if source_path.lower().endswith(('.jpg', '.jpeg')):
+        size = max(entry.get('width') or 0, entry.get('height') or 0)
+        return cv2.imread(source_path, reduced_decode_flag(size, long_edge, color=True)), 'jpeg'
+    if source_path.lower().endswith(('.nef', '.cr2', '.arw')) or entry.get('preview_offset') is not None:
+        if use_preview and entry.get('preview_offset') is not None and entry.get('preview_length'):
+            with open(source_path, 'rb') as f:
+                f.seek(entry['preview_offset'])
+                data = np.frombuffer(f.read(entry['preview_length']), dtype=np.uint8)
+            frame = cv2.imdecode(data, cv2.IMREAD_COLOR)
+            if frame is not None and max(frame.shape[:2]) >= long_edge:
+                # The embedded preview is stored unrotated, use the orientation from the catalog
+                return apply_orientation(frame, entry.get('orientation')), 'preview'
+        with rawpy.imread(source_path) as raw:
+            half_size = max(raw.sizes.width, raw.sizes.height) // 2 >= long_edge
+            rgb = raw.postprocess(use_camera_wb=True, half_size=half_size, output_bps=8)
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), 'raw'
+    return cv2.imread(source_path, cv2.IMREAD_COLOR), 'image'
+
+def render_proof(source_path, destination_path, entry, long_edge, quality, use_preview):
+    """
+    Renders one picture as a resized JPEG file. This runs in a worker process.
+
+    Args:
+        source_path (str): The path to the picture.
+        destination_path (str): The path to the JPEG file.
+        entry (dict): The catalog entry of the picture, or None.
+        long_edge (int): The long edge of the JPEG file in pixels.
+        quality (int): The JPEG quality from 1 to 100.
+        use_preview (bool): If True, the embedded preview of a RAW file is used when it is large enough.
+
+    Returns:
+        dict: 'source', 'method', 'size' and the 'timings' of the stages in seconds, or 'source' and 'error'.
+    """
+    timings = {}
+    try:
+        start = time.perf_counter()
+        frame, method = decode_picture(source_path, entry, long_edge, use_preview)
+        if frame is None:
+            return {'source': source_path, 'error': "The picture can not be decoded."}
+        timings['decode'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scale = long_edge / max(frame.shape[:2])
+        if scale < 1:
+            frame = cv2.resize(frame, (round(frame.shape[1] * scale), round(frame.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        timings['resize'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        encoded, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not encoded:
+            return {'source': source_path, 'error': "The picture can not be encoded."}
+        timings['encode'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        temp_path = os.path.join(os.path.dirname(destination_path), '.' + os.path.basename(destination_path) + '.part')
+        with open(temp_path, 'wb') as f:
+            f.write(data.tobytes())
+        os.replace(temp_path, destination_path)
+        timings['write'] = time.perf_counter() - start
+    except (OSError, cv2.error, rawpy.LibRawError) as e:
+        return {'source': source_path, 'error': str(e)}
+    return {'source': source_path, 'method': method, 'size': len(data), 'timings': timings}
+
+def plan_proofs(session_directory, output_directory, photo_file_list, use_preview=True):
+    """
+    Chooses one source file for every shot and the name of its JPEG file.
+
+    The files of a RAW+JPEG pair are one shot and give one JPEG file. With `use_preview` the camera JPEG of
+    the pair is used, otherwise the RAW file is developed.
+
+    Returns:
+        list: (source path, destination path, catalog entry) for every shot.
+    """
+    catalog = SessionCatalog(session_directory)
+    catalog.refresh()
+    listed = set(photo_file_list)
+    shots = [[name for name in files if name in listed] for files in catalog.shots(descending=False)]
+    grouped = {name for files in shots for name in files}
+    shots = [files for files in shots if files] + [[name] for name in photo_file_list if name not in grouped]
+    plan = []
+    used_names = set()
+    for files in shots:
+        source = files[0]
+        if not use_preview:
+            source = next((name for name in files if not name.lower().endswith(PREVIEW_EXTENSIONS)), files[0])
+        base_name = os.path.splitext(os.path.basename(source))[0]
+        name = base_name + '.jpg'
+        n = 1
+        while name.lower() in used_names: # Two shots with the same file name, for example from two cameras
+            n += 1
+            name = f"{base_name}_{n}.jpg"
+        used_names.add(name.lower())
+        plan.append((os.path.join(session_directory, source), os.path.join(output_directory, name), catalog.get(source)))
+    catalog.close()
+    return plan
+
+def export_proofs(session_directory, output_directory, photo_file_list, long_edge=DEFAULT_LONG_EDGE, quality=DEFAULT_QUALITY, use_preview=True, workers=None, progress=None):
+    """
+    Exports pictures as resized JPEG files in a process pool.
+
+    Args:
+        session_directory (str): The directory where the pictures are saved.
+        output_directory (str): The directory for the JPEG files, it is created if it does not exist.
+        photo_file_list (list): The file names of the pictures, the files of a RAW+JPEG pair give one JPEG file.
+        long_edge (int): The long edge of the JPEG files in pixels.
+        quality (int): The JPEG quality from 1 to 100.
+        use_preview (bool): If True, camera JPEGs and large enough embedded previews are used instead of developing RAW files.
+        workers (int): The number of worker processes, or None for the number of CPUs.
+        progress (callable): Called with (done, total) after every picture.
+
+    Returns:
+        dict: The report with 'files' (the written JPEG files), 'errors' ((source, message) for every failed picture),
+              'methods' (the number of pictures per decode method), 'stages' (the total time per stage in seconds),
+              'bytes', 'elapsed' (the wall time in seconds) and 'images_per_second'.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    start = time.perf_counter()
+    plan = plan_proofs(session_directory, output_directory, photo_file_list, use_preview)
+    report = {'files': [], 'errors': [], 'methods': {}, 'stages': dict.fromkeys(STAGES, 0.0), 'bytes': 0}
+    with create_worker_pool(workers, limit_worker_threads) as pool:
+        futures = {pool.submit(render_proof, source, destination, entry, long_edge, quality, use_preview): destination for source, destination, entry in plan}
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            if 'error' in result:
+                report['errors'].append((result['source'], result['error']))
+            else:
+                report['files'].append(futures[future])
+                report['methods'][result['method']] = report['methods'].get(result['method'], 0) + 1
+                report['bytes'] += result['size']
+                for stage, seconds in result['timings'].items():
+                    report['stages'][stage] += seconds
+            if progress:
+                progress(done, len(plan))
+    report['elapsed'] = time.perf_counter() - start
+    report['images_per_second'] = len(report['files']) / max(report['elapsed'], 0.001)
+    return report
+
+def format_export_report(report):
+    """
+    Returns the report of `export_proofs` as printable lines.
+    """
+    count = max(len(report['files']), 1)
+    lines = [f"Exported {len(report['files'])} JPEG files, {report['bytes'] / (1024 * 1024):.1f} MiB in {report['elapsed']:.1f} s ({report['images_per_second']:.1f} images/s)."]
+    lines.append("Decoded from: " + ", ".join(f"{method} {number}" for method, number in sorted(report['methods'].items())))
+    lines.append("Stage time per picture (in the workers): " + ", ".join(f"{stage} {report['stages'][stage] / count * 1000:.0f} ms" for stage in STAGES))
+    return lines
@@ -0,0 +1,190 @@
+"""
+This module provides the 100% zoom of the picture viewer, which shows a part of a picture at native resolution.
+
+The picture is split into square tiles and only the tiles under the zoom window are rendered:
+- RAW files with a Bayer sensor: the sensor data is unpacked once and every tile is demosaiced on its own with
+  OpenCV, after the black level, white level and camera white balance are applied to the tile. This takes a few
+  milliseconds per tile instead of developing the whole sensor with `raw.postprocess`.
+- Other RAW files (for example X-Trans sensors): the picture is developed once and the tiles are cut from it.
+- JPEG and other image files: the picture is decoded once at full size and the tiles are cut from it.
+
+The tiles are kept in a least recently used cache, so panning back and forth is a copy of cached tiles.
+The tiles are in sensor orientation, the zoom window is rotated for display as a whole.
+
+Libraries used:
+- functools: Provides the cache of the gamma table.
+- collections: Provides the ordered dictionary for the least recently used cache.
+- cv2: Provides the demosaicing and the image decoding.
+- numpy: Provides the array operations.
+- rawpy: Provides the sensor data of RAW files.
+"""
+import functools
+from collections import OrderedDict
+from lazy_imports import lazy_module
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+rawpy = lazy_module('rawpy')
+
+TILE_SIZE = 512
+ZOOM_VIEW_SIZE = (1600, 1000) # The size of the zoom window in display orientation (width, height)
+TILE_MARGIN = 2 # Extra sensor pixels around a tile, so the demosaicing has neighbours at the tile edges
+
+# The OpenCV conversion for every Bayer pattern (OpenCV names the patterns after the second row).
+# The names are looked up when a RAW file is opened, so OpenCV is not imported with this module.
+BAYER_CONVERSIONS = {
+    'RGGB': 'COLOR_BayerBG2BGR',
+    'BGGR': 'COLOR_BayerRG2BGR',
+    'GRBG': 'COLOR_BayerGB2BGR',
+    'GBRG': 'COLOR_BayerGR2BGR',
+}
+
+@functools.lru_cache(maxsize=1)
+def gamma_table():
+    """
+    Returns the sRGB-like display gamma for 16 bit linear values as a lookup table.
+    """
+    return (np.power(np.linspace(0, 1, 65536), 1 / 2.2) * 255 + 0.5).astype(np.uint8)
+
+class TileSource:
+    """
+    Renders tiles of one picture at native resolution.
+
+    Attributes:
+        path (str): The path to the picture.
+        width (int): The width of the picture in sensor orientation.
+        height (int): The height of the picture in sensor orientation.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.raw = None
+        self.image = None
+        self.bayer_conversion = None
+        if path.lower().endswith(('.nef', '.cr2', '.arw')):
+            self.raw = rawpy.imread(path)
+            pattern = ''.join(chr(self.raw.color_desc[color]) for color in self.raw.raw_pattern.flatten()) if self.raw.raw_pattern is not None and self.raw.raw_pattern.shape == (2, 2) else ''
+            self.bayer_conversion = getattr(cv2, BAYER_CONVERSIONS[pattern]) if pattern in BAYER_CONVERSIONS else None
+            if self.bayer_conversion is None:
+                # Not a Bayer sensor, develop the picture once without rotation
+                rgb = self.raw.postprocess(use_camera_wb=True, user_flip=0, output_bps=8)
+                self.image = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+                self.raw.close()
+                self.raw = None
+            else:
+                self.mosaic = self.raw.raw_image_visible # Unpacks the sensor data
+                self.colors = self.raw.raw_colors_visible
+                self.black_levels = np.array(self.raw.black_level_per_channel, dtype=np.float32)
+                self.white_level = float(self.raw.white_level)
+                white_balance = np.array(self.raw.camera_whitebalance, dtype=np.float32)
+                if white_balance[3] == 0:
+                    white_balance[3] = white_balance[1]
+                self.white_balance = white_balance / white_balance[1] if white_balance[1] else np.ones(4, dtype=np.float32)
+                self.height, self.width = self.mosaic.shape
+        else:
+            self.image = cv2.imread(path, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+            if self.image is None:
+                raise OSError(f"Can not decode {path}")
+        if self.image is not None:
+            self.height, self.width = self.image.shape[:2]
+
+    def tile(self, tile_x, tile_y):
+        """
+        Renders one tile.
+
+        Args:
+            tile_x (int): The column of the tile.
+            tile_y (int): The row of the tile.
+
+        Returns:
+            numpy.ndarray: The tile as BGR image, smaller than TILE_SIZE at the right and bottom edges.
+        """
+        left, top = tile_x * TILE_SIZE, tile_y * TILE_SIZE
+        right, bottom = min(left + TILE_SIZE, self.width), min(top + TILE_SIZE, self.height)
+        if self.image is not None:
+            return self.image[top:bottom, left:right].copy()
+        # Crop the mosaic with a margin, aligned to the 2x2 pattern so the pattern of the crop is the pattern of the sensor
+        crop_left, crop_top = max(left - TILE_MARGIN, 0) & ~1, max(top - TILE_MARGIN, 0) & ~1
+        crop_right, crop_bottom = min(right + TILE_MARGIN, self.width), min(bottom + TILE_MARGIN, self.height)
+        mosaic = self.mosaic[crop_top:crop_bottom, crop_left:crop_right].astype(np.float32)
+        colors = self.colors[crop_top:crop_bottom, crop_left:crop_right]
+        black = self.black_levels[colors]
+        mosaic = (mosaic - black) / np.maximum(self.white_level - black, 1) * self.white_balance[colors]
+        mosaic = (np.clip(mosaic, 0, 1) * 65535).astype(np.uint16)
+        bgr = cv2.cvtColor(mosaic, self.bayer_conversion)
+        bgr = gamma_table()[bgr]
+        return bgr[top - crop_top:bottom - crop_top, left - crop_left:right - crop_left]
+
+    def close(self):
+        if self.raw is not None:
+            self.raw.close()
+            self.raw = None
+
+class TileCache:
+    """
+    Keeps the most recently used tiles of any picture.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.tiles = OrderedDict()
+
+    def get(self, source, tile_x, tile_y):
+        """
+        Returns a tile from the cache, or renders it with the source.
+        """
+        key = (source.path, tile_x, tile_y)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = source.tile(tile_x, tile_y)
+            self.tiles[key] = tile
+            while len(self.tiles) > self.capacity:
+                self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(key)
+        return tile
+
+def view_size(orientation):
+    """
+    Returns the size of the zoom window in sensor orientation (width, height).
+    """
+    width, height = ZOOM_VIEW_SIZE
+    return (height, width) if orientation in (6, 8) else (width, height)
+
+def pan_offset(orientation, display_dx, display_dy):
+    """
+    Converts a pan step in display orientation to a step in sensor orientation.
+    """
+    if orientation == 3:
+        return -display_dx, -display_dy
+    elif orientation == 6:
+        return display_dy, -display_dx
+    elif orientation == 8:
+        return -display_dy, display_dx
+    return display_dx, display_dy
+
+def render_view(source, cache, center_x, center_y, width, height):
+    """
+    Renders the zoom window from the tiles under it.
+
+    Args:
+        source (TileSource): The picture.
+        cache (TileCache): The tile cache.
+        center_x, center_y (int): The center of the window in sensor pixels.
+        width, height (int): The size of the window in sensor pixels.
+
+    Returns:
+        tuple: The window as BGR image, and the center clamped to the picture.
+    """
+    width, height = min(width, source.width), min(height, source.height)
+    left = min(max(center_x - width // 2, 0), source.width - width)
+    top = min(max(center_y - height // 2, 0), source.height - height)
+    view = np.zeros((height, width, 3), dtype=np.uint8)
+    for tile_y in range(top // TILE_SIZE, (top + height - 1) // TILE_SIZE + 1):
+        for tile_x in range(left // TILE_SIZE, (left + width - 1) // TILE_SIZE + 1):
+            tile = cache.get(source, tile_x, tile_y)
+            tile_left, tile_top = tile_x * TILE_SIZE, tile_y * TILE_SIZE
+            # The part of the tile inside the window
+            x0, y0 = max(left, tile_left), max(top, tile_top)
+            x1, y1 = min(left + width, tile_left + tile.shape[1]), min(top + height, tile_top + tile.shape[0])
+            view[y0 - top:y1 - top, x0 - left:x1 - left] = tile[y0 - tile_top:y1 - tile_top, x0 - tile_left:x1 - tile_left]
+    return view, (left + width // 2, top + height // 2)
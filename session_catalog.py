@@ -0,0 +1,594 @@
+"""
+This module provides the session catalog, an SQLite database of every captured file in the save directory.
+
+The catalog is shared by the picture viewer, the transfers and the main program. It is filled incrementally:
+the tether hook script adds every file as soon as gphoto2 has downloaded it, and `refresh` only scans the folders
+of the session that changed behind the catalog's back. Opening, filtering and transferring a large
+session is therefore a database query instead of a directory scan with a stat call per file.
+
+The pictures can be sharded into subfolders of the save directory (see session_layout), the file names in the
+catalog are then paths relative to the save directory ('frames-00001/DSC_0001.NEF').
+
+The database is kept in WAL mode, so the viewer can read while the tether hook writes.
+
+The metadata of every file is read once from its EXIF header and cached in the catalog until the size or
+mtime of the file changes. When many files are new, for example when an existing session is opened for the
+first time, the headers are read in a process pool.
+
+Libraries used:
+- os: Provides a way to interact with the operating system, such as file operations.
+- re: Provides a way to find the frame counter in a file name.
+- time: Provides a way to convert the capture time to a timestamp.
+- sqlite3: Provides the SQLite database.
+- exif_utils: Reads the metadata of the captured files from their header.
+- worker_pool: Provides the process pool for reading many headers at once.
+- transfer_utils: Provides the list of picture file extensions.
+- session_layout: Provides the folder layouts and the incremental scan of the session folders.
+- capture_durability: Provides the flush policies of the tethered pictures.
+"""
+import os
+import re
+import time
+import sqlite3
+from exif_utils import read_metadata
+from worker_pool import create_worker_pool
+from transfer_utils import PHOTO_EXTENSIONS
+from session_layout import LAYOUTS, SHARD_FRAMES, shard_folder, scan_directories
+from capture_durability import POLICIES, DEFAULT_POLICY, BATCH_FILES, BATCH_MS
+
+CATALOG_FILE = '.session_catalog.db'
+METADATA_POOL_THRESHOLD = 64 # Fewer new files are read in this process, starting a pool would take longer
+
+# The capture order: capture time with sub-seconds, then the frame counter for bursts within the same sub-second.
+# Files without EXIF capture time are sorted by their mtime.
+CAPTURE_ORDER = "COALESCE(capture_time + COALESCE(sub_seconds, 0), mtime) {0}, sequence {0}, name {0}"
+
+# The files of one shot (RAW+JPEG) share the base name and were captured at the same time.
+# The camera writes the capture time of the shot into both files, the tolerance covers the rounding of cameras
+# that write the JPEG a moment later, while a reused file name (a new card, a wrapped frame counter) is far apart.
+PAIR_TIME_TOLERANCE = 2 # seconds
+PREVIEW_EXTENSIONS = ('.jpg', '.jpeg', '.png') # Shown instead of the RAW file of the same shot
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    capture_time REAL,
+    sub_seconds REAL,
+    sequence INTEGER,
+    orientation INTEGER,
+    camera_model TEXT,
+    camera_serial TEXT,
+    width INTEGER,
+    height INTEGER,
+    preview_offset INTEGER,
+    preview_length INTEGER,
+    added REAL,
+    sharpness REAL,
+    highlight_clip REAL,
+    shadow_clip REAL,
+    luminance REAL,
+    dhash INTEGER,
+    scored REAL
+);
+CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime);
+CREATE INDEX IF NOT EXISTS files_capture_time ON files (capture_time);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value
+);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime INTEGER
+);
+"""
+
+def parse_exif_time(value):
+    """
+    Converts an EXIF date and time ('YYYY:MM:DD HH:MM:SS') to a timestamp.
+
+    Returns:
+        float or None: The timestamp, or None if the value can not be parsed.
+    """
+    try:
+        return time.mktime(time.strptime(value, '%Y:%m:%d %H:%M:%S'))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+def parse_sub_seconds(value):
+    """
+    Converts the EXIF sub-seconds digits ('45' means 0.45 seconds) to a fraction of a second.
+    """
+    if isinstance(value, str) and value.isdigit():
+        return float('0.' + value)
+    return None
+
+def parse_sequence(name, metadata):
+    """
+    Returns the frame counter of a file: the EXIF image number, or the last number in the file name (DSC_1234.NEF).
+    """
+    if isinstance(metadata.get('image_number'), int):
+        return metadata['image_number']
+    match = re.search(r'(\d+)\D*$', os.path.splitext(os.path.basename(name))[0])
+    return int(match.group(1)) if match else None
+
+def read_metadata_batch(paths, workers=None):
+    """
+    Reads the metadata of many files, in a process pool if there are many of them.
+
+    Args:
+        paths (list): The paths to the files.
+        workers (int): The number of worker processes, or None for the number of CPUs.
+
+    Returns:
+        list: The metadata of every file, see `exif_utils.read_metadata`.
+    """
+    if len(paths) < METADATA_POOL_THRESHOLD:
+        return [read_metadata(path) for path in paths]
+    with create_worker_pool(workers) as pool:
+        return list(pool.map(read_metadata, paths, chunksize=32))
+
+def describe_file(path, stat=None, metadata=None):
+    """
+    Returns the catalog columns of a captured file.
+
+    Args:
+        path (str): The path to the file.
+        stat (os.stat_result): The stat of the file, or None to read it.
+        metadata (dict): The metadata of the file, or None to read it.
+
+    Returns:
+        dict: The size, mtime, capture time and order, orientation, camera model and serial number,
+              dimensions and preview position of the file.
+    """
+    if stat is None:
+        stat = os.stat(path)
+    if metadata is None:
+        metadata = read_metadata(path)
+    model = metadata.get('model')
+    if model and metadata.get('make') and not model.lower().startswith(metadata['make'].split()[0].lower()):
+        model = f"{metadata['make']} {model}"
+    return {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'capture_time': parse_exif_time(metadata.get('date_time_original')),
+        'sub_seconds': parse_sub_seconds(metadata.get('sub_sec_time_original')),
+        'sequence': parse_sequence(path, metadata),
+        'orientation': metadata.get('orientation'),
+        'camera_model': model,
+        'camera_serial': metadata.get('serial'),
+        'width': metadata.get('width'),
+        'height': metadata.get('height'),
+        'preview_offset': metadata.get('preview_offset'),
+        'preview_length': metadata.get('preview_length'),
+    }
+
+def order_clause(order, descending):
+    """
+    Returns the ORDER BY clause of a picture order: 'capture' (see CAPTURE_ORDER), 'mtime' or 'name'.
+    """
+    direction = 'DESC' if descending else 'ASC'
+    if order == 'capture':
+        return CAPTURE_ORDER.format(direction)
+    elif order in ('mtime', 'name'):
+        return f"{order} {direction}, name {direction}"
+    raise ValueError(f"Unsupported order: {order}")
+
+def group_shots(rows):
+    """
+    Groups files into shots: the files of a RAW+JPEG pair become one shot.
+
+    Files belong to the same shot if their names are equal without the extension (ignoring case) and their
+    capture times are at most PAIR_TIME_TOLERANCE apart, or one of them has no capture time.
+
+    Args:
+        rows (iterable): (name, capture_time) for every file, in the order of the shots.
+
+    Returns:
+        list: One list of file names for every shot, in the order of the first file of each shot.
+              The file that is shown for the shot (the JPEG of a pair) comes first.
+    """
+    shots = []
+    candidates = {} # base name -> [(capture_time, files)]
+    for name, capture_time in rows:
+        base_name = os.path.splitext(name)[0].lower()
+        for shot_time, files in candidates.get(base_name, ()):
+            if shot_time is None or capture_time is None or abs(shot_time - capture_time) <= PAIR_TIME_TOLERANCE:
+                files.append(name)
+                break
+        else:
+            files = [name]
+            candidates.setdefault(base_name, []).append((capture_time, files))
+            shots.append(files)
+    for files in shots:
+        if len(files) > 1:
+            files.sort(key=lambda name: not name.lower().endswith(PREVIEW_EXTENSIONS)) # Stable, keeps the order otherwise
+    return shots
+
+def find_save_directory(path, levels=2):
+    """
+    Returns the save directory of a picture that may be in a subfolder of it: the nearest folder with a catalog.
+
+    Args:
+        path (str): The path to the picture.
+        levels (int): The number of parent folders that are checked above the folder of the picture.
+
+    Returns:
+        str: The save directory, or the folder of the picture if no catalog is found.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    candidate = directory
+    for _ in range(levels + 1):
+        if os.path.exists(os.path.join(candidate, CATALOG_FILE)):
+            return candidate
+        candidate = os.path.dirname(candidate)
+    return directory
+
+def is_catalog_file(name):
+    """
+    Checks if a file name belongs in the catalog: a picture that is not a hidden or temporary file.
+    """
+    return not name.startswith('.') and name.lower().endswith(PHOTO_EXTENSIONS)
+
+class SessionCatalog:
+    """
+    The catalog of the captured files in a save directory.
+
+    Attributes:
+        save_directory (str): The directory where the pictures are saved.
+        connection (sqlite3.Connection): The connection to the catalog database.
+    """
+
+    def __init__(self, save_directory):
+        self.save_directory = save_directory
+        self.connection = sqlite3.connect(os.path.join(save_directory, CATALOG_FILE), timeout=10)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.migrate()
+        self.connection.executescript(SCHEMA)
+        self.version = None
+
+    def migrate(self):
+        """
+        Adds the columns that are missing in a catalog created by an older version.
+        """
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(files)")}
+        if columns:
+            with self.connection:
+                for column, column_type in (('sub_seconds', 'REAL'), ('sequence', 'INTEGER'), ('orientation', 'INTEGER'),
+                                            ('sharpness', 'REAL'), ('highlight_clip', 'REAL'), ('shadow_clip', 'REAL'), ('luminance', 'REAL'), ('scored', 'REAL'), ('dhash', 'INTEGER')):
+                    if column not in columns:
+                        self.connection.execute(f"ALTER TABLE files ADD COLUMN {column} {column_type}")
+                if 'sequence' not in columns:
+                    self.connection.execute("UPDATE files SET size = -1") # Read the headers again on the next refresh
+                    self.connection.execute("DELETE FROM state WHERE key = 'directory_mtime'")
+                if 'dhash' not in columns:
+                    self.connection.execute("UPDATE files SET scored = NULL") # Score again to compute the hashes
+
+    def close(self):
+        self.connection.close()
+
+    def get_state(self, key, default=None):
+        row = self.connection.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value):
+        self.connection.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def directory_mtime(self, directory=''):
+        try:
+            return os.stat(os.path.join(self.save_directory, directory)).st_mtime_ns
+        except OSError:
+            return None
+
+    def directory_mtimes(self):
+        """
+        Returns the mtime of every session folder at the last scan, relative path ('' for the save directory) -> mtime.
+        """
+        return {row[0]: row[1] for row in self.connection.execute("SELECT path, mtime FROM directories")}
+
+    def set_directory_mtime(self, directory, mtime):
+        self.connection.execute("INSERT OR REPLACE INTO directories (path, mtime) VALUES (?, ?)", (directory, mtime))
+
+    def layout(self):
+        """
+        Returns the folder layout of the session and the shots per folder of the 'frames' layout, see session_layout.
+        """
+        return self.get_state('layout', 'flat'), self.get_state('shard_frames', SHARD_FRAMES)
+
+    def set_layout(self, layout, frames=SHARD_FRAMES):
+        """
+        Sets the folder layout of the session, the tether hook reads it for every downloaded picture.
+        """
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unsupported layout: {layout}")
+        with self.connection:
+            self.set_state('layout', layout)
+            self.set_state('shard_frames', int(frames))
+
+    def durability(self):
+        """
+        Returns the flush policy of the tethered pictures and the size and age of its batches, see capture_durability.
+        """
+        return (self.get_state('durability', DEFAULT_POLICY), self.get_state('durability_files', BATCH_FILES),
+                self.get_state('durability_ms', BATCH_MS))
+
+    def set_durability(self, policy, batch_files=BATCH_FILES, batch_ms=BATCH_MS):
+        """
+        Sets the flush policy of the tethered pictures, the tether hook reads it for every downloaded picture.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unsupported durability policy: {policy}")
+        with self.connection:
+            self.set_state('durability', policy)
+            self.set_state('durability_files', max(int(batch_files), 1))
+            self.set_state('durability_ms', max(int(batch_ms), 0))
+
+    def shard_file(self, path):
+        """
+        Moves a picture that gphoto2 saved into the save directory to the current subfolder of the 'frames' layout.
+
+        A new subfolder is started after `shard_frames` shots, but never between the files of one shot: the files of
+        a RAW+JPEG pair arrive one after the other with the same base name.
+        In the other layouts the picture is left where it is.
+
+        Args:
+            path (str): The path to the downloaded picture.
+
+        Returns:
+            str: The path of the picture after the move.
+        """
+        layout, frames = self.layout()
+        if layout != 'frames' or os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.save_directory):
+            return path
+        base_name = os.path.splitext(os.path.basename(path))[0].lower()
+        with self.connection:
+            index = self.get_state('shard_index', 1)
+            shots = self.get_state('shard_shots', 0)
+            if base_name != self.get_state('shard_last_name'):
+                if shots >= frames:
+                    index, shots = index + 1, 0
+                shots += 1
+            directory = os.path.join(self.save_directory, shard_folder(index))
+            os.makedirs(directory, exist_ok=True)
+            destination = os.path.join(directory, os.path.basename(path))
+            os.replace(path, destination)
+            self.set_state('shard_index', index)
+            self.set_state('shard_shots', shots)
+            self.set_state('shard_last_name', base_name)
+        return destination
+
+    def insert(self, name, stat=None, metadata=None):
+        """
+        Adds or updates one file in the catalog without committing.
+        """
+        row = describe_file(os.path.join(self.save_directory, name), stat, metadata)
+        row['name'] = name
+        row['added'] = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files (name, size, mtime, capture_time, sub_seconds, sequence, orientation, camera_model, camera_serial, width, height, preview_offset, preview_length, added) "
+            "VALUES (:name, :size, :mtime, :capture_time, :sub_seconds, :sequence, :orientation, :camera_model, :camera_serial, :width, :height, :preview_offset, :preview_length, :added)",
+            row,
+        )
+
+    def add_file(self, path):
+        """
+        Adds a file that just landed in the save directory to the catalog.
+
+        This is called by the tether hook for every downloaded file. The mtime of the folder of the file is recorded
+        as well, so `refresh` knows that the catalog already contains this change and does not scan the folder.
+
+        Args:
+            path (str): The path to the file, absolute or relative to the save directory.
+        """
+        name = os.path.relpath(path, self.save_directory) if os.path.isabs(path) else path
+        if not is_catalog_file(os.path.basename(name)):
+            return
+        directory = os.path.dirname(name)
+        with self.connection:
+            self.insert(name)
+            self.set_state('version', self.get_state('version', 0) + 1)
+            if directory in self.directory_mtimes() or not directory:
+                self.set_directory_mtime(directory, self.directory_mtime(directory))
+
+    def refresh(self):
+        """
+        Brings the catalog up to date with the save directory.
+
+        Only the session folders whose mtime is different from the one recorded by the last refresh or `add_file`
+        are scanned (see `session_layout.scan_directories`). During the scan only the headers of new and changed
+        files are read, in a process pool if there are many of them.
+
+        Returns:
+            bool: True if the catalog changed since the last call of `refresh` on this object.
+        """
+        known_directories = self.directory_mtimes()
+        mtimes, scanned = scan_directories(self.save_directory, known_directories, is_catalog_file)
+        removed = known_directories.keys() - mtimes.keys()
+        if scanned or removed:
+            known = {}
+            for row in self.connection.execute("SELECT name, size, mtime FROM files"):
+                directory = os.path.dirname(row['name'])
+                if directory in scanned or directory in removed:
+                    known[row['name']] = (row['size'], row['mtime'])
+            new_files = [(name, stat) for files in scanned.values() for name, stat in files.items() if known.get(name) != (stat.st_size, stat.st_mtime)]
+            seen = {name for files in scanned.values() for name in files}
+            metadata_list = read_metadata_batch([os.path.join(self.save_directory, name) for name, _ in new_files])
+            changed = bool(new_files)
+            with self.connection:
+                for (name, stat), metadata in zip(new_files, metadata_list):
+                    self.insert(name, stat, metadata)
+                for name in known.keys() - seen:
+                    self.connection.execute("DELETE FROM files WHERE name = ?", (name,))
+                    changed = True
+                if changed:
+                    self.set_state('version', self.get_state('version', 0) + 1)
+                for directory in removed:
+                    self.connection.execute("DELETE FROM directories WHERE path = ?", (directory,))
+                for directory in scanned:
+                    self.set_directory_mtime(directory, mtimes[directory])
+        version = self.get_state('version', 0)
+        if version != self.version:
+            self.version = version
+            return True
+        return False
+
+    def pictures(self, order='capture', descending=True):
+        """
+        Returns the names of the pictures in the catalog.
+
+        Args:
+            order (str): 'capture' for the true capture order (see CAPTURE_ORDER), or 'mtime' or 'name'.
+            descending (bool): If True, the newest picture comes first.
+
+        Returns:
+            list: The file names relative to the save directory.
+        """
+        order_by = order_clause(order, descending)
+        return [row[0] for row in self.connection.execute(f"SELECT name FROM files ORDER BY {order_by}")]
+
+    def shots(self, order='capture', descending=True):
+        """
+        Returns the shots in the catalog, with the files of a RAW+JPEG pair as one shot.
+
+        Args:
+            order (str): The order of the shots, see `pictures`.
+            descending (bool): If True, the newest shot comes first.
+
+        Returns:
+            list: One list of file names for every shot, see `group_shots`.
+        """
+        order_by = order_clause(order, descending)
+        return group_shots(self.connection.execute(f"SELECT name, capture_time FROM files ORDER BY {order_by}"))
+
+    def shot_files(self, names):
+        """
+        Expands file names to all files of their shots, so a pair is always transferred together.
+
+        Args:
+            names (list): File names relative to the save directory.
+
+        Returns:
+            list: The files of the shots of the given names, shot by shot in the order of the names, without duplicates.
+                  Names that are not in the catalog are kept as they are.
+        """
+        shot_of = {}
+        for files in self.shots(descending=False):
+            for name in files:
+                shot_of[name] = files
+        result = {}
+        for name in names:
+            for member in shot_of.get(name, [name]):
+                result[member] = None
+        return list(result)
+
+    def unscored(self, limit=None):
+        """
+        Returns the pictures that have not been scored yet, newest first, so the analysis keeps up with the capture.
+
+        A picture that changed on disk is added again by `insert` and is therefore scored again.
+
+        Args:
+            limit (int): The maximum number of pictures, or None for all of them.
+
+        Returns:
+            list: The catalog entries with 'name', 'width', 'preview_offset' and 'preview_length'.
+        """
+        query = "SELECT name, width, preview_offset, preview_length FROM files WHERE scored IS NULL ORDER BY added DESC"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.connection.execute(query)]
+
+    def set_scores(self, results):
+        """
+        Stores the culling scores of pictures, see `image_analysis.score_image`.
+
+        Args:
+            results (list): (name, scores) for every picture, scores is None for a picture that can not be decoded.
+        """
+        now = time.time()
+        with self.connection:
+            for name, scores in results:
+                scores = scores or {}
+                dhash = scores.get('dhash')
+                if dhash is not None and dhash >= 1 << 63:
+                    dhash -= 1 << 64 # SQLite integers are signed
+                self.connection.execute(
+                    "UPDATE files SET sharpness = ?, highlight_clip = ?, shadow_clip = ?, luminance = ?, dhash = ?, scored = ? WHERE name = ?",
+                    (scores.get('sharpness'), scores.get('highlight_clip'), scores.get('shadow_clip'), scores.get('luminance'), dhash, now, name),
+                )
+            self.set_state('scores_version', self.get_state('scores_version', 0) + 1)
+
+    def scores_version(self):
+        """
+        Returns a number that changes whenever new scores are stored, so the viewer knows when to reload them.
+        """
+        return self.get_state('scores_version', 0)
+
+    def scores(self):
+        """
+        Returns the culling scores of the scored pictures.
+
+        Returns:
+            dict: file name -> {'sharpness', 'highlight_clip', 'shadow_clip', 'luminance'}.
+        """
+        return {
+            row['name']: {key: row[key] for key in ('sharpness', 'highlight_clip', 'shadow_clip', 'luminance')}
+            for row in self.connection.execute("SELECT name, sharpness, highlight_clip, shadow_clip, luminance FROM files WHERE sharpness IS NOT NULL")
+        }
+
+    def hashes(self):
+        """
+        Returns the perceptual hashes of the scored pictures.
+
+        Returns:
+            dict: file name -> 64 bit difference hash, see `image_analysis.difference_hash`.
+        """
+        return {row[0]: row[1] & ((1 << 64) - 1) for row in self.connection.execute("SELECT name, dhash FROM files WHERE dhash IS NOT NULL")}
+
+    def index(self):
+        """
+        Returns the size of every picture in the catalog.
+
+        Returns:
+            dict: file name -> size in bytes.
+        """
+        return {row[0]: row[1] for row in self.connection.execute("SELECT name, size FROM files")}
+
+    def shot_sizes(self):
+        """
+        Returns the number of shots and their total size per camera, for the projection of the remaining shots.
+
+        The files of a RAW+JPEG pair share the capture time, so a shot is counted once per capture time;
+        files without capture time count as one shot each.
+
+        Returns:
+            dict: camera model (None if unknown) -> {'files', 'shots', 'bytes'}, the camera of the newest file first.
+        """
+        return {
+            row[0]: {'files': row[1], 'shots': row[2], 'bytes': row[3]}
+            for row in self.connection.execute(
+                "SELECT camera_model, COUNT(*), COUNT(DISTINCT COALESCE(capture_time + COALESCE(sub_seconds, 0), name)), SUM(size) "
+                "FROM files WHERE size > 0 GROUP BY camera_model ORDER BY MAX(added) DESC"
+            )
+        }
+
+    def get(self, name):
+        """
+        Returns the catalog entry of a picture.
+
+        Args:
+            name (str): The file name relative to the save directory, or the absolute path.
+
+        Returns:
+            dict or None: The catalog columns of the picture, or None if it is not in the catalog.
+        """
+        if os.path.isabs(name):
+            name = os.path.relpath(name, self.save_directory)
+        row = self.connection.execute("SELECT * FROM files WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
@@ -0,0 +1,112 @@
+"""
+This module provides the folder layout of a session and the incremental scan of its folders.
+
+A session is saved flat into the save folder by default. Very large sessions can be sharded into subfolders,
+so no folder grows past a few thousand entries:
+- 'flat': Every picture in the save folder.
+- 'hour': One subfolder per hour of the capture ('20240612-14'), created by gphoto2 from the --filename pattern.
+- 'frames': One subfolder per SHARD_FRAMES shots ('frames-00001'), the tether hook moves every downloaded
+  picture into the current subfolder (see `SessionCatalog.shard_file`), the files of a RAW+JPEG pair together.
+
+The readers (the session catalog and the backup mirror) scan the folders with `scan_directories`: every folder
+is scanned with os.scandir, whose entries carry the file type, and only the folders whose mtime changed since
+the last scan are read again. A scan therefore costs one stat per folder plus the entries of the folders that
+received new pictures, instead of a stat per file of the whole session.
+
+Libraries used:
+- os: Provides the directory scans and the folder mtimes.
+"""
+import os
+
+LAYOUTS = ('flat', 'hour', 'frames')
+LAYOUT_NAMES = {'flat': "Flat", 'hour': "One folder per hour", 'frames': "One folder per {} shots"}
+HOUR_FOLDER = '%Y%m%d-%H' # Expanded by gphoto2 with the time of the download
+SHARD_FRAMES = 500 # Shots per folder of the 'frames' layout
+SKIPPED_DIRECTORIES = ('proofs',) # Folders the application writes into a session that are not captures
+
+def describe_layout(layout, frames=SHARD_FRAMES):
+    """
+    Returns the name of a layout for the menu.
+    """
+    return LAYOUT_NAMES[layout].format(frames)
+
+def tether_folder(save_directory, layout):
+    """
+    Returns the folder part of the gphoto2 --filename pattern of a layout.
+    """
+    if layout == 'hour':
+        return os.path.join(save_directory, HOUR_FOLDER)
+    return save_directory
+
+def shard_folder(index):
+    """
+    Returns the name of a subfolder of the 'frames' layout.
+    """
+    return f"frames-{index:05d}"
+
+def is_session_directory(name):
+    """
+    Checks if a subfolder of a session holds captures: not hidden (thumbnails, temporary files) and not an export.
+    """
+    return not name.startswith('.') and name not in SKIPPED_DIRECTORIES
+
+def directory_mtime(path):
+    """
+    Returns the mtime of a folder in nanoseconds, or None if it does not exist.
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def scan_directories(save_directory, known, include_file):
+    """
+    Scans the folders of a session that changed since the last scan.
+
+    A new file or subfolder changes the mtime of its folder, so a folder with the recorded mtime is skipped.
+    The folders are checked one level at a time: an unchanged folder still has its recorded subfolders
+    checked, because a picture in a subfolder does not change the mtime of its parent.
+
+    Args:
+        save_directory (str): The save folder.
+        known (dict): The mtime of every folder at the last scan, relative path ('' for the save folder) -> mtime.
+        include_file (callable): Called with a file name, returns True for the files that are collected.
+
+    Returns:
+        tuple: (mtimes, scanned)
+            mtimes (dict): The mtime of every folder that exists now, the `known` of the next scan.
+            scanned (dict): relative folder -> {file path relative to the save folder: os.stat_result}
+                            for every folder that was read.
+    """
+    mtimes = {}
+    scanned = {}
+    pending = [''] + [directory for directory in known if directory]
+    queued = set(pending)
+    while pending:
+        directory = pending.pop(0)
+        path = os.path.join(save_directory, directory) if directory else save_directory
+        mtime = directory_mtime(path)
+        if mtime is None:
+            continue # Removed since the last scan
+        mtimes[directory] = mtime
+        if mtime == known.get(directory):
+            continue
+        files = {}
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    relative = os.path.join(directory, entry.name) if directory else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if is_session_directory(entry.name) and relative not in queued:
+                            queued.add(relative)
+                            pending.append(relative)
+                    elif include_file(entry.name) and entry.is_file():
+                        try:
+                            files[relative] = entry.stat() # Cached by the entry after the first call
+                        except OSError:
+                            pass # Removed while scanning
+        except OSError:
+            mtimes.pop(directory)
+            continue
+        scanned[directory] = files
+    return mtimes, scanned
@@ -0,0 +1,196 @@
+"""
+This module provides the session store that keeps the selected pictures of a session.
+
+The selection is kept in two files in the save directory:
+- selected_pictures.json: A snapshot of the selection, the same file format the application always used.
+- selected_pictures.journal: An append-only journal with one line for every pick or unpick since the last snapshot.
+
+Every pick or unpick appends one short line to the journal and syncs it to disk, so it costs the same
+for a session with ten or ten thousand selected pictures and survives a crash of the viewer.
+Loading reads the snapshot and replays the journal. Compaction writes a new snapshot and removes the journal.
+
+Libraries used:
+- os: Provides a way to interact with the operating system, such as file operations.
+- json: Provides a way to read and write the snapshot and the journal lines.
+"""
+import os
+import json
+
+SELECTION_FILE = 'selected_pictures.json'
+JOURNAL_FILE = 'selected_pictures.journal'
+
+def session_exists(save_directory):
+    """
+    Checks if there is an active session with selected pictures in the save directory.
+
+    Args:
+        save_directory (str): The directory where the pictures are saved.
+
+    Returns:
+        bool: True if a snapshot or journal with at least one selected picture exists.
+    """
+    if not os.path.exists(os.path.join(save_directory, SELECTION_FILE)) and not os.path.exists(os.path.join(save_directory, JOURNAL_FILE)):
+        return False
+    return bool(SessionStore(save_directory).pictures)
+
+class SessionStore:
+    """
+    Keeps the selected pictures of a session in the save directory.
+
+    The store can be opened by several processes, one after the other: the main program opens it to
+    show and transfer the selection and the picture viewer opens it to change the selection.
+    Call `load` to see the changes another process made.
+
+    Attributes:
+        save_directory (str): The directory where the pictures are saved.
+        selected (dict): The selected pictures in selection order (the values are not used).
+    """
+
+    def __init__(self, save_directory):
+        self.save_directory = save_directory
+        self.snapshot_path = os.path.join(save_directory, SELECTION_FILE)
+        self.journal_path = os.path.join(save_directory, JOURNAL_FILE)
+        self.selected = {}
+        self.load()
+
+    @property
+    def pictures(self):
+        """
+        list: The selected pictures in selection order.
+        """
+        return list(self.selected)
+
+    def __contains__(self, picture):
+        return picture in self.selected
+
+    def __len__(self):
+        return len(self.selected)
+
+    def load(self):
+        """
+        Reads the snapshot and replays the journal.
+        """
+        self.selected = {}
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if isinstance(snapshot, list): # Old sessions saved 0 or null for an empty selection
+                self.selected = dict.fromkeys(snapshot)
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(self.journal_path, 'rb') as f:
+                valid_size = 0
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break # A torn last line from a crash, everything before it is valid
+                    if not line.endswith(b'\n'):
+                        break
+                    self.apply(entry)
+                    valid_size += len(line)
+            if valid_size < os.path.getsize(self.journal_path):
+                os.truncate(self.journal_path, valid_size) # Drop the torn line so the next change starts on a new line
+        except OSError:
+            pass
+
+    def apply(self, entry):
+        if entry['op'] == 'add':
+            self.selected[entry['path']] = None
+        elif entry['op'] == 'remove':
+            self.selected.pop(entry['path'], None)
+        elif entry['op'] == 'clear':
+            self.selected = {}
+
+    def append(self, entry):
+        """
+        Applies a change and appends it durably to the journal.
+        """
+        self.apply(entry)
+        line = json.dumps(entry) + '\n'
+        fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode('utf-8'))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def add(self, picture):
+        """
+        Selects a picture.
+        """
+        if picture not in self.selected:
+            self.append({'op': 'add', 'path': picture})
+
+    def remove(self, picture):
+        """
+        Deselects a picture.
+        """
+        if picture in self.selected:
+            self.append({'op': 'remove', 'path': picture})
+
+    def toggle(self, picture):
+        """
+        Selects a picture that is not selected and deselects a picture that is selected.
+
+        Returns:
+            bool: True if the picture is selected now.
+        """
+        if picture in self.selected:
+            self.remove(picture)
+            return False
+        self.add(picture)
+        return True
+
+    def toggle_shot(self, pictures):
+        """
+        Selects or deselects the files of one shot (a RAW+JPEG pair) together.
+
+        The shot counts as selected if any of its files is selected, so selections made before the files
+        were paired are deselected as a whole as well.
+
+        Args:
+            pictures (list): The paths of the files of the shot.
+
+        Returns:
+            bool: True if the shot is selected now.
+        """
+        if any(picture in self.selected for picture in pictures):
+            for picture in pictures:
+                self.remove(picture)
+            return False
+        for picture in pictures:
+            self.add(picture)
+        return True
+
+    def clear(self):
+        """
+        Deselects all pictures.
+        """
+        self.append({'op': 'clear'})
+
+    def compact(self):
+        """
+        Writes the selection to the snapshot and removes the journal.
+
+        The snapshot is written to a temporary file and renamed, so a crash leaves either the old
+        snapshot and the journal or the new snapshot.
+        """
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.pictures, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def delete(self):
+        """
+        Deletes the snapshot and the journal, which ends the session.
+        """
+        for path in (self.snapshot_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.selected = {}
@@ -0,0 +1,44 @@
+# Description: This script checks that the start time of the program does not regress.
+import os
+import sys
+import json
+from startup_report import measure_startup, format_startup_report
+
+"""
+this script measures the time from starting main.py to its menu (see startup_report) and compares it
+with the baseline in startup_baseline.json. It exits with status 1 when the time to the menu is more than
+TOLERANCE times the baseline plus SLACK_SECONDS, or when a heavy library is imported before the menu.
+
+    python3 startup_benchmark.py                    # Check against the baseline
+    python3 startup_benchmark.py --update-baseline  # Store the current time as the new baseline
+"""
+TOLERANCE = 1.25 # Allowed regression as a factor of the baseline
+SLACK_SECONDS = 0.05 # Absolute allowance for noise on small times
+RUNS = 5
+
+script_directory = os.path.dirname(os.path.abspath(__file__))
+baseline_path = os.path.join(script_directory, 'startup_baseline.json')
+
+report = measure_startup(os.path.join(script_directory, 'main.py'), runs=RUNS)
+for line in format_startup_report(report, top=10):
+    print(line)
+
+if '--update-baseline' in sys.argv or not os.path.exists(baseline_path):
+    with open(baseline_path, 'w') as f:
+        json.dump({'time_to_menu': report['time_to_menu'], 'python': sys.version.split()[0]}, f, indent=2)
+    print(f"Baseline stored: {report['time_to_menu'] * 1000:.0f} ms")
+    sys.exit(1 if report['heavy_modules'] else 0)
+
+with open(baseline_path) as f:
+    baseline = json.load(f)
+limit = baseline['time_to_menu'] * TOLERANCE + SLACK_SECONDS
+failed = False
+if report['time_to_menu'] > limit:
+    print(f"FAIL: time to menu {report['time_to_menu'] * 1000:.0f} ms is above the limit of {limit * 1000:.0f} ms (baseline {baseline['time_to_menu'] * 1000:.0f} ms)")
+    failed = True
+if report['heavy_modules']:
+    print(f"FAIL: {', '.join(report['heavy_modules'])} imported before the menu, use lazy_imports.lazy_module")
+    failed = True
+if not failed:
+    print(f"OK: time to menu {report['time_to_menu'] * 1000:.0f} ms, limit {limit * 1000:.0f} ms")
+sys.exit(1 if failed else 0)
@@ -0,0 +1,86 @@
+"""
+This module measures the start time of the program: the time until the main menu can be shown and the
+time every import takes.
+
+The program is started in a new Python process with `-X importtime` and the `--startup-exit` flag, which makes
+it exit right before the first prompt. The wall time of that process is the time to the menu, including the
+start of the interpreter. The import times are read from the `-X importtime` output of the process.
+
+Libraries used:
+- re: Provides the parsing of the `-X importtime` lines.
+- sys: Provides the path of the Python interpreter.
+- time: Provides the wall clock.
+- subprocess: Provides the measured process.
+- statistics: Provides the median of several runs.
+"""
+import re
+import sys
+import time
+import subprocess
+import statistics
+
+HEAVY_MODULES = ('cv2', 'numpy', 'rawpy', 'gphoto2') # Must not be imported before the menu, see lazy_imports
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def parse_import_times(output):
+    """
+    Parses the output of `python -X importtime`.
+
+    Args:
+        output (str): The standard error of the process.
+
+    Returns:
+        list: (cumulative microseconds, self microseconds, module name, nesting level) for every import.
+    """
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            imports.append((int(match.group(2)), int(match.group(1)), match.group(4), (len(match.group(3)) - 1) // 2))
+    return imports
+
+def measure_startup(script, runs=3, timeout=60):
+    """
+    Measures the time to the menu of a script that supports the `--startup-exit` flag.
+
+    Args:
+        script (str): The path to the script.
+        runs (int): The number of runs, the median is reported.
+        timeout (int): The maximum time of one run in seconds.
+
+    Returns:
+        dict: 'time_to_menu' (the median wall time in seconds), 'runs' (the wall time of every run),
+              'imports' (the import times of the last run, see `parse_import_times`) and
+              'heavy_modules' (the modules of HEAVY_MODULES that were imported before the menu).
+    """
+    times = []
+    output = ''
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', script, '--startup-exit'], stdin=subprocess.DEVNULL,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=timeout)
+        times.append(time.perf_counter() - start)
+        output = result.stderr
+        if result.returncode != 0:
+            raise RuntimeError(f"{script} failed to start:\n{output[-2000:]}")
+    imports = parse_import_times(output)
+    imported = {name.split('.')[0] for _, _, name, _ in imports}
+    return {
+        'time_to_menu': statistics.median(times),
+        'runs': times,
+        'imports': imports,
+        'heavy_modules': [name for name in HEAVY_MODULES if name in imported],
+    }
+
+def format_startup_report(report, top=15):
+    """
+    Returns the report of `measure_startup` as printable lines: the time to the menu and the slowest top-level imports.
+    """
+    lines = [f"Time to menu: {report['time_to_menu'] * 1000:.0f} ms (runs: {', '.join(f'{t * 1000:.0f}' for t in report['runs'])} ms)"]
+    if report['heavy_modules']:
+        lines.append(f"Heavy modules imported before the menu: {', '.join(report['heavy_modules'])}")
+    top_level = sorted((entry for entry in report['imports'] if entry[3] == 0), reverse=True)[:top]
+    lines.append(f"Slowest imports (cumulative, self):")
+    for cumulative, own, name, _ in top_level:
+        lines.append(f"  {cumulative / 1000:8.1f} ms {own / 1000:8.1f} ms  {name}")
+    return lines
@@ -0,0 +1,292 @@
+"""
+This module watches the free space of the save folder during a tether session and projects how many shots still fit.
+
+The projection uses the average size of a shot of the camera that is shooting, taken from the session catalog
+(a RAW+JPEG pair counts as one shot), and the rolling write throughput of the last THROUGHPUT_WINDOW seconds,
+measured from the shrinking free space of the volume, so it includes the backup mirror and every other writer.
+
+The watchdog raises an early warning when fewer than WARNING_SHOTS shots fit, and switches the tether to an
+overflow folder when fewer than RESERVE_SHOTS fit. The switch waits for a pause between bursts (no new picture
+for QUIET_SECONDS), unless fewer than CRITICAL_SHOTS fit, so a running burst is only interrupted as a last resort.
+The state is written to STORAGE_STATUS_FILE in the save folder, so the picture viewer can show the warning.
+
+Libraries used:
+- os: Provides the free space of a volume and the status file.
+- json: Provides the status file.
+- time: Provides the clocks of the throughput samples.
+- sqlite3: Provides the errors of a busy catalog.
+- threading: Provides the watchdog thread.
+- collections: Provides the window of throughput samples.
+- app_utils: Provides the formatting of the free space.
+- session_catalog: Provides the sizes of the shots of the session.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import deque
+from app_utils import format_mb_left
+from session_catalog import SessionCatalog, CATALOG_FILE
+
+STORAGE_STATUS_FILE = '.storage_status.json'
+CHECK_INTERVAL = 1.0 # Seconds between two reads of the free space during a tether session
+SIZES_INTERVAL = 10 # Seconds between two reads of the shot sizes from the catalog
+THROUGHPUT_WINDOW = 60 # Seconds of free space samples for the write throughput
+DEFAULT_SHOT_BYTES = 60 * 1024 * 1024 # Assumed size of a shot until the catalog knows better (a large RAW+JPEG pair)
+WARNING_SHOTS = 200 # Early warning below this number of shots
+RESERVE_SHOTS = 50 # Switch to the overflow folder below this number of shots, at the next pause
+CRITICAL_SHOTS = 15 # Switch to the overflow folder at once below this number of shots
+QUIET_SECONDS = 2 # Seconds without a new picture that count as a pause between bursts
+
+def free_bytes(directory):
+    """
+    Returns the free space of the volume of a folder in bytes, the space a user without root can use.
+    """
+    statvfs = os.statvfs(directory)
+    return statvfs.f_frsize * statvfs.f_bavail
+
+def shot_size(save_directory, camera_model=None):
+    """
+    Returns the average size of a shot in a save folder.
+
+    Args:
+        save_directory (str): The save folder.
+        camera_model (str or None): The camera model as the catalog stores it, or None for the camera
+                                    that took the newest picture.
+
+    Returns:
+        float or None: The average size of a shot in bytes, or None if the folder has no catalogued pictures.
+    """
+    if not os.path.exists(os.path.join(save_directory, CATALOG_FILE)):
+        return None # Do not create a catalog just to read it
+    try:
+        catalog = SessionCatalog(save_directory)
+        try:
+            sizes = catalog.shot_sizes()
+        finally:
+            catalog.close()
+    except sqlite3.Error:
+        return None # Busy or broken, the caller keeps the last known size
+    if not sizes:
+        return None
+    camera = sizes.get(camera_model) or next(iter(sizes.values()))
+    return camera['bytes'] / camera['shots'] if camera['shots'] else None
+
+def catalog_version(save_directory):
+    """
+    Returns the version of the catalog of a save folder, it changes with every picture the tether hook adds.
+    """
+    if not os.path.exists(os.path.join(save_directory, CATALOG_FILE)):
+        return None
+    try:
+        catalog = SessionCatalog(save_directory)
+        try:
+            return catalog.get_state('version', 0)
+        finally:
+            catalog.close()
+    except sqlite3.Error:
+        return None
+
+class ThroughputTracker:
+    """
+    Measures the rolling write throughput of a volume from samples of its free space.
+    """
+
+    def __init__(self, window=THROUGHPUT_WINDOW):
+        self.window = window
+        self.samples = deque()
+
+    def add(self, free, now=None):
+        now = time.monotonic() if now is None else now
+        self.samples.append((now, free))
+        while len(self.samples) > 2 and now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+
+    def rate(self):
+        """
+        Returns the bytes per second written to the volume within the window, 0 while nothing was written.
+        """
+        if len(self.samples) < 2:
+            return 0.0
+        (first_time, first_free), (last_time, last_free) = self.samples[0], self.samples[-1]
+        if last_time <= first_time:
+            return 0.0
+        return max(first_free - last_free, 0) / (last_time - first_time)
+
+def project(free, bytes_per_shot, rate=0.0):
+    """
+    Projects how many shots and how much time the free space lasts.
+
+    Args:
+        free (int): The free space in bytes.
+        bytes_per_shot (float or None): The average size of a shot, or None for DEFAULT_SHOT_BYTES.
+        rate (float): The write throughput in bytes per second.
+
+    Returns:
+        dict: 'shots' (int) and 'seconds' (float or None while nothing is written).
+    """
+    bytes_per_shot = bytes_per_shot or DEFAULT_SHOT_BYTES
+    return {'shots': int(free // bytes_per_shot), 'seconds': free / rate if rate > 0 else None}
+
+def format_projection(free, projection, rate=0.0):
+    """
+    Formats the free space and the projection as a colour-coded text for the terminal.
+    """
+    text = f"{format_mb_left(free / (1024 * 1024))}, ~{projection['shots']} shots"
+    if projection['seconds'] is not None and rate > 0:
+        text += f", {rate / (1024 * 1024):.1f} MiB/s, full in ~{projection['seconds'] / 60:.0f} min"
+    return text
+
+def read_storage_status(save_directory):
+    """
+    Reads the status written by the storage watchdog.
+
+    Returns:
+        dict or None: The status, see `StorageWatchdog.status`, or None if no watchdog has run in this folder.
+    """
+    try:
+        with open(os.path.join(save_directory, STORAGE_STATUS_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def format_storage_warning(status, save_directory, max_age=30):
+    """
+    Returns a short warning for the picture viewer, or None if the save folder has room.
+
+    Args:
+        status (dict or None): The status read by `read_storage_status`.
+        save_directory (str): The folder the viewer shows.
+        max_age (float): The maximum age in seconds of a status that is still trusted, a watchdog that is not
+                         running leaves an old status behind.
+    """
+    if not status or time.time() - status.get('updated', 0) > max_age:
+        return None
+    if status.get('save_directory') != save_directory:
+        return f"This folder is full, new pictures are saved to {status.get('save_directory')}"
+    if status.get('level', 'ok') != 'ok':
+        return f"Disk almost full: ~{status.get('shots')} shots left"
+    return None
+
+class StorageWatchdog(threading.Thread):
+    """
+    Watches the free space of the save folder of a running tether session.
+
+    Attributes:
+        save_directory (str): The folder the tether saves into, it changes when the watchdog fails over.
+        overflow_directories (list): The folders to switch to when the save folder is full, in order of preference.
+        on_failover (callable): Called with the new save folder when the tether has to switch, or None to only warn.
+        level (str): 'ok', 'warning' or 'critical'.
+    """
+
+    def __init__(self, save_directory, overflow_directories=(), on_failover=None, camera_model=None, interval=CHECK_INTERVAL):
+        super().__init__(name='storage-watchdog', daemon=True)
+        self.save_directory = save_directory
+        self.overflow_directories = [directory for directory in overflow_directories if directory and directory != save_directory]
+        self.on_failover = on_failover
+        self.camera_model = camera_model
+        self.interval = interval
+        self.tracker = ThroughputTracker()
+        self.bytes_per_shot = None
+        self.sizes_due = 0
+        self.level = 'ok'
+        self.last = None
+        self.last_version = None
+        self.last_activity = 0
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+        self.join(timeout=self.interval * 2)
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                self.check()
+            except OSError:
+                pass # The folder is not available right now, for example an unplugged drive
+            self.stopping.wait(self.interval)
+
+    def check(self):
+        """
+        Reads the free space once, updates the projection and warns or fails over if needed.
+        """
+        now = time.monotonic()
+        if now >= self.sizes_due:
+            self.bytes_per_shot = shot_size(self.save_directory, self.camera_model) or self.bytes_per_shot
+            self.sizes_due = now + SIZES_INTERVAL
+        free = free_bytes(self.save_directory)
+        self.tracker.add(free, now)
+        rate = self.tracker.rate()
+        projection = project(free, self.bytes_per_shot, rate)
+        self.last = {'free': free, 'rate': rate, **projection}
+        shots = projection['shots']
+        level = 'critical' if shots < RESERVE_SHOTS else 'warning' if shots < WARNING_SHOTS else 'ok'
+        if level != self.level:
+            if level != 'ok':
+                print(f"\a\n\033[91mThe save folder is almost full: {format_projection(free, projection, rate)}.\033[0m")
+            self.level = level
+        self.write_status()
+        if shots < RESERVE_SHOTS and self.on_failover and (shots < CRITICAL_SHOTS or self.quiet()):
+            self.fail_over()
+
+    def quiet(self):
+        """
+        Checks if no picture landed in the save folder for QUIET_SECONDS, a pause between bursts.
+
+        The tether hook counts up the version of the catalog for every picture, the mtime of the folder is no help
+        because the catalog and the status files change it as well.
+        """
+        now = time.monotonic()
+        version = catalog_version(self.save_directory)
+        if version != self.last_version:
+            self.last_version = version
+            self.last_activity = now
+        return now - self.last_activity >= QUIET_SECONDS
+
+    def fail_over(self):
+        """
+        Switches the tether to the first overflow folder with room for more than WARNING_SHOTS shots.
+        """
+        needed = (self.bytes_per_shot or DEFAULT_SHOT_BYTES) * WARNING_SHOTS
+        for directory in list(self.overflow_directories):
+            try:
+                if free_bytes(directory) < needed:
+                    continue
+            except OSError:
+                continue
+            self.overflow_directories.remove(directory)
+            print(f"\a\n\033[38;5;202mThe save folder is full, new pictures are saved to {directory}.\033[0m")
+            previous = self.save_directory
+            self.save_directory = directory
+            self.tracker = ThroughputTracker() # The throughput of the new volume
+            self.last_version = None
+            self.level = 'ok'
+            self.write_status(previous)
+            self.on_failover(directory)
+            return
+        self.on_failover = None # Nowhere to go, keep warning
+        print(f"\a\n\033[91mNo overflow folder has room left, the tether keeps saving to {self.save_directory}.\033[0m")
+
+    def status(self):
+        """
+        Returns the state of the watchdog.
+
+        Returns:
+            dict: 'level', 'free', 'rate' (bytes per second), 'shots', 'seconds', 'save_directory' and 'updated'.
+        """
+        return {'level': self.level, **(self.last or {}), 'save_directory': self.save_directory, 'updated': time.time()}
+
+    def write_status(self, directory=None):
+        """
+        Writes the status to the STORAGE_STATUS_FILE of a save folder, the current one by default.
+
+        The file is rewritten in place instead of being replaced, like the mirror status, so the mtime of the
+        save folder only changes when a picture lands.
+        """
+        try:
+            with open(os.path.join(directory or self.save_directory, STORAGE_STATUS_FILE), 'w') as f:
+                json.dump(self.status(), f)
+        except OSError:
+            pass
@@ -0,0 +1,199 @@
+"""
+This module generates synthetic session folders for the benchmarks, see benchmark_suite.py.
+
+A session looks like a real tether session to the catalog, the viewer and the transfers:
+- RAW files are NEF-like TIFF containers with make, model, orientation, serial number, EXIF capture time,
+  sub-seconds, frame counter and an embedded JPEG preview, followed by placeholder sensor data.
+- JPEG files have the same EXIF block in an APP1 segment, followed by the image data.
+- Shots are RAW+JPEG pairs, single RAW files or single JPEG files, shot in bursts a fraction of a second apart.
+- The file sizes are mixed like the output of a real camera (see SIZE_PROFILES).
+
+The image data is real JPEG data if OpenCV is installed and a small placeholder otherwise, so the scan and
+sort benchmarks run everywhere while the decode benchmark needs OpenCV. The placeholder sensor data is written
+as a sparse file by default, so a session of 50,000 files costs little disk space; the transfer benchmark
+uses dense files, so the copy reads real data.
+
+Libraries used:
+- os: Provides the file operations and the modification times.
+- time: Provides the capture times.
+- random: Provides the reproducible mix of files and sizes.
+- struct: Provides the binary TIFF structures.
+- lazy_imports: Provides OpenCV and NumPy for the real JPEG data, if they are installed.
+"""
+import os
+import time
+import random
+import struct
+from lazy_imports import lazy_module
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+
+SIZE_PROFILES = { # (file size in MiB, weight) for every kind of file
+    'raw': ((18, 2), (25, 5), (45, 2)),
+    'jpeg': ((2, 2), (6, 5), (12, 2)),
+}
+SHOT_MIX = (('pair', 5), ('raw', 3), ('jpeg', 2)) # The kinds of shots and their weights
+PREVIEW_SIZE = (1620, 1080) # The size of the embedded preview and the JPEG image data (width, height)
+BURST_LENGTH = 6 # Shots per burst
+BURST_INTERVAL = 0.15 # Seconds between the shots of a burst
+
+def tiff_structure(width, height, capture_time, sub_seconds, sequence, orientation=1, preview_length=0, data_offset=0):
+    """
+    Returns a little-endian TIFF structure with the tags the catalog reads.
+
+    Args:
+        width, height (int): The size of the picture.
+        capture_time (float): The capture time as Unix time.
+        sub_seconds (int): The sub-seconds in hundredths.
+        sequence (int): The frame counter of the camera.
+        orientation (int): The EXIF orientation.
+        preview_length (int): The length of the embedded preview, 0 for none.
+        data_offset (int): The position of the embedded preview, relative to the TIFF header.
+
+    Returns:
+        bytes: The TIFF structure, data_offset must be at least its length.
+    """
+    strings = {
+        'make': b'NIKON CORPORATION\0',
+        'model': b'NIKON D750\0',
+        'date': time.strftime('%Y:%m:%d %H:%M:%S', time.localtime(capture_time)).encode('ascii') + b'\0',
+        'serial': b'3012345\0',
+        'sub_seconds': f'{sub_seconds:02d}'.encode('ascii') + b'\0',
+    }
+    ifd0_offset = 8
+    ifd0_count = 8 if preview_length else 6
+    exif_offset = ifd0_offset + 2 + ifd0_count * 12 + 4
+    exif_count = 4
+    strings_offset = exif_offset + 2 + exif_count * 12 + 4
+    positions = {}
+    string_data = b''
+    for key, value in strings.items():
+        positions[key] = strings_offset + len(string_data)
+        string_data += value + (b'\0' if len(value) % 2 else b'')
+
+    def entry(tag, value_type, count, value):
+        if value_type == 2 and count <= 4: # Short strings are stored in the entry itself
+            key = next(key for key, position in positions.items() if position == value)
+            return struct.pack('<HHI', tag, value_type, count) + strings[key].ljust(4, b'\0')
+        if value_type == 3:
+            return struct.pack('<HHIHH', tag, value_type, count, value, 0)
+        return struct.pack('<HHII', tag, value_type, count, value)
+
+    ifd0 = [
+        entry(0x0100, 4, 1, width),
+        entry(0x0101, 4, 1, height),
+        entry(0x010F, 2, len(strings['make']), positions['make']),
+        entry(0x0110, 2, len(strings['model']), positions['model']),
+        entry(0x0112, 3, 1, orientation),
+    ]
+    if preview_length:
+        ifd0 += [entry(0x0201, 4, 1, data_offset), entry(0x0202, 4, 1, preview_length)]
+    ifd0.append(entry(0x8769, 4, 1, exif_offset))
+    exif = [
+        entry(0x9003, 2, len(strings['date']), positions['date']),
+        entry(0x9211, 4, 1, sequence),
+        entry(0x9291, 2, len(strings['sub_seconds']), positions['sub_seconds']),
+        entry(0xA431, 2, len(strings['serial']), positions['serial']),
+    ]
+    structure = b'II*\0' + struct.pack('<I', ifd0_offset)
+    structure += struct.pack('<H', len(ifd0)) + b''.join(ifd0) + struct.pack('<I', 0)
+    structure += struct.pack('<H', len(exif)) + b''.join(exif) + struct.pack('<I', 0)
+    return structure + string_data
+
+def image_data(seed, size=PREVIEW_SIZE):
+    """
+    Returns the JPEG data of a synthetic picture: real JPEG data if OpenCV is installed, a placeholder otherwise.
+    """
+    try:
+        width, height = size
+        generator = np.random.default_rng(seed)
+        gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+        frame = np.clip(gradient + generator.normal(0, 24, (height, width, 3)), 0, 255).astype(np.uint8)
+        return cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+    except ImportError:
+        return b'\xff\xd8' + b'\xff\xfe\x00\x10synthetic data' + b'\xff\xd9'
+
+def write_padded(path, data, size, sparse, rng):
+    """
+    Writes data and extends the file to `size` bytes with placeholder data, sparse or dense.
+    """
+    with open(path, 'wb') as f:
+        f.write(data)
+        remaining = size - len(data)
+        if remaining > 0:
+            if sparse:
+                f.truncate(size)
+            else:
+                block = rng.randbytes(1024 * 1024) if hasattr(rng, 'randbytes') else os.urandom(1024 * 1024)
+                while remaining > 0:
+                    f.write(block[:remaining])
+                    remaining -= len(block)
+
+def make_raw(path, capture_time, sub_seconds, sequence, preview, size, sparse=True, rng=None):
+    """
+    Writes a NEF-like TIFF container with an embedded preview.
+    """
+    width, height = 6016, 4016
+    header_length = len(tiff_structure(width, height, capture_time, sub_seconds, sequence, preview_length=len(preview), data_offset=0))
+    data_offset = (header_length + 511) // 512 * 512
+    header = tiff_structure(width, height, capture_time, sub_seconds, sequence, preview_length=len(preview), data_offset=data_offset)
+    write_padded(path, header.ljust(data_offset, b'\0') + preview, size, sparse, rng or random.Random(0))
+
+def make_jpeg(path, capture_time, sub_seconds, sequence, jpeg, size, sparse=True, rng=None):
+    """
+    Writes a JPEG file with an EXIF block, padded after the end of the image data.
+    """
+    exif = b'Exif\0\0' + tiff_structure(PREVIEW_SIZE[0], PREVIEW_SIZE[1], capture_time, sub_seconds, sequence)
+    app1 = b'\xff\xe1' + struct.pack('>H', len(exif) + 2) + exif
+    write_padded(path, jpeg[:2] + app1 + jpeg[2:], size, sparse, rng or random.Random(0))
+
+def weighted_choice(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+def generate_session(directory, count, seed=0, sparse=True, size_scale=1.0, start_time=None):
+    """
+    Generates a synthetic session folder.
+
+    Args:
+        directory (str): The folder, it is created if it does not exist.
+        count (int): The number of files.
+        seed (int): The seed of the mix of files and sizes, the same seed gives the same session.
+        sparse (bool): If True, the placeholder data is written as a sparse file.
+        size_scale (float): A factor for all file sizes, for example 0.1 for a small transfer benchmark.
+        start_time (float or None): The capture time of the first shot, or None for a fixed date.
+
+    Returns:
+        dict: 'files', 'shots', 'bytes' (the apparent size) and 'real_jpeg' (True if the image data can be decoded).
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    capture_time = start_time if start_time is not None else 1790000000.0
+    previews = [image_data(seed + n) for n in range(4)] # A few different pictures are enough for decoding
+    real_jpeg = len(previews[0]) > 100
+    files = shots = total_bytes = 0
+    sequence = 0
+    while files < count:
+        kind = weighted_choice(rng, SHOT_MIX)
+        if kind == 'pair' and count - files < 2:
+            kind = 'raw'
+        sequence += 1
+        capture_time += BURST_INTERVAL if sequence % BURST_LENGTH else rng.uniform(2, 30)
+        sub_seconds = int((capture_time % 1) * 100)
+        preview = previews[sequence % len(previews)]
+        base_name = f"DSC_{sequence:05d}"
+        written = []
+        if kind in ('pair', 'raw'):
+            size = int(weighted_choice(rng, SIZE_PROFILES['raw']) * 1024 * 1024 * size_scale)
+            make_raw(os.path.join(directory, base_name + '.NEF'), capture_time, sub_seconds, sequence, preview, size, sparse, rng)
+            written.append((base_name + '.NEF', max(size, len(preview))))
+        if kind in ('pair', 'jpeg'):
+            size = int(weighted_choice(rng, SIZE_PROFILES['jpeg']) * 1024 * 1024 * size_scale)
+            make_jpeg(os.path.join(directory, base_name + '.JPG'), capture_time, sub_seconds, sequence, preview, size, sparse, rng)
+            written.append((base_name + '.JPG', max(size, len(preview))))
+        for name, size in written:
+            os.utime(os.path.join(directory, name), (capture_time, capture_time)) # Written when it was shot
+            total_bytes += size
+        files += len(written)
+        shots += 1
+    return {'files': files, 'shots': shots, 'bytes': total_bytes, 'real_jpeg': real_jpeg}
@@ -0,0 +1,93 @@
+# Description: This script sends a command to the headless tether daemon and prints the result.
+import sys
+import json
+import argparse
+from control_server import send_command, ControlError
+from session_layout import LAYOUTS, SHARD_FRAMES
+from capture_durability import POLICIES, BATCH_FILES, BATCH_MS
+
+"""
+this script is the command line client of tether_daemon.py. Every call sends one command and prints the result
+as JSON, so it can be used from shell scripts. The exit status is 0 on success, 1 if the daemon refused the
+command and 2 if the daemon is not reachable.
+
+    python3 tether_ctl.py save-dir ~/shoot
+    python3 tether_ctl.py filename turntable
+    python3 tether_ctl.py layout frames --frames 500
+    python3 tether_ctl.py durability batch --files 20 --ms 500
+    python3 tether_ctl.py profile apply packshot
+    python3 tether_ctl.py start
+    python3 tether_ctl.py frames --limit 10
+    python3 tether_ctl.py select DSC_0001.NEF
+    python3 tether_ctl.py transfer /media/backup --all
+    python3 tether_ctl.py status
+    python3 tether_ctl.py telemetry --csv ~/shoot/telemetry.csv
+"""
+parser = argparse.ArgumentParser(description="Controls the headless tether daemon.")
+parser.add_argument('--address', help="The path of the Unix socket or a port on 127.0.0.1.")
+commands = parser.add_subparsers(dest='action', required=True)
+commands.add_parser('status', help="Show the state of the session.")
+commands.add_parser('start', help="Start the tether.")
+commands.add_parser('stop', help="Stop the tether.")
+commands.add_parser('shutdown', help="Stop the tether and the daemon.")
+commands.add_parser('stats', help="Show the p50, p95 and p99 of every pipeline stage.")
+save_dir_parser = commands.add_parser('save-dir', help="Change the save folder.")
+save_dir_parser.add_argument('path')
+filename_parser = commands.add_parser('filename', help="Change the prefix of the file names.")
+filename_parser.add_argument('prefix', nargs='?', default="")
+layout_parser = commands.add_parser('layout', help="Change the folder layout of the session.")
+layout_parser.add_argument('layout', choices=LAYOUTS)
+layout_parser.add_argument('--frames', type=int, default=SHARD_FRAMES, help="The shots per folder of the 'frames' layout.")
+durability_parser = commands.add_parser('durability', help="Change how often the pictures are flushed to the disk.")
+durability_parser.add_argument('policy', choices=POLICIES)
+durability_parser.add_argument('--files', type=int, default=BATCH_FILES, help="The pictures per flush of the 'batch' policy.")
+durability_parser.add_argument('--ms', type=int, default=BATCH_MS, help="The milliseconds between flushes of the 'batch' policy.")
+profile_parser = commands.add_parser('profile', help="List, save, apply or delete camera settings profiles.")
+profile_parser.add_argument('profile_action', choices=['list', 'save', 'apply', 'delete'])
+profile_parser.add_argument('name', nargs='?', default="")
+telemetry_parser = commands.add_parser('telemetry', help="Show the camera telemetry and its trends.")
+telemetry_parser.add_argument('--csv', help="Export the samples to this CSV file.")
+frames_parser = commands.add_parser('frames', help="List the shots, newest first.")
+frames_parser.add_argument('--offset', type=int, default=0)
+frames_parser.add_argument('--limit', type=int, default=100)
+frames_parser.add_argument('--selected', action='store_true', help="Only the selected shots.")
+select_parser = commands.add_parser('select', help="Select shots.")
+select_parser.add_argument('names', nargs='+')
+deselect_parser = commands.add_parser('deselect', help="Deselect shots.")
+deselect_parser.add_argument('names', nargs='+')
+transfer_parser = commands.add_parser('transfer', help="Copy the pictures to one or more folders in the background.")
+transfer_parser.add_argument('destinations', nargs='+')
+transfer_parser.add_argument('--all', action='store_true', help="All pictures instead of the selected ones.")
+transfer_parser.add_argument('--on-conflict', choices=['rewrite', 'rename', 'skip'], default='rename')
+transfer_parser.add_argument('--rate-limit', type=float, help="The bandwidth limit in MB/s.")
+arguments = parser.parse_args()
+
+requests = {
+    'status': lambda: ('status', {}),
+    'start': lambda: ('start_tether', {}),
+    'stop': lambda: ('stop_tether', {}),
+    'shutdown': lambda: ('shutdown', {}),
+    'stats': lambda: ('stats', {}),
+    'save-dir': lambda: ('set_save_directory', {'path': arguments.path}),
+    'filename': lambda: ('set_filename', {'prefix': arguments.prefix}),
+    'layout': lambda: ('set_layout', {'layout': arguments.layout, 'frames': arguments.frames}),
+    'durability': lambda: ('set_durability', {'policy': arguments.policy, 'batch_files': arguments.files, 'batch_ms': arguments.ms}),
+    'profile': lambda: ('list_profiles', {}) if arguments.profile_action == 'list' else (arguments.profile_action + '_profile', {'name': arguments.name}),
+    'telemetry': lambda: ('telemetry', {'csv_path': arguments.csv}),
+    'frames': lambda: ('list_frames', {'offset': arguments.offset, 'limit': arguments.limit, 'selected_only': arguments.selected}),
+    'select': lambda: ('select', {'names': arguments.names, 'selected': True}),
+    'deselect': lambda: ('select', {'names': arguments.names, 'selected': False}),
+    'transfer': lambda: ('start_transfer', {'destinations': arguments.destinations, 'selection': 'all' if arguments.all else 'selected',
+                                            'on_conflict': arguments.on_conflict, 'rate_limit': arguments.rate_limit}),
+}
+command, command_arguments = requests[arguments.action]()
+
+try:
+    result = send_command(command, arguments.address, **command_arguments)
+except ControlError as e:
+    print("Error:", e, file=sys.stderr)
+    sys.exit(1)
+except OSError as e:
+    print("The daemon is not reachable:", e, file=sys.stderr)
+    sys.exit(2)
+print(json.dumps(result, indent=2))
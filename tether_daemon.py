@@ -0,0 +1,70 @@
+# Description: This script runs a tether session without the menu, controlled through a local socket.
+import os
+import sys
+import signal
+import argparse
+import threading
+from control_server import TetherController, create_server, parse_address
+from session_layout import LAYOUTS, SHARD_FRAMES
+from capture_durability import POLICIES, BATCH_FILES, BATCH_MS
+from camera_telemetry import TELEMETRY_INTERVAL
+
+"""
+this script is the headless mode of the application, for unattended rigs such as a product turntable.
+it never opens a dialog or asks on the terminal. The commands come from tether_ctl.py or any program that
+speaks the JSON protocol described in control_server.
+
+    python3 tether_daemon.py --save-directory ~/shoot --filename turntable
+    python3 tether_ctl.py start
+"""
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Runs a tether session controlled through a local socket.")
+    parser.add_argument('--save-directory', help="The folder the pictures are saved to.")
+    parser.add_argument('--filename', default="", help="The prefix of the file names, empty for the names of the camera.")
+    parser.add_argument('--backup', action='append', default=[], help="A backup mirror folder, can be given several times.")
+    parser.add_argument('--layout', choices=LAYOUTS, help="The folder layout of the session, see session_layout.")
+    parser.add_argument('--shard-frames', type=int, default=SHARD_FRAMES, help="The shots per folder of the 'frames' layout.")
+    parser.add_argument('--durability', choices=POLICIES, help="How often the pictures are flushed to the disk, see capture_durability.")
+    parser.add_argument('--batch-files', type=int, default=BATCH_FILES, help="The pictures per flush of the 'batch' policy.")
+    parser.add_argument('--batch-ms', type=int, default=BATCH_MS, help="The milliseconds between flushes of the 'batch' policy.")
+    parser.add_argument('--telemetry-interval', type=float, default=TELEMETRY_INTERVAL, help="The seconds between two camera telemetry samples.")
+    parser.add_argument('--address', help="The path of the Unix socket or a port on 127.0.0.1.")
+    parser.add_argument('--start', action='store_true', help="Start the tether right away.")
+    arguments = parser.parse_args()
+
+    controller = TetherController(arguments.save_directory, arguments.filename, arguments.backup, arguments.telemetry_interval)
+    if arguments.layout:
+        response = controller.handle({'command': 'set_layout', 'layout': arguments.layout, 'frames': arguments.shard_frames})
+        if not response['ok']:
+            print("Could not set the folder layout:", response['error'])
+            sys.exit(1)
+    if arguments.durability:
+        response = controller.handle({'command': 'set_durability', 'policy': arguments.durability, 'batch_files': arguments.batch_files, 'batch_ms': arguments.batch_ms})
+        if not response['ok']:
+            print("Could not set the write safety:", response['error'])
+            sys.exit(1)
+    if arguments.start:
+        response = controller.handle({'command': 'start_tether'})
+        if not response['ok']:
+            print("Could not start the tether:", response['error'])
+            sys.exit(1)
+
+    server = create_server(controller, arguments.address)
+    print("Listening on", parse_address(arguments.address))
+
+    def request_stop(signum, frame):
+        controller.stop_requested.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    server_thread = threading.Thread(target=server.serve_forever, name='control-server', daemon=True)
+    server_thread.start()
+    controller.stop_requested.wait() # Set by a signal or by the shutdown command
+
+    print("Stopping...")
+    server.shutdown()
+    server.server_close()
+    controller.close()
+    if isinstance(server.server_address, str):
+        os.remove(server.server_address)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# Description: This script is run by gphoto2 (--hook-script) for every event of the tether session.
+import os
+from session_catalog import SessionCatalog, find_save_directory
+from capture_durability import publish_capture, sync_capture
+from pipeline_trace import Tracer
+
+"""
+gphoto2 runs this script with the ACTION environment variable set to init, start, download or stop.
+For download, the ARGUMENT environment variable is the path of the file that was just saved, under a temporary
+name (see capture_durability). The file is renamed to its final name and flushed to the disk by the policy of the session.
+The file is added to the session catalog, so the viewer and the transfers find it without scanning the save directory.
+In a sharded session (see session_layout) the file is in a subfolder of the save directory, or it is moved into one
+by `SessionCatalog.shard_file`.
+The time this takes is recorded as the catalog stage of the pipeline trace.
+"""
+if os.environ.get('ACTION') == 'download':
+    path = os.path.abspath(os.environ['ARGUMENT'])
+    save_directory = find_save_directory(path)
+    tracer = Tracer(save_directory, 'tether_hook')
+    with tracer.span('catalog', file=os.path.basename(path)):
+        catalog = SessionCatalog(save_directory)
+        path = publish_capture(catalog, path)
+        path = catalog.shard_file(path)
+        sync_capture(catalog, path)
+        catalog.add_file(path)
+        catalog.close()
+    tracer.close()
+
@@ -0,0 +1,959 @@
+"""
+This module provides the file transfer engine used for backing up and delivering captured pictures.
+
+Libraries used:
+- io: Provides the in-memory file used for the archive index.
+- os: Provides a way to interact with the operating system, such as file operations and process priority.
+- sys: Provides access to the platform name.
+- time: Provides various time-related functions, such as getting the current time and delaying execution.
+- json: Provides a way to write the status files shared with the main program.
+- queue: Provides the bounded queue between the directory watcher and the copy worker.
+- shutil: Provides high-level file operations, such as copying file metadata.
+- subprocess: Provides a way to run the 'ionice' command.
+- threading: Provides the background watcher and copy worker threads.
+- tarfile: Provides the streaming tar writer used for archive exports.
+- zipfile: Provides the store-only zip writer used for archive exports.
+- session_layout: Provides the incremental scan of the session folders.
+
+"""
+import io
+import os
+import sys
+import time
+import json
+import queue
+import shutil
+import subprocess
+import threading
+import tarfile
+import zipfile
+from session_layout import HOUR_FOLDER, scan_directories
+
+PHOTO_EXTENSIONS = ('.nef', '.cr2', '.arw', '.jpg', '.jpeg', '.png', '.tif', '.tiff')
+SIDECAR_EXTENSIONS = ('.xmp',)
+MIRROR_STATUS_FILE = '.mirror_status.json'
+COPY_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+def set_io_priority(nice_increment=10, idle_io=True):
+    """
+    Lowers the CPU and IO priority of the current process so it does not compete with the tether download.
+
+    On Linux the IO scheduling class is set to "idle" with the 'ionice' command, which means the process only
+    gets disk time when no other process needs it. On other platforms only the CPU nice value is changed.
+
+    Args:
+        nice_increment (int): The value added to the nice value of the process.
+        idle_io (bool): If True, the IO scheduling class is set to idle (Linux only).
+
+    Returns:
+        None
+    """
+    try:
+        os.nice(nice_increment)
+    except (AttributeError, OSError):
+        pass  # Not supported on this platform
+
+    if idle_io and sys.platform.startswith('linux'):
+        try:
+            subprocess.run(['ionice', '-c', '3', '-p', str(os.getpid())], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except (FileNotFoundError, OSError):
+            pass  # ionice is not installed
+
+def set_thread_io_priority(nice_increment=5, io_class=2, io_level=7):
+    """
+    Lowers the CPU and IO priority of the calling thread only.
+
+    On Linux the nice value and the IO priority belong to a thread, so a transfer thread can be made
+    less important than the tether download without changing the priority of the rest of the program.
+    The default is the lowest level of the "best-effort" IO class, which still makes progress while the
+    tether is writing. On other platforms nothing is changed.
+
+    Args:
+        nice_increment (int): The value added to the nice value of the thread.
+        io_class (int): The IO scheduling class, 2 for best-effort or 3 for idle.
+        io_level (int): The priority level inside the best-effort class, from 0 (highest) to 7 (lowest).
+
+    Returns:
+        None
+    """
+    if not sys.platform.startswith('linux'):
+        return
+    thread_id = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, thread_id, os.getpriority(os.PRIO_PROCESS, thread_id) + nice_increment)
+    except OSError:
+        pass
+    command = ['ionice', '-c', str(io_class), '-p', str(thread_id)]
+    if io_class == 2:
+        command[3:3] = ['-n', str(io_level)]
+    try:
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (FileNotFoundError, OSError):
+        pass  # ionice is not installed
+
+def capture_pressure(save_directory, activity_window=3, status_age=5):
+    """
+    Checks if the capture path of a save directory is busy.
+
+    The capture path is busy if the backup mirror reports pictures waiting in its queue, or if a new
+    picture landed in the save directory within the last `activity_window` seconds, which means the tether
+    is downloading. Only the save directory itself, the folder of the current hour of the 'hour' layout
+    (see session_layout) and the mirror status file are checked, so this is cheap.
+
+    Args:
+        save_directory (str): The directory where the tether process saves the pictures.
+        activity_window (float): The time in seconds after a new picture during which the tether counts as busy.
+        status_age (float): The maximum age in seconds of a mirror status that is still trusted.
+
+    Returns:
+        bool: True if the capture path is busy.
+    """
+    now = time.time()
+    try:
+        if now - os.stat(save_directory).st_mtime < activity_window:
+            return True
+    except OSError:
+        return False
+    try:
+        if now - os.stat(os.path.join(save_directory, time.strftime(HOUR_FOLDER))).st_mtime < activity_window:
+            return True
+    except OSError:
+        pass # Not a session with the 'hour' layout
+    status = read_mirror_status(save_directory)
+    if status and now - status.get('updated', 0) < status_age and status.get('pending', 0) > 0:
+        return True
+    return False
+
+class TransferThrottle:
+    """
+    Limits the bandwidth of a transfer with a token bucket and slows it down while the capture path is busy.
+
+    Every block of a transfer takes its size in tokens from the bucket. The bucket is refilled at `rate`
+    bytes per second and holds at most `burst` bytes, so short bursts are allowed but the average speed never
+    goes above the rate. While `capture_pressure` reports a busy capture path, the rate drops to `pressure_rate`.
+
+    Attributes:
+        rate (float or None): The bandwidth limit in bytes per second, or None for no limit.
+        pressure_rate (float): The bandwidth limit in bytes per second while the capture path is busy.
+        save_directory (str or None): The save directory of the capture path to watch, or None to never back off.
+        under_pressure (bool): True while the transfer is slowed down because of the capture path.
+    """
+
+    def __init__(self, rate=None, save_directory=None, pressure_rate=4 * 1024 * 1024, burst=4 * COPY_CHUNK_SIZE, check_interval=0.5):
+        self.rate = rate
+        self.pressure_rate = pressure_rate
+        self.save_directory = save_directory
+        self.burst = burst
+        self.check_interval = check_interval
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.last_check = 0
+        self.under_pressure = False
+        self.lock = threading.Lock()
+
+    def current_rate(self):
+        """
+        Returns the rate that applies now, checking the capture path at most every `check_interval` seconds.
+        """
+        now = time.monotonic()
+        if self.save_directory and now - self.last_check >= self.check_interval:
+            self.last_check = now
+            self.under_pressure = capture_pressure(self.save_directory)
+        if self.under_pressure:
+            return min(self.rate, self.pressure_rate) if self.rate else self.pressure_rate
+        return self.rate
+
+    def consume(self, size):
+        """
+        Waits until `size` bytes may be transferred.
+
+        Args:
+            size (int): The number of bytes that will be transferred.
+        """
+        with self.lock:
+            while True:
+                rate = self.current_rate()
+                now = time.monotonic()
+                if not rate:
+                    self.tokens = self.burst
+                    self.last_refill = now
+                    return
+                self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * rate)
+                self.last_refill = now
+                if self.tokens >= min(size, self.burst):
+                    self.tokens -= size # May go negative for blocks larger than the burst, which delays the next block
+                    return
+                time.sleep(min((min(size, self.burst) - self.tokens) / rate, self.check_interval))
+
+def wait_for_complete_file(path, interval=0.5, timeout=30):
+    """
+    Waits until a file stops growing, so a file that is still being downloaded from the camera is not copied.
+
+    Args:
+        path (str): The path to the file.
+        interval (float): The time in seconds between two size checks.
+        timeout (float): The maximum time in seconds to wait.
+
+    Returns:
+        bool: True if the file size is stable, False if the file disappeared or the timeout was reached.
+    """
+    deadline = time.time() + timeout
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return False
+    while time.time() < deadline:
+        time.sleep(interval)
+        try:
+            new_size = os.path.getsize(path)
+        except OSError:
+            return False
+        if new_size == size and new_size > 0:
+            return True
+        size = new_size
+    return False
+
+def copy_file_atomic(source_path, destination_path, chunk_size=COPY_CHUNK_SIZE, throttle=None):
+    """
+    Copies a file to a temporary name in the destination directory and renames it once it is complete.
+
+    A reader of the destination directory therefore never sees a half-copied file.
+
+    Args:
+        source_path (str): The path to the source file.
+        destination_path (str): The final path of the copied file.
+        chunk_size (int): The size of the blocks read from the source file.
+        throttle (TransferThrottle): Limits the bandwidth of the copy, or None for no limit.
+
+    Returns:
+        int: The number of bytes copied.
+    """
+    temp_path = os.path.join(os.path.dirname(destination_path), '.' + os.path.basename(destination_path) + '.part')
+    os.makedirs(os.path.dirname(destination_path), exist_ok=True) # The subfolder of a sharded session
+    copied = 0
+    try:
+        with open(source_path, 'rb') as src, open(temp_path, 'wb') as dst:
+            while True:
+                if throttle:
+                    throttle.consume(chunk_size)
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                copied += len(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copystat(source_path, temp_path)
+        os.replace(temp_path, destination_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return copied
+
+class BackupMirror:
+    """
+    Mirrors every new capture in the save directory to one or more backup directories while the tether is running.
+
+    A watcher thread polls the session folders (see `session_layout.scan_directories`) and puts new picture files
+    into a bounded queue.
+    A copy worker thread takes the files from the queue and copies them to every backup directory.
+    If the queue is full the watcher simply waits, so the mirror can fall behind but never takes
+    more memory or disk time than it is allowed to.
+
+    Attributes:
+        save_directory (str): The directory where the tether process saves the pictures.
+        backup_directories (list): The directories the pictures are mirrored to.
+        pending (int): The number of files waiting to be mirrored.
+        pending_bytes (int): The size of the files waiting to be mirrored.
+        mirrored (int): The number of files mirrored since the start.
+        errors (int): The number of failed copies.
+    """
+
+    def __init__(self, save_directory, backup_directories, queue_size=64, poll_interval=0.5):
+        self.save_directory = save_directory
+        self.backup_directories = list(backup_directories)
+        self.poll_interval = poll_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.seen = set()
+        self.directory_mtimes = {} # The mtime of every session folder at the last scan, see `scan_directories`
+        self.rescan = set() # Folders to scan again on the next poll, even if they did not change
+        self.waiting = {}  # file name -> (size, mtime) of the files that are queued or being copied
+        self.pending = 0
+        self.pending_bytes = 0
+        self.mirrored = 0
+        self.mirrored_bytes = 0
+        self.errors = 0
+        self.stop_event = threading.Event()
+        self.watcher = threading.Thread(target=self.watch, daemon=True)
+        self.worker = threading.Thread(target=self.copy_worker, daemon=True)
+
+    def start(self):
+        """
+        Starts the watcher and copy worker threads.
+        """
+        for backup_directory in self.backup_directories:
+            os.makedirs(backup_directory, exist_ok=True)
+        self.watcher.start()
+        self.worker.start()
+
+    def stop(self, drain=True):
+        """
+        Stops watching the save directory.
+
+        Args:
+            drain (bool): If True, waits until every queued file has been mirrored.
+        """
+        self.stop_event.set()
+        self.watcher.join()
+        if drain:
+            self.queue.join()
+        self.write_status()
+
+    def is_mirrored(self, name, size):
+        """
+        Checks if a file with the same name and size already exists in every backup directory.
+        """
+        for backup_directory in self.backup_directories:
+            try:
+                if os.path.getsize(os.path.join(backup_directory, name)) != size:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def watch(self):
+        """
+        Polls the save directory and queues every picture that is not mirrored yet.
+        """
+        while not self.stop_event.is_set():
+            self.scan_once()
+            self.write_status()
+            self.stop_event.wait(self.poll_interval)
+        self.scan_once()  # Pick up the files that landed after the last poll
+
+    def scan_once(self):
+        """
+        Scans the session folders that changed since the last scan and queues the new picture files.
+
+        The files keep their subfolder of a sharded session in the backup directories.
+        """
+        with self.lock:
+            for directory in self.rescan:
+                self.directory_mtimes.pop(directory, None)
+            self.rescan.clear()
+        self.directory_mtimes, scanned = scan_directories(self.save_directory, self.directory_mtimes, lambda name: name.lower().endswith(PHOTO_EXTENSIONS))
+        for name, stat in ((name, stat) for files in scanned.values() for name, stat in files.items()):
+            if name in self.seen:
+                continue
+            self.seen.add(name)
+            if self.is_mirrored(name, stat.st_size):
+                continue
+            with self.lock:
+                self.waiting[name] = (stat.st_size, stat.st_mtime)
+                self.pending += 1
+                self.pending_bytes += stat.st_size
+            self.queue.put(name)  # Blocks while the queue is full
+
+    def copy_worker(self):
+        """
+        Copies the queued files to every backup directory.
+        """
+        while True:
+            name = self.queue.get()
+            source_path = os.path.join(self.save_directory, name)
+            try:
+                if wait_for_complete_file(source_path):
+                    for backup_directory in self.backup_directories:
+                        try:
+                            copied = copy_file_atomic(source_path, os.path.join(backup_directory, name))
+                            with self.lock:
+                                self.mirrored_bytes += copied
+                        except OSError as e:
+                            print(f"\033[91mMirror: failed to copy {name} to {backup_directory}: {e}\033[0m")
+                            with self.lock:
+                                self.errors += 1
+                    with self.lock:
+                        self.mirrored += 1
+                else:
+                    self.seen.discard(name)  # Try again on the next scan
+                    with self.lock:
+                        self.rescan.add(os.path.dirname(name)) # Even if its folder does not change
+            finally:
+                with self.lock:
+                    size, _ = self.waiting.pop(name, (0, 0))
+                    self.pending -= 1
+                    self.pending_bytes -= size
+                self.queue.task_done()
+
+    def status(self):
+        """
+        Returns how far the mirror is behind the save directory.
+
+        Returns:
+            dict: The number and size of the pending files, the age of the oldest pending file in seconds,
+                  and the number of mirrored files and errors.
+        """
+        with self.lock:
+            oldest = min((mtime for _, mtime in self.waiting.values()), default=None)
+            return {
+                'pending': self.pending,
+                'pending_bytes': self.pending_bytes,
+                'lag_seconds': round(time.time() - oldest, 1) if oldest else 0.0,
+                'mirrored': self.mirrored,
+                'mirrored_bytes': self.mirrored_bytes,
+                'errors': self.errors,
+                'backup_directories': self.backup_directories,
+                'updated': time.time(),
+            }
+
+    def write_status(self):
+        """
+        Writes the mirror status to the MIRROR_STATUS_FILE in the save directory, so the main program can show it.
+
+        The file is rewritten in place instead of being replaced, so the mtime of the save directory only
+        changes when a picture lands. `capture_pressure` and the session catalog rely on that.
+        A reader that sees a half-written file gets None from `read_mirror_status`.
+        """
+        status_path = os.path.join(self.save_directory, MIRROR_STATUS_FILE)
+        try:
+            with open(status_path, 'w') as f:
+                json.dump(self.status(), f)
+        except OSError:
+            pass
+
+def read_mirror_status(save_directory):
+    """
+    Reads the status written by the backup mirror.
+
+    Args:
+        save_directory (str): The directory where the pictures are saved.
+
+    Returns:
+        dict or None: The mirror status, or None if no mirror has run in this directory.
+    """
+    try:
+        with open(os.path.join(save_directory, MIRROR_STATUS_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def format_mirror_status(status):
+    """
+    Formats the mirror status as a colour-coded line for the terminal.
+
+    Args:
+        status (dict): The status returned by `BackupMirror.status` or `read_mirror_status`.
+
+    Returns:
+        str: The formatted status line.
+    """
+    if not status:
+        return "Mirror: not running"
+    pending_mb = status['pending_bytes'] / (1024 * 1024)
+    if status['pending'] == 0:
+        color = "\033[38;5;46m"  # Green color
+    elif status['lag_seconds'] < 30:
+        color = "\033[38;5;202m"  # Orange color
+    else:
+        color = "\033[38;5;196m"  # Red color
+    line = f"{color}Mirror: {status['pending']} pending ({pending_mb:.1f} MiB), {status['lag_seconds']:.1f} s behind, {status['mirrored']} mirrored\033[0m"
+    if status['errors']:
+        line += f" \033[91m({status['errors']} errors)\033[0m"
+    return line
+
+class SharedChunk:
+    """
+    A block of a source file that is shared by all destination writers.
+
+    The buffer is returned to the buffer pool once every writer has released it.
+    """
+
+    def __init__(self, buffer, length, refs, pool):
+        self.buffer = buffer
+        self.view = memoryview(buffer)[:length]
+        self.refs = refs
+        self.pool = pool
+        self.lock = threading.Lock()
+
+    def release(self):
+        with self.lock:
+            self.refs -= 1
+            if self.refs > 0:
+                return
+        self.view.release()
+        self.pool.put(self.buffer)
+
+class DestinationWriter(threading.Thread):
+    """
+    Writes the shared chunks to one destination directory.
+
+    Every destination has its own writer thread, so a slow drive only delays itself. If a write fails,
+    for example because the drive is full, the writer marks itself as failed and from then on only
+    releases the chunks it receives, so the other destinations continue.
+    Files that were detached from this writer because it fell too far behind are copied at the end
+    with a separate read of the source file.
+
+    Attributes:
+        destination_directory (str): The destination directory.
+        files_done (int): The number of files written.
+        bytes_done (int): The number of bytes written.
+        failed (str or None): The error that stopped this writer, or None.
+        errors (list): The files that could not be written, as (file name, error) tuples.
+    """
+
+    def __init__(self, destination_directory, throttle=None, io_priority=None, tracer=None):
+        super().__init__(daemon=True)
+        self.destination_directory = destination_directory
+        self.throttle = throttle
+        self.io_priority = io_priority
+        self.tracer = tracer
+        self.file_started = None
+        self.queue = queue.Queue()
+        self.files_done = 0
+        self.bytes_done = 0
+        self.failed = None
+        self.errors = []
+        self.deferred = []
+        self.detached_files = set()
+        self.current = None  # (file index, source path, destination path, temp path, file object)
+        self.current_bytes = 0
+
+    def backlog(self):
+        return self.queue.qsize()
+
+    def detach(self, file_index, source_path, destination_path):
+        """
+        Stops writing the given file from the shared chunks and copies it separately at the end.
+        """
+        self.detached_files.add(file_index)
+        self.deferred.append((source_path, destination_path))
+
+    def run(self):
+        if self.io_priority:
+            set_thread_io_priority(*self.io_priority)
+        while True:
+            message = self.queue.get()
+            if message is None:
+                break
+            kind = message[0]
+            if kind == 'open':
+                self.open_file(*message[1:])
+            elif kind == 'chunk':
+                self.write_chunk(message[1])
+            elif kind == 'close':
+                self.close_file()
+        for source_path, destination_path in self.deferred: # Catch up on the detached files
+            if self.failed:
+                break
+            try:
+                self.bytes_done += copy_file_atomic(source_path, destination_path, throttle=self.throttle)
+                self.files_done += 1
+            except OSError as e:
+                self.errors.append((os.path.basename(source_path), str(e)))
+
+    def skipping(self):
+        return self.failed or self.current is None or self.current[0] in self.detached_files
+
+    def open_file(self, file_index, source_path, destination_path):
+        temp_path = os.path.join(os.path.dirname(destination_path), '.' + os.path.basename(destination_path) + '.part')
+        self.current = (file_index, source_path, destination_path, temp_path, None)
+        self.current_bytes = 0
+        self.file_started = (time.time(), time.perf_counter())
+        if self.skipping():
+            return
+        try:
+            os.makedirs(os.path.dirname(destination_path), exist_ok=True) # The subfolder of a sharded session
+            self.current = (file_index, source_path, destination_path, temp_path, open(temp_path, 'wb'))
+        except OSError as e:
+            self.fail(e)
+
+    def write_chunk(self, chunk):
+        try:
+            if not self.skipping():
+                self.current[4].write(chunk.view)
+                self.bytes_done += len(chunk.view)
+                self.current_bytes += len(chunk.view)
+        except OSError as e:
+            self.fail(e)
+        finally:
+            chunk.release()
+
+    def close_file(self):
+        if self.current is None:
+            return
+        file_index, source_path, destination_path, temp_path, f = self.current
+        try:
+            if f is not None:
+                if self.skipping():
+                    f.close()
+                    os.remove(temp_path)
+                    self.bytes_done -= self.current_bytes
+                else:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+                    shutil.copystat(source_path, temp_path)
+                    os.replace(temp_path, destination_path)
+                    self.files_done += 1
+                    if self.tracer:
+                        self.tracer.record('transfer_write', (time.perf_counter() - self.file_started[1]) * 1000, self.file_started[0],
+                                           file=os.path.basename(source_path), destination=self.destination_directory, bytes=self.current_bytes)
+        except OSError as e:
+            self.fail(e)
+        self.current = None
+
+    def fail(self, error):
+        """
+        Marks the writer as failed and removes the partly written file.
+        """
+        if self.current is not None:
+            file_index, source_path, destination_path, temp_path, f = self.current
+            self.errors.append((os.path.basename(source_path), str(error)))
+            if f is not None:
+                try:
+                    f.close()
+                except OSError:
+                    pass
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            self.bytes_done -= self.current_bytes
+            self.current_bytes = 0
+            self.current = (file_index, source_path, destination_path, temp_path, None)
+        if not self.failed:
+            self.failed = str(error)
+
+class FanOutCopier:
+    """
+    Copies files to several destination directories while reading every source file only once.
+
+    The source file is read in blocks into a small pool of reusable buffers. Every block is handed to
+    one writer thread per destination and the buffer goes back to the pool when all writers are done with it.
+    If no buffer becomes free within `stall_timeout` seconds, the destination with the longest backlog is
+    detached from the current file and copies it on its own later, so one slow drive does not hold up the others.
+    The reading is limited by an optional `TransferThrottle`, and with `io_priority` the reader and writer
+    threads run with a lower CPU and IO priority (see `set_thread_io_priority`), so a transfer can run
+    next to an active tether session. With a `pipeline_trace.Tracer` the read of every file and its write
+    to every destination are recorded as spans.
+
+    Attributes:
+        destination_directories (list): The destination directories.
+        writers (dict): The writer thread of every destination directory.
+    """
+
+    def __init__(self, destination_directories, buffer_count=8, chunk_size=COPY_CHUNK_SIZE, stall_timeout=10, throttle=None, io_priority=None, tracer=None):
+        self.destination_directories = list(destination_directories)
+        self.chunk_size = chunk_size
+        self.stall_timeout = stall_timeout
+        self.throttle = throttle
+        self.io_priority = io_priority
+        self.tracer = tracer
+        self.pool = queue.Queue()
+        for _ in range(buffer_count):
+            self.pool.put(bytearray(chunk_size))
+        self.writers = {directory: DestinationWriter(directory, throttle, io_priority, tracer) for directory in self.destination_directories}
+
+    def get_buffer(self, file_index, source_path, targets):
+        """
+        Takes a free buffer from the pool. Detaches the slowest destination while none becomes free.
+        """
+        while True:
+            try:
+                return self.pool.get(timeout=self.stall_timeout)
+            except queue.Empty:
+                if len(targets) <= 1:
+                    continue # Nothing to detach, the only destination has to catch up
+                slowest = max(targets, key=lambda writer: writer.backlog())
+                print(f"\033[38;5;202m{slowest.destination_directory} is falling behind, it will copy {os.path.basename(source_path)} separately.\033[0m")
+                slowest.detach(file_index, source_path, targets[slowest])
+                del targets[slowest]
+
+    def copy(self, jobs, progress=None):
+        """
+        Copies the files.
+
+        Args:
+            jobs (list): A list of (source path, {destination directory: destination path}) tuples.
+                         A destination directory that is missing from the dictionary is skipped for that file.
+            progress (callable): Called after every source file with the `status` of the copier.
+
+        Returns:
+            dict: The `status` of the copier after all files are copied.
+        """
+        for writer in self.writers.values():
+            writer.start()
+        reader = threading.Thread(target=self.read_jobs, args=(jobs, progress), daemon=True)
+        reader.start()
+        reader.join()
+        for writer in self.writers.values():
+            writer.queue.put(None)
+        for writer in self.writers.values():
+            writer.join()
+        return self.status()
+
+    def read_jobs(self, jobs, progress):
+        """
+        Reads every source file once and hands the blocks to the writers. Runs in its own thread.
+        """
+        if self.io_priority:
+            set_thread_io_priority(*self.io_priority)
+        for file_index, (source_path, destinations) in enumerate(jobs):
+            targets = {self.writers[directory]: path for directory, path in destinations.items() if directory in self.writers and not self.writers[directory].failed}
+            if not targets:
+                continue
+            for writer, destination_path in targets.items():
+                writer.queue.put(('open', file_index, source_path, destination_path))
+            read_start, read_started = time.time(), time.perf_counter()
+            try:
+                with open(source_path, 'rb') as src:
+                    while True:
+                        buffer = self.get_buffer(file_index, source_path, targets)
+                        if self.throttle:
+                            self.throttle.consume(len(buffer))
+                        length = src.readinto(buffer)
+                        if not length:
+                            self.pool.put(buffer)
+                            break
+                        chunk = SharedChunk(buffer, length, len(targets), self.pool)
+                        for writer in targets:
+                            writer.queue.put(('chunk', chunk))
+            except OSError as e:
+                print(f"\033[91mFailed to read {os.path.basename(source_path)}: {e}\033[0m")
+                for writer in targets:
+                    writer.detach(file_index, source_path, targets[writer]) # Retried separately at the end
+            for writer in targets:
+                writer.queue.put(('close',))
+            if self.tracer:
+                self.tracer.record('transfer_read', (time.perf_counter() - read_started) * 1000, read_start, file=os.path.basename(source_path))
+            if progress:
+                progress(self.status())
+
+    def status(self):
+        """
+        Returns the progress of every destination.
+
+        Returns:
+            dict: destination directory -> dict with the number of files and bytes written, the errors and
+                  the error that stopped the destination (or None).
+        """
+        return {
+            directory: {
+                'files': writer.files_done,
+                'bytes': writer.bytes_done,
+                'errors': list(writer.errors),
+                'failed': writer.failed,
+            }
+            for directory, writer in self.writers.items()
+        }
+
+class VolumeWriter:
+    """
+    A write-only file object that splits the written stream into volumes of a fixed size.
+
+    The volumes are named `<path>.001`, `<path>.002` and so on, and can be joined again with
+    `cat <path>.* > <path>`. Without a volume size everything is written to `path`.
+    The stream is not seekable, so the archive writers stream their output in one sequential write.
+
+    Attributes:
+        path (str): The path of the archive.
+        volume_size (int or None): The maximum size of a volume in bytes.
+        volumes (list): The paths of the volumes written so far.
+    """
+
+    def __init__(self, path, volume_size=None, throttle=None):
+        self.path = path
+        self.volume_size = volume_size
+        self.throttle = throttle
+        self.volumes = []
+        self.position = 0
+        self.file = None
+        self.volume_left = 0
+
+    def open_next_volume(self):
+        if self.file is not None:
+            self.file.close()
+        if self.volume_size:
+            volume_path = f"{self.path}.{len(self.volumes) + 1:03d}"
+            self.volume_left = self.volume_size
+        else:
+            volume_path = self.path
+            self.volume_left = float('inf')
+        self.file = open(volume_path, 'wb', buffering=COPY_CHUNK_SIZE)
+        self.volumes.append(volume_path)
+
+    def write(self, data):
+        if self.throttle:
+            self.throttle.consume(len(data))
+        view = memoryview(data)
+        while len(view):
+            if self.file is None or self.volume_left == 0:
+                self.open_next_volume()
+            part = view[:self.volume_left] if self.volume_left < len(view) else view
+            self.file.write(part)
+            self.volume_left -= len(part)
+            self.position += len(part)
+            view = view[len(part):]
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def seekable(self):
+        return False
+
+    def seek(self, *args):
+        raise OSError("VolumeWriter is not seekable")
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+
+    def locate(self, offset):
+        """
+        Returns the volume path and the offset inside that volume of an offset in the archive.
+        """
+        if not self.volume_size:
+            return self.volumes[0] if self.volumes else self.path, offset
+        return f"{self.path}.{offset // self.volume_size + 1:03d}", offset % self.volume_size
+
+def sidecar_index(session_directory, directory=''):
+    """
+    Returns the sidecar files of a session folder by the name they belong to, for example `DSC_0001.xmp` or `DSC_0001.NEF.xmp`.
+
+    The folder is read once with os.scandir, so finding the sidecars of every picture does not compare every
+    picture with every file of the folder.
+
+    Args:
+        session_directory (str): The session directory.
+        directory (str): The subfolder relative to the session directory, '' for the session directory itself.
+
+    Returns:
+        dict: lower-case name without the sidecar extension ('dsc_0001' or 'dsc_0001.nef') -> list of sidecar paths
+              relative to the session directory.
+    """
+    index = {}
+    try:
+        with os.scandir(os.path.join(session_directory, directory)) as entries:
+            for entry in entries:
+                base, extension = os.path.splitext(entry.name)
+                if extension.lower() in SIDECAR_EXTENSIONS and entry.is_file():
+                    index.setdefault(base.lower(), []).append(os.path.join(directory, entry.name) if directory else entry.name)
+    except OSError:
+        pass
+    return index
+
+def find_sidecar_files(photo_file, index):
+    """
+    Returns the sidecar files of a picture.
+
+    Args:
+        photo_file (str): The file name of the picture, relative to the session directory.
+        index (dict): The `sidecar_index` of the folder of the picture.
+
+    Returns:
+        list: The sidecar paths relative to the session directory.
+    """
+    name = os.path.basename(photo_file).lower()
+    stem = os.path.splitext(name)[0]
+    return index.get(stem, []) + (index.get(name, []) if name != stem else [])
+
+def export_archive(session_directory, destination_directory, photo_file_list, archive_name, archive_format='tar', volume_size=None, progress=None, throttle=None):
+    """
+    Streams pictures and their sidecar files into one tar or store-only zip archive in the destination directory.
+
+    Writing one archive instead of thousands of small files turns the transfer into one long sequential write,
+    which is much faster on USB sticks and network drives where the per-file overhead dominates.
+    The archive can be split into volumes of a fixed size. The archive ends with an `index.json` member
+    and the same index is written next to the archive as `<archive>.index.json`. The index lists the
+    volume and offset of every file, so one picture can be found without reading the whole archive.
+
+    Args:
+        session_directory (str): The directory where the captured pictures are saved.
+        destination_directory (str): The directory where the archive is written.
+        photo_file_list (list): The file names of the pictures to export.
+        archive_name (str): The file name of the archive without extension.
+        archive_format (str): 'tar' or 'zip'.
+        volume_size (int or None): The maximum size of a volume in bytes, or None to write one file.
+        progress (callable): Called after every picture with the number of exported pictures and bytes.
+        throttle (TransferThrottle): Limits the bandwidth of the export, or None for no limit.
+
+    Returns:
+        dict: The index of the archive.
+    """
+    if archive_format not in ('tar', 'zip'):
+        raise ValueError(f"Unsupported archive format: {archive_format}")
+    archive_path = os.path.join(destination_directory, f"{archive_name}.{archive_format}")
+    sidecar_indexes = {} # Folder -> `sidecar_index`, every folder of the session is read once
+    exported_names = set()
+    writer = VolumeWriter(archive_path, volume_size, throttle)
+    entries = []
+    exported_bytes = 0
+    try:
+        if archive_format == 'tar':
+            archive = tarfile.open(fileobj=writer, mode='w|', bufsize=COPY_CHUNK_SIZE, format=tarfile.PAX_FORMAT)
+        else:
+            archive = zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+        with archive:
+            for count, photo_file in enumerate(photo_file_list, start=1):
+                directory = os.path.dirname(photo_file)
+                if directory not in sidecar_indexes:
+                    sidecar_indexes[directory] = sidecar_index(session_directory, directory)
+                for name in [photo_file] + find_sidecar_files(photo_file, sidecar_indexes[directory]):
+                    if name in exported_names:
+                        continue # The sidecar of a RAW+JPEG pair belongs to both files
+                    exported_names.add(name)
+                    path = os.path.join(session_directory, name)
+                    stat = os.stat(path)
+                    if archive_format == 'tar':
+                        archive.add(path, arcname=name, recursive=False)
+                        data_offset = archive.offset - (stat.st_size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE
+                    else:
+                        archive.write(path, arcname=name)
+                        info = archive.getinfo(name)
+                        zip64_extra = 20 if info.file_size * 1.05 > zipfile.ZIP64_LIMIT else 0 # Added to the local header only
+                        data_offset = info.header_offset + 30 + len(info.filename.encode('utf-8')) + len(info.extra) + zip64_extra
+                    volume, volume_offset = writer.locate(data_offset)
+                    entries.append({
+                        'name': name,
+                        'size': stat.st_size,
+                        'mtime': stat.st_mtime,
+                        'offset': data_offset,
+                        'volume': os.path.basename(volume),
+                        'volume_offset': volume_offset,
+                    })
+                    exported_bytes += stat.st_size
+                if progress:
+                    progress(count, exported_bytes)
+            index = {
+                'archive': os.path.basename(archive_path),
+                'format': archive_format,
+                'volume_size': volume_size,
+                'files': entries,
+            }
+            index_data = json.dumps(index, indent=1).encode('utf-8')
+            if archive_format == 'tar':
+                info = tarfile.TarInfo('index.json')
+                info.size = len(index_data)
+                info.mtime = time.time()
+                archive.addfile(info, io.BytesIO(index_data))
+            else:
+                archive.writestr('index.json', index_data)
+        writer.close()
+    except BaseException:
+        writer.close()
+        for volume in writer.volumes:
+            if os.path.exists(volume):
+                os.remove(volume)
+        raise
+    index['volumes'] = [os.path.basename(volume) for volume in writer.volumes]
+    with open(archive_path + '.index.json', 'w') as f:
+        json.dump(index, f, indent=1)
+    return index
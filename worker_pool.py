@@ -0,0 +1,29 @@
+"""
+This module creates the process pools of the application: the header reads of the session catalog, the culling
+scores of the frame analyzer and the proof export.
+
+The workers are started with the 'spawn' method on every platform, as fresh interpreters that import the module of
+the worker function. Forking would copy the calling process with its threads (the status monitor of the menu, the
+storage watchdog and the batch flusher of the tether) into every worker, together with the locks those threads
+hold at that moment, and on macOS a forked process can crash once OpenCV is loaded.
+A spawned worker also imports the script that was started, as '__mp_main__', so every script that reaches a
+process pool keeps its code under `if __name__ == '__main__':`.
+
+Libraries used:
+- multiprocessing, concurrent.futures: Provide the process pool.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+def create_worker_pool(workers=None, initializer=None):
+    """
+    Creates a process pool with spawned workers.
+
+    Args:
+        workers (int): The number of worker processes, or None for the number of CPUs.
+        initializer (callable): Called in every worker when it starts, or None.
+
+    Returns:
+        ProcessPoolExecutor: The pool, to be shut down by the caller (or used as a context manager).
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=initializer)